@@ -56,6 +56,8 @@ class Settings(BaseSettings):
     CHROMA_DB_PATH: str = "chroma_db"
     EMBEDDING_MODEL_NAME: str = "all-MiniLM-L6-v2"
     LLM_MODEL: str = "gpt-3.5-turbo"  # Can be overridden via .env
+    USE_UNSTRUCTURED_PDF_LOADER: bool = False  # Force Unstructured (OCR/layout) instead of PyMuPDF
+    PRELOAD_WARMUP_EMBEDDINGS: bool = True  # Warm up the embedding model on typical input shapes at startup
 
     # === RAG SYSTEM PROMPTS (SECURITY: LOADED FROM FILES) ===
     # ⚠️ SECURITY CRITICAL: These prompts are loaded from external files to:
@@ -39,6 +39,8 @@ class QueryConstants:
     # Query expansion
     BASE_RETRIEVAL_K = 30  # Documents to retrieve before reranking
     FINAL_RETRIEVAL_K = 15  # Documents after reranking
+    RERANK_CANDIDATE_K = 50  # Candidates kept by RRF fusion before reranking
+    RRF_K = 60  # Reciprocal Rank Fusion smoothing constant
     
     # Conversational patterns for reformulation detection
     CONVERSATIONAL_PATTERNS = [
@@ -82,6 +84,7 @@ class TierConstants:
     FREE_QUOTA = 10
     PRO_QUOTA = 100
     PREMIUM_QUOTA = 500
+    USAGE_RETENTION_DAYS = 30  # Daily usage docs expire (Firestore TTL on expires_at)
 
 
 class MobileUXConstants:
@@ -95,7 +98,19 @@ class CacheConstants:
     """Caching configuration."""
     
     TRANSLATION_CACHE_SIZE = 1000  # LRU cache max size
+    TRANSLATION_CACHE_TTL_SECONDS = 3600  # 1 hour
+    CLASSIFICATION_CACHE_SIZE = 1024  # Query -> category tag entries
+    CLASSIFICATION_CACHE_TTL_SECONDS = 3600  # 1 hour
     QUERY_EXPANSION_CACHE_SIZE = 500
+    RERANK_SCORE_CACHE_SIZE = 10000  # (keywords, chunk) score entries
+    RERANK_SCORE_CACHE_TTL_SECONDS = 900  # 15 minutes
+    RERANK_KEYWORD_CACHE_SIZE = 512  # Distinct query tuples with cached keyword sets
+    TIER_CACHE_SIZE = 10000  # User -> (tier, limits) entries
+    TIER_CACHE_TTL_SECONDS = 60  # Short: tier changes must show up quickly
+    FILENAME_EMBEDDING_CACHE_SIZE = 256  # Document lists with cached filename embeddings
+    FILENAME_EMBEDDING_CACHE_TTL_SECONDS = 3600  # 1 hour
+    QUERY_COUNT_FLUSH_EVERY = 10  # Flush a user's buffered query count after N queries...
+    QUERY_COUNT_FLUSH_INTERVAL_SECONDS = 5  # ...or once the oldest unflushed query is this old
 
 
 class APIConstants:
@@ -116,6 +131,7 @@ class EmbeddingConstants:
     MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
     EMBEDDING_DIMENSION = 384  # Vector dimensions
     BATCH_SIZE = 100  # Documents to embed at once
+    CHROMA_WRITE_BATCH_SIZE = 250  # Chunks per collection.upsert() call
 
 
 class DocumentConstants:
@@ -124,6 +140,15 @@ class DocumentConstants:
     SAMPLE_SIZE = 100000  # Chunks to sample for document discovery
     MAX_FILENAME_LENGTH = 255  # Characters
     SUPPORTED_FORMATS = ["pdf"]  # Currently only PDF
+    
+    TEMP_FILE_WRITE_CHUNK_SIZE = 8 * 1024 * 1024  # 8 MiB per read/write when spooling uploads to disk
+    
+    # PDF extraction (PyMuPDF)
+    PDF_MIN_TEXT_CHARS = 500  # Below this the PDF is likely scanned -> Unstructured/OCR fallback
+    PDF_PARALLEL_MIN_PAGES = 50  # Pages before extraction is spread over a process pool
+    PDF_PAGES_PER_WORKER_TASK = 5  # Pages extracted per process pool task
+    PDF_TITLE_FONT_RATIO = 1.3  # Blocks above median body font size * ratio are titles
+    PDF_TITLE_MAX_CHARS = 200  # Longer large-font blocks are treated as body text
 
 
 class LLMConstants:
@@ -133,3 +158,5 @@ class LLMConstants:
     QUERY_GEN_MODEL = "gpt-4o-mini"  # For cheap operations (classification, reformulation)
     DEFAULT_TEMPERATURE = 0.2  # Lower = more deterministic
     MAX_TOKENS = 1000  # Maximum tokens in response
+    TRANSLATION_BATCH_WINDOW_SECONDS = 0.05  # Wait up to 50ms to batch query translations...
+    TRANSLATION_BATCH_MAX_SIZE = 8  # ...or until this many are queued for one target language
@@ -10,7 +10,11 @@ from pathlib import Path
 
 import firebase_admin
 from app.core.logging import logger
-from firebase_admin import credentials
+from firebase_admin import credentials, firestore
+
+# Set once initialize_firebase() has an app, so callers can check it without
+# querying firebase_admin again
+_FIREBASE_READY = False
 
 
 def initialize_firebase():
@@ -28,9 +32,12 @@ def initialize_firebase():
     Raises:
         ValueError: If no valid credentials found
     """
+    global _FIREBASE_READY
+
     # Check if already initialized
     if len(firebase_admin._apps) > 0:
         logger.info("✅ Firebase Admin SDK already initialized")
+        _FIREBASE_READY = True
         return firebase_admin.get_app()
     
     logger.info("🔧 Initializing Firebase Admin SDK...")
@@ -44,6 +51,7 @@ def initialize_firebase():
             cred = credentials.Certificate(cred_dict)
             app = firebase_admin.initialize_app(cred)
             logger.info("✅ Firebase initialized from FIREBASE_CREDENTIALS env var")
+            _FIREBASE_READY = True
             return app
         except Exception as e:
             logger.error(f"❌ Failed to parse FIREBASE_CREDENTIALS: {e}")
@@ -55,6 +63,7 @@ def initialize_firebase():
             cred = credentials.Certificate(service_account_path)
             app = firebase_admin.initialize_app(cred)
             logger.info(f"✅ Firebase initialized from file: {service_account_path}")
+            _FIREBASE_READY = True
             return app
         except Exception as e:
             logger.error(f"❌ Failed to load credentials from {service_account_path}: {e}")
@@ -66,6 +75,7 @@ def initialize_firebase():
             cred = credentials.Certificate(str(default_path))
             app = firebase_admin.initialize_app(cred)
             logger.info(f"✅ Firebase initialized from default path: {default_path}")
+            _FIREBASE_READY = True
             return app
         except Exception as e:
             logger.error(f"❌ Failed to load credentials from {default_path}: {e}")
@@ -81,6 +91,35 @@ def initialize_firebase():
     raise ValueError(error_msg)
 
 
+def is_firebase_ready() -> bool:
+    """
+    Whether initialize_firebase() has successfully set up the Firebase app.
+    
+    Returns:
+        True if Firebase is initialized
+    """
+    return _FIREBASE_READY
+
+
+# Shared Firestore client: one client (and gRPC channel pool) for every service
+_firestore_client = None
+
+
+def get_firestore_client():
+    """
+    Get the Firestore client shared by all services.
+    
+    Created on first use, so it requires initialize_firebase() to have run.
+    
+    Returns:
+        google.cloud.firestore.Client: Shared Firestore client
+    """
+    global _firestore_client
+    if _firestore_client is None:
+        _firestore_client = firestore.client()
+    return _firestore_client
+
+
 # Initialize on module import (if credentials available)
 # This allows optional Firebase features - app will start without it
 try:
@@ -10,6 +10,7 @@ This module provides:
 Architecture: Dependency Injection pattern for microservices-ready architecture
 """
 
+import threading
 from typing import Generator
 
 from app.core.config import settings
@@ -24,6 +25,9 @@ COLLECTION_NAME: str = "document_intelligence_collection"
 
 # Global singleton for embedding function (loaded once at startup)
 _embedding_function_singleton: HuggingFaceEmbeddings | None = None
+# The model is loaded in a background thread at startup: requests arriving
+# meanwhile wait for that load instead of starting a second one
+_embedding_function_lock = threading.Lock()
 
 
 # --- Embedding Function Configuration ---
@@ -54,24 +58,28 @@ def get_embedding_function() -> HuggingFaceEmbeddings:
     if _embedding_function_singleton is not None:
         return _embedding_function_singleton
     
-    # Initialize on first call
-    try:
-        logger.info("🔧 Initializing HuggingFace embedding model (first time)...")
-        _embedding_function_singleton = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={
-                'device': 'cpu',  # Use CPU for compatibility
-            },
-            encode_kwargs={
-                'normalize_embeddings': True,  # L2 normalization for cosine similarity
-                'batch_size': 32,  # Process 32 texts at a time for efficiency
-            },
-        )
-        logger.info("✅ HuggingFace embedding function initialized successfully")
-        return _embedding_function_singleton
-    except Exception as e:
-        logger.error(f"❌ Failed to initialize embedding function: {e}")
-        raise
+    with _embedding_function_lock:
+        if _embedding_function_singleton is not None:
+            return _embedding_function_singleton
+
+        # Initialize on first call
+        try:
+            logger.info("🔧 Initializing HuggingFace embedding model (first time)...")
+            _embedding_function_singleton = HuggingFaceEmbeddings(
+                model_name="sentence-transformers/all-MiniLM-L6-v2",
+                model_kwargs={
+                    'device': 'cpu',  # Use CPU for compatibility
+                },
+                encode_kwargs={
+                    'normalize_embeddings': True,  # L2 normalization for cosine similarity
+                    'batch_size': 32,  # Process 32 texts at a time for efficiency
+                },
+            )
+            logger.info("✅ HuggingFace embedding function initialized successfully")
+            return _embedding_function_singleton
+        except Exception as e:
+            logger.error(f"❌ Failed to initialize embedding function: {e}")
+            raise
 
 
 # --- ChromaDB Client Initialization ---
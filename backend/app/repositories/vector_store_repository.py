@@ -14,15 +14,48 @@ Architecture Pattern: Repository Pattern
 - Testable: can be mocked without real database
 """
 
-from typing import List, Optional, Tuple
+import hashlib
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from chromadb import Collection
 from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
 
+from app.core.constants import EmbeddingConstants
 from app.core.logging import logger
 
 
+def _content_hash(text: str) -> str:
+    """Stable content fingerprint used to reuse embeddings of identical chunks."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _chunk_id(metadata: dict) -> str:
+    """
+    Deterministic chunk id from owner, filename and chunk position, so that
+    re-indexing the same document overwrites its chunks instead of duplicating
+    them. Falls back to a random id when the position metadata is missing.
+    """
+    if "chunk_index" not in metadata:
+        return str(uuid.uuid4())
+    key = f"{metadata.get('source')}\x1f{metadata.get('original_filename')}\x1f{metadata['chunk_index']}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _distance_to_similarity(distance: float, space: str) -> float:
+    """
+    Convert a ChromaDB distance into cosine similarity.
+
+    Embeddings are L2-normalized, so for the default "l2" space (squared
+    euclidean distance) cosine similarity is 1 - d / 2; for "cosine" and
+    "ip" spaces ChromaDB already returns 1 - similarity.
+    """
+    if space == "l2":
+        return 1.0 - distance / 2.0
+    return 1.0 - distance
+
+
 class VectorStoreRepository:
     """
     Repository for vector store operations (ChromaDB).
@@ -53,14 +86,21 @@ class VectorStoreRepository:
     def add_documents(
         self,
         documents: List[Document],
-        batch_size: int = 2000
+        batch_size: int = EmbeddingConstants.CHROMA_WRITE_BATCH_SIZE
     ) -> int:
         """
-        Add documents to the vector store with batching.
+        Embed documents client-side and write them to the collection in batches.
+        
+        Each chunk is tagged with a `content_hash` metadata field. Chunks whose
+        text was already indexed by the same user (repeated boilerplate,
+        re-uploaded files) reuse the stored vector, so only net-new content is
+        embedded - in a single embed_documents() call for the whole input. Vectors are then upserted in
+        slices of `batch_size` with deterministic ids (see _chunk_id), and chunks of
+        a previous, longer version of the same document are deleted.
         
         Args:
             documents: List of LangChain Documents with content and metadata
-            batch_size: Number of documents to process per batch
+            batch_size: Number of chunks per collection.upsert() call
         
         Returns:
             Total number of documents indexed
@@ -68,22 +108,131 @@ class VectorStoreRepository:
         Raises:
             Exception: If indexing fails
         """
+        if not documents:
+            return 0
+        
         try:
-            total_indexed = 0
+            contents = [doc.page_content for doc in documents]
+            hashes = [_content_hash(text) for text in contents]
+            metadatas = [
+                {**doc.metadata, "content_hash": content_hash}
+                for doc, content_hash in zip(documents, hashes)
+            ]
+            ids = [_chunk_id(metadata) for metadata in metadatas]
             
+            # Reuse vectors stored by the chunk's owner, embed only unseen content (one call).
+            # Reuse is never shared across tenants: upload timing would otherwise reveal
+            # whether another user has indexed the same text.
+            keys = [(metadata.get("source"), content_hash) for metadata, content_hash in zip(metadatas, hashes)]
+            stored: Dict[Tuple[Optional[str], str], List[float]] = {}
+            for user_id in {owner for owner, _ in keys if owner is not None}:
+                user_hashes = [content_hash for owner, content_hash in keys if owner == user_id]
+                for content_hash, embedding in self._get_embeddings_by_hash(user_hashes, user_id).items():
+                    stored[(user_id, content_hash)] = embedding
+            reused = sum(1 for key in keys if key in stored)
+            new_texts: Dict[str, str] = {}
+            for key, text in zip(keys, contents):
+                if key not in stored:
+                    new_texts.setdefault(key[1], text)
+            new_vectors: Dict[str, List[float]] = {}
+            if new_texts:
+                new_vectors = dict(zip(
+                    new_texts.keys(),
+                    self.vector_store.embeddings.embed_documents(list(new_texts.values()))
+                ))
+            embeddings = [stored[key] if key in stored else new_vectors[key[1]] for key in keys]
+            
+            total_indexed = 0
             for i in range(0, len(documents), batch_size):
-                batch = documents[i:i + batch_size]
-                self.vector_store.add_documents(batch)
-                total_indexed += len(batch)
-                logger.info(f"📦 Batch {i // batch_size + 1}: Indexed {len(batch)} chunks (total: {total_indexed})")
+                j = i + batch_size
+                self.collection.upsert(
+                    ids=ids[i:j],
+                    embeddings=embeddings[i:j],
+                    documents=contents[i:j],
+                    metadatas=metadatas[i:j],
+                )
+                total_indexed += len(ids[i:j])
+                logger.debug(f"📦 Batch {i // batch_size + 1}: Wrote {len(ids[i:j])} chunks (total: {total_indexed})")
+            
+            # Re-uploads overwrite chunks by id: drop the tail a shorter new version left behind.
+            # Done after the upsert so the stored vectors above stay available for reuse.
+            stale_removed = self._delete_stale_chunks(metadatas, ids)
             
-            logger.info(f"✅ Successfully indexed {total_indexed} document chunks")
+            logger.info(
+                f"✅ Successfully indexed {total_indexed} document chunks "
+                f"({len(new_texts)} embedded, {reused} reused, {stale_removed} stale removed)"
+            )
             return total_indexed
             
         except Exception as e:
             logger.error(f"❌ Failed to add documents to vector store: {e}")
             raise
     
+    def _delete_stale_chunks(self, metadatas: List[dict], ids: List[str]) -> int:
+        """
+        Delete chunks of the written documents that are not part of the new version.
+        
+        Args:
+            metadatas: Metadata of the chunks just written
+            ids: Ids of the chunks just written
+        
+        Returns:
+            Number of stale chunks deleted
+        """
+        written_ids: Dict[Tuple[str, str], set] = {}
+        for metadata, chunk_id in zip(metadatas, ids):
+            if "chunk_index" in metadata and metadata.get("source") and metadata.get("original_filename"):
+                key = (metadata["source"], metadata["original_filename"])
+                written_ids.setdefault(key, set()).add(chunk_id)
+        
+        removed = 0
+        for (user_id, filename), document_ids in written_ids.items():
+            existing = self.collection.get(
+                where={"$and": [{"source": user_id}, {"original_filename": filename}]},
+                include=[]
+            )
+            stale_ids = [chunk_id for chunk_id in existing.get("ids", []) if chunk_id not in document_ids]
+            if stale_ids:
+                self.collection.delete(ids=stale_ids)
+                removed += len(stale_ids)
+                logger.debug(f"🧹 Removed {len(stale_ids)} stale chunks of '{filename}'")
+        return removed
+    
+    def _get_embeddings_by_hash(self, hashes: Iterable[str], user_id: str) -> Dict[str, List[float]]:
+        """
+        Look up embeddings the user has already stored for the given content hashes.
+        
+        Args:
+            hashes: Content hashes to look up
+            user_id: Owner of the chunks (the lookup never crosses tenants)
+        
+        Returns:
+            Mapping of content_hash -> embedding for hashes already indexed
+        """
+        unique_hashes = list(set(hashes))
+        if not unique_hashes:
+            return {}
+        
+        try:
+            results = self.collection.get(
+                where={"$and": [self._build_user_filter(user_id), {"content_hash": {"$in": unique_hashes}}]},
+                include=["embeddings", "metadatas"]
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding reuse lookup failed, embedding all chunks: {e}")
+            return {}
+        
+        embeddings = results.get("embeddings")
+        metadatas = results.get("metadatas") or []
+        if embeddings is None:
+            return {}
+        
+        return {
+            metadata["content_hash"]: embedding
+            for metadata, embedding in zip(metadatas, embeddings)
+            if metadata and "content_hash" in metadata
+        }
+    
     # --- READ Operations ---
     
     def check_document_exists(self, user_id: str, filename: str) -> bool:
@@ -219,33 +368,113 @@ class VectorStoreRepository:
             - If exclude_files provided: search in all files EXCEPT those
             - If both provided: include takes precedence (exclude is ignored)
         """
-        # Build metadata filter
-        filter_conditions = {"source": user_id}
+        filter_conditions = self._build_user_filter(user_id, include_files, exclude_files)
+        
+        return self.vector_store.as_retriever(
+            search_kwargs={"filter": filter_conditions, "k": k}
+        )
+    
+    def multi_query_search(
+        self,
+        queries: List[str],
+        user_id: str,
+        k: int = 10,
+        include_files: Optional[List[str]] = None,
+        exclude_files: Optional[List[str]] = None
+    ) -> List[List[Document]]:
+        """
+        Run several similarity searches in a single batched ChromaDB query.
+        
+        All queries are embedded in one call and sent to collection.query()
+        together, instead of one retriever round-trip per query.
+        
+        Args:
+            queries: Search queries (e.g. original + expanded alternatives)
+            user_id: The user ID (for multi-tenancy filtering)
+            k: Number of results per query
+            include_files: Optional list of filenames to restrict search to
+            exclude_files: Optional list of filenames to exclude from search
         
+        Returns:
+            One ranked list of documents per query, in the same order as `queries`.
+            Each document carries its ChromaDB chunk id in `Document.id` and its
+            cosine similarity to the query in `metadata["similarity_score"]`.
+        
+        Raises:
+            Exception: If embedding the queries or the ChromaDB query fails
+        """
+        if not queries:
+            return []
+        
+        filter_conditions = self._build_user_filter(user_id, include_files, exclude_files)
+        
+        try:
+            query_embeddings = self.vector_store.embeddings.embed_documents(queries)
+            raw = self.collection.query(
+                query_embeddings=query_embeddings,
+                n_results=k,
+                where=filter_conditions,
+                include=["documents", "metadatas", "distances"]
+            )
+        except Exception as e:
+            # Propagate: an outage must not look like "no relevant documents"
+            logger.error(f"❌ Multi-query search failed: {e}")
+            raise
+        
+        space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+        
+        # Chunk ids are kept on Document.id so callers can dedup without hashing content
+        results: List[List[Document]] = []
+        for ids, contents, metadatas, distances in zip(
+            raw["ids"], raw["documents"] or [], raw["metadatas"] or [], raw["distances"] or []
+        ):
+            results.append([
+                Document(
+                    id=chunk_id,
+                    page_content=content or "",
+                    metadata={
+                        **(metadata or {}),
+                        "similarity_score": _distance_to_similarity(distance, space),
+                    },
+                )
+                for chunk_id, content, metadata, distance in zip(ids, contents, metadatas, distances)
+            ])
+        
+        logger.debug(f"🔍 Multi-query search: {len(queries)} queries, {sum(len(r) for r in results)} results")
+        return results
+    
+    def _build_user_filter(
+        self,
+        user_id: str,
+        include_files: Optional[List[str]] = None,
+        exclude_files: Optional[List[str]] = None
+    ) -> dict:
+        """
+        Build the ChromaDB metadata filter for a user's documents.
+        
+        Note:
+            - If include_files provided: search ONLY in those files
+            - If exclude_files provided: search in all files EXCEPT those
+            - If both provided: include takes precedence (exclude is ignored)
+        """
         if include_files:
-            # Restrict to specific files only
-            filter_conditions = {
+            logger.debug(f"🔍 Retriever filter: INCLUDE files {include_files}")
+            return {
                 "$and": [
                     {"source": user_id},
                     {"original_filename": {"$in": include_files}}
                 ]
             }
-            logger.debug(f"🔍 Retriever filter: INCLUDE files {include_files}")
-        elif exclude_files:
-            # Exclude specific files
-            filter_conditions = {
+        if exclude_files:
+            logger.debug(f"🔍 Retriever filter: EXCLUDE files {exclude_files}")
+            return {
                 "$and": [
                     {"source": user_id},
                     {"original_filename": {"$nin": exclude_files}}
                 ]
             }
-            logger.debug(f"🔍 Retriever filter: EXCLUDE files {exclude_files}")
-        else:
-            logger.debug(f"🔍 Retriever filter: ALL files for user {user_id}")
-        
-        return self.vector_store.as_retriever(
-            search_kwargs={"filter": filter_conditions, "k": k}
-        )
+        logger.debug(f"🔍 Retriever filter: ALL files for user {user_id}")
+        return {"source": user_id}
     
     # --- DELETE Operations ---
     
@@ -7,6 +7,7 @@ Handles user registration and tier assignment via Firebase Custom Claims.
 from datetime import datetime, timezone
 from typing import List
 
+from app.core.firebase import get_firestore_client
 from app.core.logging import logger
 from app.schemas.auth_schema import (
     InvitationCodeRequest,
@@ -15,9 +16,10 @@ from app.schemas.auth_schema import (
     RegistrationResponse,
 )
 from app.services.email_service import get_email_service
+from app.services.tier_limit_service import invalidate_tier_cache
 from app.services.usage_tracking_service import get_usage_service
 from fastapi import APIRouter, Depends, Header, HTTPException
-from firebase_admin import auth, firestore
+from firebase_admin import auth
 from google.cloud.firestore import SERVER_TIMESTAMP
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -26,10 +28,10 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 _db = None
 
 def get_db():
-    """Get or initialize Firestore client (lazy initialization)."""
+    """Get or initialize Firestore client (lazy initialization, shared with other services)."""
     global _db
     if _db is None:
-        _db = firestore.client()
+        _db = get_firestore_client()
     return _db
 
 
@@ -100,6 +102,47 @@ _unlimited_emails_cache: List[str] | None = None
 _tier_limits_cache: dict | None = None
 
 
+DEFAULT_TIER_LIMITS = {
+    "FREE": {"max_queries_per_day": 20, "max_files": 5, "max_file_size_mb": 10},
+    "PRO": {"max_queries_per_day": 500, "max_files": 50, "max_file_size_mb": 50},
+    "UNLIMITED": {"max_queries_per_day": 9999, "max_files": 9999, "max_file_size_mb": 9999}
+}
+
+# Listener keeping the cached app config in sync with Firestore (see watch_app_config)
+_app_config_watch = None
+
+
+def _apply_app_config(data: dict | None) -> dict:
+    """
+    Store app_config/settings data (None = document missing) in the module caches.
+    
+    UNLIMITED tier limits are always injected with max values (9999).
+    """
+    global _unlimited_emails_cache, _tier_limits_cache
+    
+    if not data:
+        logger.warning("⚠️ app_config/settings not found, using defaults")
+        _tier_limits_cache = {tier: dict(limits) for tier, limits in DEFAULT_TIER_LIMITS.items()}
+        _unlimited_emails_cache = []
+    else:
+        # Get limits and ensure UNLIMITED tier has max values
+        limits = dict(data.get("limits", {}))
+        limits["UNLIMITED"] = dict(DEFAULT_TIER_LIMITS["UNLIMITED"])
+        _tier_limits_cache = limits
+        _unlimited_emails_cache = data.get("unlimited_emails", [])
+        
+        logger.info(
+            f"✅ Loaded app config: "
+            f"{len(_unlimited_emails_cache) if _unlimited_emails_cache else 0} unlimited emails, "
+            f"{len(_tier_limits_cache) if _tier_limits_cache else 0} tier limits"
+        )
+    
+    return {
+        "unlimited_emails": _unlimited_emails_cache,
+        "limits": _tier_limits_cache
+    }
+
+
 def load_app_config() -> dict:
     """
     Load application configuration from Firestore app_config/settings.
@@ -109,10 +152,9 @@ def load_app_config() -> dict:
     - limits: dict with tier limits (FREE, PRO, UNLIMITED)
     
     UNLIMITED tier limits are always injected with max values (9999).
-    Results are cached to reduce Firestore reads.
+    Served from the in-memory snapshot kept current by watch_app_config();
+    Firestore is only read when no snapshot has been loaded yet.
     """
-    global _unlimited_emails_cache, _tier_limits_cache
-    
     # Return cached values if available
     if _unlimited_emails_cache is not None and _tier_limits_cache is not None:
         return {
@@ -125,56 +167,50 @@ def load_app_config() -> dict:
         settings_ref = db.collection("app_config").document("settings")
         settings_doc = settings_ref.get()
         
-        if settings_doc.exists:
-            data = settings_doc.to_dict()
-            if data:
-                # Cache unlimited emails
-                _unlimited_emails_cache = data.get("unlimited_emails", [])
-                
-                # Get limits and ensure UNLIMITED tier has max values
-                limits = data.get("limits", {})
-                limits["UNLIMITED"] = {
-                    "max_queries_per_day": 9999,
-                    "max_files": 9999,
-                    "max_file_size_mb": 9999
-                }
-                _tier_limits_cache = limits
-                
-                logger.info(
-                    f"✅ Loaded app config: "
-                    f"{len(_unlimited_emails_cache) if _unlimited_emails_cache else 0} unlimited emails, "
-                    f"{len(_tier_limits_cache) if _tier_limits_cache else 0} tier limits"
-                )
-                return {
-                    "unlimited_emails": _unlimited_emails_cache,
-                    "limits": _tier_limits_cache
-                }
-        
-        # Document not found, use defaults
-        logger.warning("⚠️ app_config/settings not found, using defaults")
-        _unlimited_emails_cache = []
-        _tier_limits_cache = {
-            "FREE": {"max_queries_per_day": 20, "max_files": 5, "max_file_size_mb": 10},
-            "PRO": {"max_queries_per_day": 500, "max_files": 50, "max_file_size_mb": 50},
-            "UNLIMITED": {"max_queries_per_day": 9999, "max_files": 9999, "max_file_size_mb": 9999}
-        }
-        return {
-            "unlimited_emails": _unlimited_emails_cache,
-            "limits": _tier_limits_cache
-        }
+        return _apply_app_config(settings_doc.to_dict() if settings_doc.exists else None)
         
     except Exception as e:
         logger.error(f"❌ Error loading app config: {e}")
         return {
             "unlimited_emails": [],
-            "limits": {
-                "FREE": {"max_queries_per_day": 20, "max_files": 5, "max_file_size_mb": 10},
-                "PRO": {"max_queries_per_day": 500, "max_files": 50, "max_file_size_mb": 50},
-                "UNLIMITED": {"max_queries_per_day": 9999, "max_files": 9999, "max_file_size_mb": 9999}
-            }
+            "limits": {tier: dict(limits) for tier, limits in DEFAULT_TIER_LIMITS.items()}
         }
 
 
+def watch_app_config() -> None:
+    """
+    Keep the cached app config in sync with Firestore via a snapshot listener.
+    
+    Config edits (tier limits, unlimited emails) are pushed to this process,
+    so load_app_config() never needs a Firestore read in the steady state.
+    Called once at startup; failures leave the read-on-miss path in place.
+    """
+    global _app_config_watch
+    
+    if _app_config_watch is not None:
+        return
+    
+    def on_settings_snapshot(doc_snapshots, changes, read_time):
+        for doc in doc_snapshots:
+            _apply_app_config(doc.to_dict() if doc.exists else None)
+    
+    try:
+        settings_ref = get_db().collection("app_config").document("settings")
+        _app_config_watch = settings_ref.on_snapshot(on_settings_snapshot)
+        logger.info("👀 Watching app_config/settings for changes")
+    except Exception as e:
+        logger.error(f"❌ Could not watch app config: {e}")
+
+
+def stop_watching_app_config() -> None:
+    """Detach the app config snapshot listener (on shutdown)."""
+    global _app_config_watch
+    
+    if _app_config_watch is not None:
+        _app_config_watch.unsubscribe()
+        _app_config_watch = None
+
+
 def get_unlimited_emails() -> List[str]:
     """
     Retrieve list of emails with unlimited tier access from Firestore.
@@ -262,6 +298,7 @@ def _assign_tier_to_user(user_id: str, tier: str) -> RegistrationResponse:
     """
     try:
         auth.set_custom_user_claims(user_id, {"tier": tier})
+        invalidate_tier_cache(user_id)
         logger.info(f"✅ Custom claim set: {user_id} -> {tier}")
         return RegistrationResponse(
             status="success",
@@ -653,6 +690,7 @@ def set_user_tier_admin(
         
         # Set custom claim
         auth.set_custom_user_claims(user.uid, {"tier": tier})
+        invalidate_tier_cache(user.uid)
         
         logger.info(f"✅ Tier set successfully for {email}")
         
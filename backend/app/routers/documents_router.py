@@ -11,6 +11,7 @@ Handles document operations with security enhancements:
 All endpoints require valid Firebase Auth token in Authorization header.
 """
 
+import asyncio
 from io import BytesIO
 
 from app.config.security_constants import FILE_READ_CHUNK_SIZE
@@ -25,8 +26,8 @@ from app.schemas.rag_schema import (
 )
 from app.services.rag_orchestrator_service import RAGService, get_rag_service
 from app.services.tier_limit_service import (
-    check_file_count_limit,
-    get_max_upload_size_bytes,
+    get_user_tier_limits,
+    get_user_upload_checks,
 )
 from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile, status
 
@@ -53,15 +54,20 @@ async def upload_document(
     **Multi-tenancy:** Each document is tagged with verified `user_id` from Auth token.
     **Tier Limits:** Automatically enforced based on user's Firebase custom claims.
     """
-    # Get user's tier-based limits
-    max_upload_size_bytes = get_max_upload_size_bytes(user_id)
+    # Tier lookup (Firebase Auth) and document count (ChromaDB) are independent: run them concurrently
+    current_file_count, _ = await asyncio.gather(
+        asyncio.to_thread(rag_service.get_user_document_count, user_id),
+        asyncio.to_thread(get_user_tier_limits, user_id),
+    )
+    
+    # Get user's tier-based limits (single tier fetch, served from the tier cache warmed above)
+    upload_checks = get_user_upload_checks(user_id, current_file_count)
+    max_upload_size_bytes = upload_checks["max_upload_bytes"]
     max_upload_size_mb = get_safe_file_size_mb(max_upload_size_bytes)
+    max_files = upload_checks["max_files"]
     
     # Check file count limit
-    current_file_count = rag_service.get_user_document_count(user_id)
-    can_upload, max_files = check_file_count_limit(user_id, current_file_count)
-    
-    if not can_upload:
+    if not upload_checks["can_upload"]:
         logger.warning(f"⚠️ File limit reached | User: {user_id} | Files: {current_file_count}/{max_files}")
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
@@ -86,7 +92,7 @@ async def upload_document(
     
     # Validate file size (streaming to avoid loading entire file in memory)
     file_size = 0
-    file_chunks = []
+    file_buffer = BytesIO()
     
     try:
         while chunk := await file.read(FILE_READ_CHUNK_SIZE):
@@ -101,7 +107,7 @@ async def upload_document(
                     detail=f"File too large. Your plan allows maximum {max_upload_size_mb}MB, got {size_mb}MB"
                 )
             
-            file_chunks.append(chunk)
+            file_buffer.write(chunk)
         
     except HTTPException:
         raise
@@ -112,13 +118,12 @@ async def upload_document(
             detail=f"Failed to read file: {str(e)}",
         )
     
-    # Reconstruct file from chunks
-    file_content = b"".join(file_chunks)
-    reconstructed_file = BytesIO(file_content)
+    # Rewind the buffer (written chunk by chunk, no extra joined copy)
+    file_buffer.seek(0)
     
     # Create new UploadFile with sanitized filename
     safe_file = UploadFile(
-        file=reconstructed_file,
+        file=file_buffer,
         filename=safe_filename,
     )
 
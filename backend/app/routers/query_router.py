@@ -7,6 +7,8 @@ Handles query operations:
 - File filtering and query optimization
 """
 
+from typing import AsyncIterator, List, Optional, Tuple
+
 from app.core.auth import verify_firebase_token
 from app.core.logging import logger
 from app.schemas.rag_schema import (
@@ -15,15 +17,110 @@ from app.schemas.rag_schema import (
     SummarizeRequest,
     SummarizeResponse,
 )
+from app.services.answer_generation_service import AnswerStreamError
 from app.services.query_parser_service import query_parser_service
 from app.services.rag_orchestrator_service import RAGService, get_rag_service
-from app.services.usage_tracking_service import get_usage_service
+from app.services.usage_tracking_service import UsageTrackingService, get_usage_service
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from firebase_admin import auth
 
 router = APIRouter(prefix="/rag", tags=["query"])
 
 
+def _check_query_limit(user_id: str) -> Tuple[UsageTrackingService, int, str, int]:
+    """
+    Resolve the user's tier, enforce the daily query limit and count the query.
+
+    The query is counted up front; callers must call _refund_query() if the
+    answer cannot be delivered.
+
+    Raises:
+        HTTPException: 429 if the daily query limit has been reached
+
+    Returns:
+        Tuple of (usage_service, max_queries, tier, queries_used), where
+        queries_used includes this query
+    """
+    user = auth.get_user(user_id)
+    custom_claims = user.custom_claims or {}
+    tier = custom_claims.get("tier", "FREE")
+    
+    logger.info(f"🎫 User ID: {user_id}")
+    logger.info(f"🎫 User tier: {tier}")
+    logger.info(f"🎫 All custom claims: {custom_claims}")
+    
+    # Load tier limits from Firestore
+    from app.routers.auth_router import load_app_config
+    app_config = load_app_config()
+    
+    # CRITICAL FIX: Ensure UNLIMITED tier is always handled correctly
+    if tier == "UNLIMITED":
+        max_queries = 9999
+        logger.info(f"✅ UNLIMITED tier detected - max_queries set to {max_queries}")
+    else:
+        tier_limits = app_config["limits"].get(tier, app_config["limits"]["FREE"])
+        max_queries = tier_limits["max_queries_per_day"]
+        logger.info(f"📊 Tier limits for {tier}: {max_queries} queries/day")
+    
+    # Check the query limit and count this query (single Firestore transaction)
+    usage_service = get_usage_service()
+    can_query, queries_used = usage_service.check_and_increment_query(user_id, max_queries)
+    
+    logger.info(f"📊 Usage check result: can_query={can_query}, queries_used={queries_used}, max_queries={max_queries}")
+    
+    if not can_query:
+        logger.warning(f"⛔ Query limit exceeded for user {user_id} ({tier}): {queries_used}/{max_queries}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Daily query limit exceeded ({queries_used}/{max_queries}). Please upgrade your plan or try again tomorrow."
+        )
+    
+    logger.info(f"✅ Query limit check passed: {queries_used}/{max_queries} ({tier})")
+
+    return usage_service, max_queries, tier, queries_used
+
+
+def _refund_query(
+    usage_service: Optional[UsageTrackingService], user_id: str, queries_used: int
+) -> None:
+    """Give back a query counted by _check_query_limit() when answering failed."""
+    if usage_service is not None and queries_used > 0:
+        usage_service.refund_query(user_id)
+        logger.info(f"↩️ Query refunded for user {user_id} (answer not delivered)")
+
+
+def _extract_file_filters(
+    query: str, user_id: str, rag_service: RAGService
+) -> Tuple[str, Optional[List[str]], Optional[List[str]]]:
+    """
+    Extract include/exclude file filters from the query and clean it for RAG.
+
+    Returns:
+        Tuple of (cleaned_query, include_files, exclude_files)
+    """
+    available_documents = rag_service.get_user_documents(user_id)
+    available_filenames = [doc.filename for doc in available_documents]
+    
+    logger.info(f"📂 User has {len(available_filenames)} documents available")
+    logger.info("🔍 Extracting file filters and optimizing query...")
+    
+    # Extract file filters using OpenAI gpt-4o-mini
+    filter_result = query_parser_service.extract_file_filters(
+        query=query,
+        available_files=available_filenames
+    )
+    
+    query_for_rag = filter_result.cleaned_query
+    include_files = filter_result.include_files if filter_result.include_files else None
+    exclude_files = filter_result.exclude_files if filter_result.exclude_files else None
+    
+    logger.info(f"✅ File filters: include={include_files}, exclude={exclude_files}")
+    logger.info(f"🧹 Optimized query: {query_for_rag}")
+
+    return query_for_rag, include_files, exclude_files
+
+
 @router.post("/query/", response_model=QueryResponse)
 async def query_document(
     request: QueryRequest,
@@ -42,6 +139,8 @@ async def query_document(
 
     **Cost:** ~$0.00007 per query for optimization (7 cents per 1000 queries)
     """
+    usage_service: Optional[UsageTrackingService] = None
+    queries_used = 0
     try:
         # === DETAILED REQUEST LOGGING ===
         logger.info(f"{'='*80}")
@@ -62,64 +161,15 @@ async def query_document(
         logger.info(f"{'='*80}")
         
         # === STEP 0: CHECK QUERY LIMIT ===
-        user = auth.get_user(user_id)
-        custom_claims = user.custom_claims or {}
-        tier = custom_claims.get("tier", "FREE")
-        
-        logger.info(f"🎫 User ID: {user_id}")
-        logger.info(f"🎫 User tier: {tier}")
-        logger.info(f"🎫 All custom claims: {custom_claims}")
-        
-        # Load tier limits from Firestore
-        from app.routers.auth_router import load_app_config
-        app_config = load_app_config()
-        
-        # CRITICAL FIX: Ensure UNLIMITED tier is always handled correctly
-        if tier == "UNLIMITED":
-            max_queries = 9999
-            logger.info(f"✅ UNLIMITED tier detected - max_queries set to {max_queries}")
-        else:
-            tier_limits = app_config["limits"].get(tier, app_config["limits"]["FREE"])
-            max_queries = tier_limits["max_queries_per_day"]
-            logger.info(f"📊 Tier limits for {tier}: {max_queries} queries/day")
-        
-        # Check if user has exceeded their query limit
-        usage_service = get_usage_service()
-        can_query, queries_used = usage_service.check_query_limit(user_id, max_queries)
-        
-        logger.info(f"📊 Usage check result: can_query={can_query}, queries_used={queries_used}, max_queries={max_queries}")
-        
-        if not can_query:
-            logger.warning(f"⛔ Query limit exceeded for user {user_id} ({tier}): {queries_used}/{max_queries}")
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail=f"Daily query limit exceeded ({queries_used}/{max_queries}). Please upgrade your plan or try again tomorrow."
-            )
-        
-        logger.info(f"✅ Query limit check passed: {queries_used}/{max_queries} ({tier})")
+        usage_service, max_queries, tier, queries_used = _check_query_limit(user_id)
         
         # === STEP 1: EXTRACT FILE FILTERS AND OPTIMIZE QUERY ===
-        available_documents = rag_service.get_user_documents(user_id)
-        available_filenames = [doc.filename for doc in available_documents]
-        
-        logger.info(f"📂 User has {len(available_filenames)} documents available")
-        logger.info("🔍 Extracting file filters and optimizing query...")
-        
-        # Extract file filters using OpenAI gpt-4o-mini
-        filter_result = query_parser_service.extract_file_filters(
-            query=request.query,
-            available_files=available_filenames
+        query_for_rag, include_files, exclude_files = _extract_file_filters(
+            request.query, user_id, rag_service
         )
         
-        query_for_rag = filter_result.cleaned_query
-        include_files = filter_result.include_files if filter_result.include_files else None
-        exclude_files = filter_result.exclude_files if filter_result.exclude_files else None
-        
-        logger.info(f"✅ File filters: include={include_files}, exclude={exclude_files}")
-        logger.info(f"🧹 Optimized query: {query_for_rag}")
-        
         # === STEP 2: CALL RAG SERVICE WITH FILTERS ===
-        answer, sources = rag_service.answer_query(
+        answer, sources = await rag_service.answer_query(
             query_for_rag, 
             user_id,
             request.conversation_history,
@@ -128,9 +178,7 @@ async def query_document(
             exclude_files=exclude_files
         )
         
-        # === STEP 3: INCREMENT QUERY COUNTER ===
-        new_count = usage_service.increment_user_queries(user_id)
-        logger.info(f"📊 Query counter incremented: {new_count}/{max_queries} ({tier})")
+        logger.info(f"📊 Query counted: {queries_used}/{max_queries} ({tier})")
         
         # === DETAILED RESPONSE LOGGING ===
         logger.info(f"{'='*80}")
@@ -145,8 +193,10 @@ async def query_document(
 
         return QueryResponse(answer=answer, source_documents=sources)
     except HTTPException:
+        _refund_query(usage_service, user_id, queries_used)
         raise
     except Exception as e:
+        _refund_query(usage_service, user_id, queries_used)
         logger.error(f"{'='*80}")
         logger.error("❌ [ROUTER] QUERY PROCESSING ERROR")
         logger.error(f"{'='*80}")
@@ -161,6 +211,64 @@ async def query_document(
         )
 
 
+@router.post("/query/stream/")
+async def stream_query_document(
+    request: QueryRequest,
+    user_id: str = Depends(verify_firebase_token),
+    rag_service: RAGService = Depends(get_rag_service),
+):
+    """
+    **Query documents using RAG, streaming the answer as plain text.**
+
+    Same pipeline and limits as `/rag/query/`, but the answer is sent
+    incrementally as it is generated (sources block last), so clients can
+    render the first tokens without waiting for the full completion.
+    """
+    usage_service: Optional[UsageTrackingService] = None
+    queries_used = 0
+    try:
+        logger.info(f"📥 [ROUTER] NEW STREAMING QUERY REQUEST from {user_id}: {request.query}")
+
+        usage_service, max_queries, tier, queries_used = _check_query_limit(user_id)
+        query_for_rag, include_files, exclude_files = _extract_file_filters(
+            request.query, user_id, rag_service
+        )
+    except HTTPException:
+        _refund_query(usage_service, user_id, queries_used)
+        raise
+    except Exception as e:
+        _refund_query(usage_service, user_id, queries_used)
+        logger.error(f"❌ [ROUTER] Streaming query setup failed: {type(e).__name__}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to process query and retrieve answer.",
+        )
+
+    async def answer_stream() -> AsyncIterator[str]:
+        try:
+            async for fragment in rag_service.stream_answer_query(
+                query_for_rag,
+                user_id,
+                request.conversation_history,
+                request.output_language,
+                include_files=include_files,
+                exclude_files=exclude_files
+            ):
+                yield fragment
+        except AnswerStreamError as e:
+            # Generation failed mid-stream: the answer was not delivered, end with the fallback message
+            _refund_query(usage_service, user_id, queries_used)
+            yield str(e)
+            return
+        except Exception:
+            _refund_query(usage_service, user_id, queries_used)
+            raise
+
+        logger.info(f"📊 Query counted: {queries_used}/{max_queries} ({tier})")
+
+    return StreamingResponse(answer_stream(), media_type="text/plain; charset=utf-8")
+
+
 @router.post("/summarize/", response_model=SummarizeResponse)
 def summarize_conversation(
     request: SummarizeRequest,
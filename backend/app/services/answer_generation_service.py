@@ -12,8 +12,13 @@ Responsibilities:
 - Format sources and metadata
 """
 
-from typing import List, Optional, Tuple
+import asyncio
+import heapq
+import re
+from types import MappingProxyType
+from typing import AsyncIterator, Dict, Hashable, List, Optional, Tuple
 
+from app.core.config import settings
 from app.core.constants import QueryConstants
 from app.core.logging import logger
 from app.repositories.vector_store_repository import VectorStoreRepository
@@ -22,30 +27,57 @@ from app.services.language_service import LanguageService
 from app.services.query_expansion_service import QueryExpansionService
 from app.services.reranking_service import RerankingService
 from app.services.translation_service import TranslationService
+from langchain_core.documents import Document
 from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+# Static system prompt, built once and sent as a separate message so the
+# provider can serve the stable prefix from its prompt cache.
+RAG_SYSTEM_MESSAGE = SystemMessage(content=settings.RAG_SYSTEM_PROMPT)
+
+# Sentence boundary used to flush streamed tokens in translatable groups
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Sources block header per language (emoji + translated label + first bullet; read-only, built once)
+_SOURCES_HEADERS = MappingProxyType({
+    code: f"\n\n📚 {label}:\n- "
+    for code, label in (
+        ("IT", "Fonti"),
+        ("EN", "Sources"),
+        ("FR", "Sources"),
+        ("DE", "Quellen"),
+        ("ES", "Fuentes"),
+        ("PT", "Fontes"),
+    )
+})
 
 
 def _build_rag_prompt(context: str, question: str) -> str:
-    """Build RAG prompt without conversation history."""
-    from app.core.config import settings
+    """Build the user part of the RAG prompt without conversation history."""
     return (
-        f"{settings.RAG_SYSTEM_PROMPT}\n\n"
         f"Context: {context}\n\n"
         f"Question: {question}"
     )
 
 
 def _build_rag_prompt_with_history(context: str, history: str, question: str) -> str:
-    """Build RAG prompt with conversation history."""
-    from app.core.config import settings
+    """Build the user part of the RAG prompt with conversation history."""
     return (
-        f"{settings.RAG_SYSTEM_PROMPT}\n\n"
         f"Conversation History:\n{history}\n\n"
         f"Context: {context}\n\n"
         f"New Question: {question}"
     )
 
 
+class AnswerStreamError(Exception):
+    """
+    Answer generation failed after streaming started.
+
+    str(error) is the user-facing fallback message, already in the user's
+    language. Lets the caller refund the query before delivering it.
+    """
+
+
 class AnswerGenerationService:
     """
     Specialized service for answer generation operations.
@@ -81,7 +113,7 @@ class AnswerGenerationService:
         self.query_expansion_service = query_expansion_service
         self.reranking_service = reranking_service
     
-    def generate_answer(
+    async def generate_answer(
         self, 
         query: str, 
         user_id: str, 
@@ -105,7 +137,127 @@ class AnswerGenerationService:
             Tuple of (formatted_answer_with_sources, list_of_source_filenames)
         """
         conversation_history = conversation_history or []
-        
+
+        query_language_code, target_response_language, context_docs = await self._prepare_context(
+            query, user_id, output_language, include_files, exclude_files
+        )
+
+        # Handle no documents found
+        if not context_docs:
+            return self._handle_no_documents(query_language_code)
+
+        # Generate LLM response
+        final_answer, source_documents = await self._generate_llm_response(
+            query, context_docs, conversation_history, target_response_language
+        )
+
+        logger.info(f"✅ Answer generated in {target_response_language} (Sources: {len(source_documents)})")
+        return final_answer, source_documents
+
+    async def stream_answer(
+        self,
+        query: str,
+        user_id: str,
+        conversation_history: Optional[List[ConversationMessage]] = None,
+        output_language: Optional[str] = None,
+        include_files: Optional[List[str]] = None,
+        exclude_files: Optional[List[str]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream the RAG answer as it is generated.
+
+        Tokens are buffered into sentence-sized groups; when the answer must be
+        translated, each group is translated as soon as it is complete so that
+        translation overlaps with generation. The sources block is emitted last.
+
+        Args:
+            query: The user's question (potentially reformulated)
+            user_id: User identifier for multi-tenancy
+            conversation_history: Optional conversation context
+            output_language: Optional target language for response
+            include_files: Optional list of filenames to restrict search
+            exclude_files: Optional list of filenames to exclude
+
+        Yields:
+            Answer text fragments, followed by the formatted sources suffix
+
+        Raises:
+            AnswerStreamError: If LLM generation fails (carries the fallback message)
+        """
+        conversation_history = conversation_history or []
+
+        query_language_code, target_language, context_docs = await self._prepare_context(
+            query, user_id, output_language, include_files, exclude_files
+        )
+
+        if not context_docs:
+            fallback_answer, _ = self._handle_no_documents(query_language_code)
+            yield fallback_answer
+            return
+
+        messages = self._build_llm_messages(query, context_docs, conversation_history, target_language)
+        # No post-translation for English or for codes the translator has no name for
+        translate: Optional[bool] = (
+            False if target_language == "EN" or not self.translation_service.is_supported(target_language) else None
+        )
+        buffer = ""
+
+        try:
+            logger.info("💬 Streaming LLM answer generation...")
+            async for chunk in self.llm.astream(messages):
+                buffer += str(chunk.content)
+                parts = _SENTENCE_END.split(buffer)
+                if len(parts) < 2:
+                    continue
+                buffer = parts.pop()
+                sentences = " ".join(parts)
+                if translate is None:
+                    # Decide once, on the first complete sentences, whether the LLM ignored the language instruction
+                    translate = self.language_service.detect_language(sentences).upper() == "EN"
+                if translate:
+                    sentences = await self.translation_service.atranslate_answer_back(sentences, target_language)
+                yield sentences + " "
+
+            if buffer.strip():
+                if translate is None:
+                    translate = self.language_service.detect_language(buffer).upper() == "EN"
+                if translate:
+                    buffer = await self.translation_service.atranslate_answer_back(buffer, target_language)
+                yield buffer.strip()
+
+            source_documents = self._source_filenames(context_docs)
+            yield self._format_sources_suffix(source_documents, target_language)
+            logger.info(f"✅ Answer streamed in {target_language} (Sources: {len(source_documents)})")
+
+        except Exception as e:
+            logger.error(f"❌ Error during LLM streaming: {e}")
+            raise AnswerStreamError(
+                self.language_service.translate_answer_back(
+                    "An unexpected error occurred during answer generation.", query_language_code
+                )
+            ) from e
+
+    async def _prepare_context(
+        self,
+        query: str,
+        user_id: str,
+        output_language: Optional[str],
+        include_files: Optional[List[str]],
+        exclude_files: Optional[List[str]]
+    ) -> Tuple[str, str, List]:
+        """
+        Detect languages, translate the query for retrieval and fetch reranked context.
+
+        Args:
+            query: The user's question (potentially reformulated)
+            user_id: User identifier for multi-tenancy
+            output_language: Optional target language for response
+            include_files: Optional list of filenames to restrict search
+            exclude_files: Optional list of filenames to exclude
+
+        Returns:
+            Tuple of (query_language_code, target_response_language, context_docs)
+        """
         logger.info(f"🔍 Starting RAG query for user: {user_id}")
         logger.info(f"📝 Query: {query[:100]}{'...' if len(query) > 100 else ''}")
         
@@ -122,29 +274,18 @@ class AnswerGenerationService:
 
         # Translate query for retrieval (English works best)
         if query_language_code != "EN":
-            translated_query = self.translation_service.translate_query_to_language(query, "EN")
+            translated_query = await self.translation_service.atranslate_query_to_language(query, "EN")
             logger.info(f"🔄 Translated for retrieval: {translated_query[:100]}")
         else:
             translated_query = query
 
         # Retrieve documents with query expansion
-        context_docs = self._retrieve_and_rerank(
+        context_docs = await self._retrieve_and_rerank(
             translated_query, query, user_id, include_files, exclude_files
         )
+        return query_language_code, target_response_language, context_docs
 
-        # Handle no documents found
-        if not context_docs:
-            return self._handle_no_documents(query_language_code)
-
-        # Generate LLM response
-        final_answer, source_documents = self._generate_llm_response(
-            query, context_docs, conversation_history, target_response_language
-        )
-
-        logger.info(f"✅ Answer generated in {target_response_language} (Sources: {len(source_documents)})")
-        return final_answer, source_documents
-
-    def _retrieve_and_rerank(
+    async def _retrieve_and_rerank(
         self,
         translated_query: str,
         original_query: str,
@@ -166,43 +307,55 @@ class AnswerGenerationService:
             List of reranked documents
         """
         # Generate alternative queries
-        alternative_queries = self.query_expansion_service.generate_alternative_queries(translated_query)
+        alternative_queries = await self.query_expansion_service.agenerate_alternative_queries(translated_query)
         logger.info(f"📝 Generated {len(alternative_queries)} alternative queries")
         
         all_queries = [translated_query] + alternative_queries
         
-        # Setup retriever
-        retriever = self.repository.get_retriever(
-            user_id=user_id,
-            k=QueryConstants.BASE_RETRIEVAL_K,  # Large pool for comprehensive search
-            include_files=include_files,
-            exclude_files=exclude_files
+        # Parallel retrieval with Reciprocal Rank Fusion (RRF) scoring
+        logger.info(f"🔎 Batched retrieval for {len(all_queries)} queries")
+        rrf_scores: Dict[Hashable, float] = {}
+        docs_by_id: Dict[Hashable, Document] = {}
+
+        # One embedding call + one ChromaDB query for all queries (blocking, so off the event loop)
+        docs_per_query = await asyncio.to_thread(
+            self.repository.multi_query_search,
+            all_queries,
+            user_id,
+            QueryConstants.BASE_RETRIEVAL_K,  # Large pool for comprehensive search
+            include_files,
+            exclude_files
         )
 
-        # Parallel retrieval
-        logger.info(f"🔎 Parallel retrieval for {len(all_queries)} queries")
-        all_retrieved_docs = []
-        doc_ids = set()
-
-        for idx, q in enumerate(all_queries, 1):
-            docs = retriever.invoke(q)
+        for idx, docs in enumerate(docs_per_query, 1):
             logger.info(f"🔎 Query {idx}/{len(all_queries)}: Found {len(docs)} chunks")
 
-            for doc in docs:
-                metadata_tuple = tuple(sorted(doc.metadata.items()))
-                doc_id = hash((doc.page_content, metadata_tuple))
-                
-                if doc_id not in doc_ids:
-                    all_retrieved_docs.append(doc)
-                    doc_ids.add(doc_id)
+            for rank, doc in enumerate(docs):
+                # Chunk id from ChromaDB; cheap (filename, content hash) key as fallback
+                doc_id = doc.id or (doc.metadata.get("original_filename"), hash(doc.page_content))
+
+                rrf_scores[doc_id] = rrf_scores.get(doc_id, 0.0) + 1.0 / (QueryConstants.RRF_K + rank)
+                kept = docs_by_id.setdefault(doc_id, doc)
+
+                # Keep the best (max over queries) similarity for the reranker's vector score
+                similarity = doc.metadata.get("similarity_score")
+                if kept is not doc and similarity is not None:
+                    kept.metadata["similarity_score"] = max(
+                        kept.metadata.get("similarity_score", similarity), similarity
+                    )
 
-        unique_files = {doc.metadata.get("original_filename", "Unknown") for doc in all_retrieved_docs}
-        logger.info(f"📚 Retrieved {len(all_retrieved_docs)} chunks from {len(unique_files)} files")
+        unique_files = {doc.metadata.get("original_filename", "Unknown") for doc in docs_by_id.values()}
+        logger.info(f"📚 Retrieved {len(docs_by_id)} chunks from {len(unique_files)} files")
+
+        # Prune candidates by fused rank before the (expensive) reranking stage (partial top-k, no full sort)
+        top_ids = heapq.nlargest(QueryConstants.RERANK_CANDIDATE_K, rrf_scores, key=rrf_scores.__getitem__)
+        candidate_docs = [docs_by_id[doc_id] for doc_id in top_ids]
+        logger.info(f"🧮 RRF fusion kept {len(candidate_docs)}/{len(docs_by_id)} candidates")
 
         # Rerank to top N
         logger.info(f"🎯 Reranking documents → top {QueryConstants.FINAL_RETRIEVAL_K}")
         context_docs = self.reranking_service.rerank_documents(
-            documents=all_retrieved_docs,
+            documents=candidate_docs,
             original_query=original_query,
             alternative_queries=alternative_queries,
             top_n=QueryConstants.FINAL_RETRIEVAL_K
@@ -211,7 +364,7 @@ class AnswerGenerationService:
         
         return context_docs
 
-    def _generate_llm_response(
+    async def _generate_llm_response(
         self,
         query: str,
         context_docs: List,
@@ -230,6 +383,58 @@ class AnswerGenerationService:
         Returns:
             Tuple of (formatted_answer, source_files)
         """
+        messages = self._build_llm_messages(query, context_docs, conversation_history, target_language)
+
+        try:
+            # LLM invocation
+            logger.info("💬 Invoking LLM for answer generation...")
+            llm_response = (await self.llm.ainvoke(messages)).content
+            final_answer = str(llm_response).strip()
+
+            # Extract source files
+            source_documents = self._source_filenames(context_docs)
+
+            # Translate if needed
+            if (
+                target_language != "EN"
+                and self.translation_service.is_supported(target_language)
+                and self.language_service.detect_language(final_answer).upper() == "EN"
+            ):
+                final_answer = await self.translation_service.atranslate_answer_back(final_answer, target_language)
+                logger.debug(f"🔄 Answer translated to {target_language}")
+
+            # Append sources
+            final_answer += self._format_sources_suffix(source_documents, target_language)
+
+            return final_answer, source_documents
+
+        except Exception as e:
+            logger.error(f"❌ Error during LLM invocation: {e}")
+            query_lang = self.language_service.detect_language(query).upper()
+            fallback = self.language_service.translate_answer_back(
+                "An unexpected error occurred during answer generation.", query_lang
+            )
+            return fallback, []
+
+    def _build_llm_messages(
+        self,
+        query: str,
+        context_docs: List,
+        conversation_history: List[ConversationMessage],
+        target_language: str
+    ) -> List[BaseMessage]:
+        """
+        Build the chat messages for answer generation.
+        
+        Args:
+            query: User's question
+            context_docs: Retrieved and reranked documents
+            conversation_history: Conversation messages
+            target_language: Target response language code
+            
+        Returns:
+            Static system message followed by the per-query human message
+        """
         # Format conversation history
         history_formatted = []
         for msg in conversation_history:
@@ -264,37 +469,33 @@ class AnswerGenerationService:
             f"Do not include source citations; they will be handled separately."
         )
 
-        try:
-            # LLM invocation
-            logger.info("💬 Invoking LLM for answer generation...")
-            llm_response = self.llm.invoke(final_llm_query).content
-            final_answer = str(llm_response).strip()
-
-            # Extract source files
-            source_documents = sorted({
-                doc.metadata.get("original_filename", "Unknown") for doc in context_docs
-            })
-
-            # Translate if needed
-            if target_language != "EN" and self.language_service.detect_language(final_answer).upper() == "EN":
-                final_answer = self.translation_service.translate_answer_back(final_answer, target_language)
-                logger.debug(f"🔄 Answer translated to {target_language}")
+        return [RAG_SYSTEM_MESSAGE, HumanMessage(content=final_llm_query)]
 
-            # Append sources
-            if source_documents:
-                sources_label = self._get_sources_label(target_language)
-                sources_list = "\n".join([f"- {doc}" for doc in source_documents])
-                final_answer = f"{final_answer}\n\n📚 {sources_label}:\n{sources_list}"
-
-            return final_answer, source_documents
+    @staticmethod
+    def _source_filenames(context_docs: List) -> List[str]:
+        """
+        Unique source filenames of the context documents, sorted.
+        
+        A set comprehension dedupes in one pass without an intermediate list;
+        the sort then runs over the unique names only.
+        """
+        return sorted({doc.metadata.get("original_filename", "Unknown") for doc in context_docs})
 
-        except Exception as e:
-            logger.error(f"❌ Error during LLM invocation: {e}")
-            query_lang = self.language_service.detect_language(query).upper()
-            fallback = self.language_service.translate_answer_back(
-                "An unexpected error occurred during answer generation.", query_lang
-            )
-            return fallback, []
+    def _format_sources_suffix(self, source_documents: List[str], target_language: str) -> str:
+        """
+        Format the translated sources block appended to answers.
+        
+        Args:
+            source_documents: Sorted source filenames
+            target_language: Target response language code
+            
+        Returns:
+            Sources block, or an empty string when there are no sources
+        """
+        if not source_documents:
+            return ""
+        header = _SOURCES_HEADERS.get(target_language, _SOURCES_HEADERS["EN"])
+        return header + "\n- ".join(source_documents)
 
     def _handle_no_documents(self, query_language: str) -> Tuple[str, List[str]]:
         """
@@ -311,23 +512,3 @@ class AnswerGenerationService:
         translated_fallback = self.language_service.translate_answer_back(fallback_answer, query_language)
         logger.info(f"✅ Fallback answer translated to {query_language}")
         return translated_fallback, []
-
-    def _get_sources_label(self, language_code: str) -> str:
-        """
-        Get translated 'Sources' label.
-        
-        Args:
-            language_code: ISO language code (IT, EN, FR, etc.)
-            
-        Returns:
-            Translated label for 'Sources'
-        """
-        sources_translations = {
-            "IT": "Fonti",
-            "EN": "Sources",
-            "FR": "Sources",
-            "DE": "Quellen",
-            "ES": "Fuentes",
-            "PT": "Fontes"
-        }
-        return sources_translations.get(language_code, "Sources")
@@ -12,11 +12,15 @@ Responsibilities:
 - Provide language preview for user confirmation
 """
 
+import asyncio
+import contextlib
 import os
 import tempfile
 import time
 from typing import List, Optional, Tuple
 
+import aiofiles
+from app.core.constants import DocumentConstants
 from app.core.logging import logger
 from app.repositories.vector_store_repository import VectorStoreRepository
 from app.services.document_classifier_service import (
@@ -24,8 +28,8 @@ from app.services.document_classifier_service import (
     DocumentClassifierService,
 )
 from app.services.language_service import LanguageService
+from app.services.pdf_extraction_service import pdf_extraction_service
 from fastapi import UploadFile
-from langchain_community.document_loaders import UnstructuredPDFLoader
 from langchain_community.vectorstores.utils import filter_complex_metadata
 from langchain_core.documents import Document
 from langchain_text_splitters import Language, RecursiveCharacterTextSplitter
@@ -82,22 +86,12 @@ class DocumentIndexingService:
         # Store the document language (user-provided or will be detected)
         doc_language = document_language.upper() if document_language else None
 
-        # Create a secure temporary file with PDF suffix
-        # This prevents path injection attacks by not using user-controlled filename directly
-        temp_fd, temp_file_path = tempfile.mkstemp(suffix=".pdf", prefix="upload_")
+        # Stream the upload into a secure temporary file (never the whole PDF in memory)
+        temp_file_path = await self._write_upload_to_temp_file(file, prefix="upload_")
         
         try:
-            content = await file.read()
-            if not content:
-                raise ValueError("The uploaded file is empty.")
-
-            # Write content to the secure temporary file
-            os.write(temp_fd, content)
-            os.close(temp_fd)  # Close the file descriptor before passing to loader
-
-            # 2. Load PDF using UnstructuredPDFLoader
-            loader = UnstructuredPDFLoader(temp_file_path, mode="elements")
-            documents = loader.load()
+            # 2. Load PDF (PyMuPDF, Unstructured fallback for scanned PDFs) off the event loop
+            documents = await asyncio.to_thread(pdf_extraction_service.load, temp_file_path)
 
             # 3. Classify document to determine chunking strategy
             full_text_preview = " ".join([doc.page_content for doc in documents[:15]])[:5000]
@@ -137,9 +131,45 @@ class DocumentIndexingService:
         finally:
             # Clean up the secure temporary file
             # temp_file_path is from tempfile.mkstemp(), already an absolute path
-            if os.path.exists(temp_file_path):
+            # (one unlink; no exists() check racing with it)
+            with contextlib.suppress(FileNotFoundError):
                 os.remove(temp_file_path)
 
+    async def _write_upload_to_temp_file(self, file: UploadFile, prefix: str) -> str:
+        """
+        Stream an upload into a secure temporary PDF file in fixed-size chunks.
+        
+        The temporary name comes from tempfile.mkstemp(), never from the
+        user-controlled filename, which prevents path injection attacks.
+        
+        Args:
+            file: The uploaded PDF file
+            prefix: Temporary file name prefix
+            
+        Returns:
+            Absolute path of the temporary file (caller must remove it)
+            
+        Raises:
+            ValueError: If the uploaded file is empty
+        """
+        temp_fd, temp_file_path = tempfile.mkstemp(suffix=".pdf", prefix=prefix)
+        os.close(temp_fd)
+        
+        try:
+            bytes_written = 0
+            async with aiofiles.open(temp_file_path, "wb") as out:
+                while chunk := await file.read(DocumentConstants.TEMP_FILE_WRITE_CHUNK_SIZE):
+                    await out.write(chunk)
+                    bytes_written += len(chunk)
+            
+            if bytes_written == 0:
+                raise ValueError("The uploaded file is empty.")
+        except Exception:
+            os.remove(temp_file_path)
+            raise
+        
+        return temp_file_path
+
     def _apply_chunking_strategy(
         self,
         documents: List[Document],
@@ -213,40 +243,73 @@ class DocumentIndexingService:
         final_chunks: List[Document] = []
         current_chapter = "Document Start"
         uploaded_at = int(time.time() * 1000)  # Milliseconds timestamp
-        detected_language = doc_language
+        detected_language = doc_language or self._detect_chunks_language(chunks)
 
-        for chunk in chunks:
+        # Document-level metadata shared by every chunk (built once)
+        document_metadata = {
+            "source": user_id,
+            "original_filename": filename,
+            "original_language_code": detected_language,
+            "uploaded_at": uploaded_at,
+        }
+
+        for chunk_index, chunk in enumerate(chunks):
             # Track hierarchical structure from document elements
             element_type = chunk.metadata.get("type", "NarrativeText")
+            is_heading = "Title" in element_type or "Header" in element_type
 
             # Update chapter tracking when encountering titles or headers
-            if "Title" in element_type or "Header" in element_type:
+            if is_heading:
                 current_chapter = chunk.page_content.strip()
-                chunk.metadata["element_type"] = element_type
-
-            # Use provided language or auto-detect from content
-            if detected_language is None and len(chunk.page_content) > 50:
-                # Auto-detect language from first substantial chunk
-                detected_lang_code = self.language_service.detect_language(chunk.page_content)
-                detected_language = detected_lang_code.upper()
-                logger.debug(f"🌍 Auto-detected document language: {detected_language}")
-            elif detected_language is None:
-                detected_language = "EN"  # Default fallback
 
-            # Add structural, language, and user metadata to every chunk
-            chunk.metadata["chapter_title"] = current_chapter
-            chunk.metadata["source"] = user_id
-            chunk.metadata["original_filename"] = filename
-            chunk.metadata["original_language_code"] = detected_language
-            chunk.metadata["uploaded_at"] = uploaded_at
+            # Add structural, language, and user metadata to every chunk in one dict build
+            chunk.metadata = {
+                **chunk.metadata,
+                **document_metadata,
+                "chapter_title": current_chapter,
+                "chunk_index": chunk_index,
+            }
+            if is_heading:
+                chunk.metadata["element_type"] = element_type
 
             final_chunks.append(chunk)
 
         return final_chunks
 
+    def _detect_chunks_language(
+        self,
+        chunks: List[Document],
+        sample_size: int = 5000
+    ) -> str:
+        """
+        Detect the document language once, from the leading text of its chunks.
+        
+        Args:
+            chunks: Chunked documents
+            sample_size: Maximum characters of leading text to analyze
+            
+        Returns:
+            Uppercase language code ("EN" if there is not enough text)
+        """
+        sample_parts: List[str] = []
+        sample_length = 0
+        for chunk in chunks:
+            sample_parts.append(chunk.page_content)
+            sample_length += len(chunk.page_content)
+            if sample_length >= sample_size:
+                break
+        sample = " ".join(sample_parts)[:sample_size]
+        
+        if len(sample.strip()) <= 50:
+            return "EN"  # Default fallback
+        
+        detected_language = self.language_service.detect_language(sample).upper()
+        logger.debug(f"🌍 Auto-detected document language: {detected_language}")
+        return detected_language
+
     def _batch_index_chunks(self, chunks: List[Document]) -> int:
         """
-        Index chunks in optimized batches for better throughput.
+        Index chunks: one batched embedding pass, then batched writes (via repository).
         
         Args:
             chunks: Chunks to index
@@ -255,32 +318,9 @@ class DocumentIndexingService:
             Total number of chunks indexed
         """
         start_time = time.time()
-        total_chunks_indexed = 0
+        logger.info(f"📊 Starting embedding generation for {len(chunks)} chunks")
         
-        # Optimized batch size for better throughput
-        OPTIMIZED_BATCH_SIZE = 500
-        total_batches = (len(chunks) + OPTIMIZED_BATCH_SIZE - 1) // OPTIMIZED_BATCH_SIZE
-        
-        logger.info(
-            f"📊 Starting embedding generation for {len(chunks)} chunks in {total_batches} batches"
-        )
-        
-        # Process in batches for better progress visibility
-        for batch_idx, i in enumerate(range(0, len(chunks), OPTIMIZED_BATCH_SIZE), 1):
-            batch = chunks[i : i + OPTIMIZED_BATCH_SIZE]
-            batch_start = time.time()
-            
-            # Single upsert operation for entire batch via repository
-            self.repository.add_documents(batch)
-            
-            batch_time = time.time() - batch_start
-            total_chunks_indexed += len(batch)
-            throughput = len(batch) / batch_time if batch_time > 0 else 0
-            
-            logger.info(
-                f"⚡ Batch {batch_idx}/{total_batches}: {len(batch)} chunks in {batch_time:.2f}s "
-                f"({throughput:.1f} chunks/s)"
-            )
+        total_chunks_indexed = self.repository.add_documents(chunks)
         
         elapsed = time.time() - start_time
         overall_throughput = len(chunks) / elapsed if elapsed > 0 else 0
@@ -306,22 +346,13 @@ class DocumentIndexingService:
         Returns:
             Tuple of (language_code, confidence_score)
         """
-        # Create a secure temporary file with PDF suffix
-        # This prevents path injection attacks by not using user-controlled filename
-        temp_fd, temp_file_path = tempfile.mkstemp(suffix=".pdf", prefix="preview_")
+        temp_file_path = await self._write_upload_to_temp_file(file, prefix="preview_")
         
         try:
-            content = await file.read()
-            if not content:
-                raise ValueError("The uploaded file is empty.")
-
-            # Write content to the secure temporary file
-            os.write(temp_fd, content)
-            os.close(temp_fd)  # Close the file descriptor before passing to loader
-
             # Load first pages only for preview
-            loader = UnstructuredPDFLoader(temp_file_path, mode="elements")
-            documents = loader.load()
+            documents = await asyncio.to_thread(
+                pdf_extraction_service.load, temp_file_path, 3
+            )
             
             # Extract preview text (first 3 pages or 2000 chars)
             preview_text = " ".join([doc.page_content for doc in documents[:3]])[:2000]
@@ -343,5 +374,6 @@ class DocumentIndexingService:
         finally:
             # Clean up the secure temporary file
             # temp_file_path is from tempfile.mkstemp(), already an absolute path
-            if os.path.exists(temp_file_path):
+            # (one unlink; no exists() check racing with it)
+            with contextlib.suppress(FileNotFoundError):
                 os.remove(temp_file_path)
@@ -1,8 +1,13 @@
 # backend/app/services/language_service.py
 
-from langdetect import detect
+from typing import Optional
+
+from langdetect import DetectorFactory, detect, detect_langs
 from translate import Translator
 
+# Seed fisso: langdetect è probabilistico, così lo stesso testo dà sempre lo stesso risultato
+DetectorFactory.seed = 0
+
 # TARGET LANGUAGE for RAG retrieval and indexing (forcing consistency)
 RETRIEVAL_TARGET_LANGUAGE = "English"
 
@@ -34,6 +39,31 @@ class LanguageService:
             print(f"Error detecting language with langdetect: {e}. Falling back to EN.")
             return "EN"  # Fallback sicuro
 
+    def detect_language_confident(self, content: str, min_probability: float = 0.9) -> Optional[str]:
+        """
+        Rileva il codice lingua solo se langdetect è sicuro, senza fallback su 'EN'.
+
+        Args:
+            content: Testo da analizzare
+            min_probability: Probabilità minima della lingua più probabile
+
+        Returns:
+            Codice a due lettere in maiuscolo (es. 'IT'), o None se incerto
+        """
+        if not content or len(content.strip()) < 5:
+            return None
+
+        try:
+            best = detect_langs(content)[0]
+        except Exception:
+            # Testo troppo corto/ambiguo per langdetect
+            return None
+
+        if best.prob < min_probability:
+            return None
+        # 'zh-cn' -> 'ZH'
+        return best.lang[:2].upper()
+
     def translate_to_target(self, content: str) -> str:
         """Traduce il contenuto al linguaggio target (di default: English) per l'indicizzazione."""
         # NOTA: Questo metodo non è più usato in rag_service, ma mantenuto per la traduzione della risposta.
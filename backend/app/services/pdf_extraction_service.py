@@ -0,0 +1,224 @@
+"""
+PDF Extraction Service
+
+Fast raw-text PDF loading based on PyMuPDF, with UnstructuredPDFLoader kept
+as a fallback for scanned/image PDFs that need OCR or layout analysis.
+
+Responsibilities:
+- Extract page text and tables (as Markdown) with PyMuPDF
+- Tag titles by font size so chapter tracking works without layout models
+- Parallelize extraction of large documents across processes
+- Fall back to Unstructured when the PDF has (almost) no text layer
+"""
+
+import multiprocessing
+import statistics
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+import fitz  # PyMuPDF
+from app.core.config import settings
+from app.core.constants import DocumentConstants
+from app.core.logging import logger
+from langchain_community.document_loaders import UnstructuredPDFLoader
+from langchain_core.documents import Document
+
+# (page_number, element_type, text, max_font_size) as produced by the extraction workers
+PageElement = Tuple[int, str, str, float]
+
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[PageElement]:
+    """
+    Extract text blocks (with their largest font size) and Markdown tables
+    from pages [start, end).
+
+    Module-level so it can be dispatched to a ProcessPoolExecutor worker.
+    """
+    elements: List[PageElement] = []
+    with fitz.open(file_path) as pdf:
+        for page_index in range(start, min(end, pdf.page_count)):
+            page = pdf[page_index]
+            page_number = page_index + 1
+
+            for block in page.get_text("dict")["blocks"]:
+                if block.get("type") != 0:  # Skip image blocks
+                    continue
+                lines: List[str] = []
+                max_font_size = 0.0
+                for line in block["lines"]:
+                    spans = [span for span in line["spans"] if span["text"].strip()]
+                    if not spans:
+                        continue
+                    lines.append("".join(span["text"] for span in line["spans"]))
+                    max_font_size = max(max_font_size, max(span["size"] for span in spans))
+                text = "\n".join(lines).strip()
+                if text:
+                    elements.append((page_number, "Text", text, max_font_size))
+
+            for table in page.find_tables().tables:
+                markdown = table.to_markdown().strip()
+                if markdown:
+                    elements.append((page_number, "Table", markdown, 0.0))
+    return elements
+
+
+class PDFExtractionService:
+    """
+    Service for turning PDF files into LangChain documents.
+
+    Large documents are extracted on one long-lived process pool, created on
+    first use and closed by shutdown() when the application stops. Workers are
+    started with "spawn": forking a multithreaded server process can deadlock.
+    """
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Return the shared process pool, creating it on first use."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+                logger.info("⚙️ PDF extraction process pool started")
+            return self._executor
+
+    def shutdown(self) -> None:
+        """Shut down the shared process pool (no-op if it was never started)."""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+            logger.info("✅ PDF extraction process pool stopped")
+
+    def load(self, file_path: str, max_pages: Optional[int] = None) -> List[Document]:
+        """
+        Load a PDF into page-level documents.
+
+        Uses PyMuPDF by default; Unstructured is used when forced via
+        settings.USE_UNSTRUCTURED_PDF_LOADER or when the text layer is too
+        small to be a text-based PDF (likely scanned, needs OCR).
+
+        Args:
+            file_path: Path to the PDF on disk
+            max_pages: Optional limit on pages to extract (e.g. for previews)
+
+        Returns:
+            List of documents with page_number and element type
+            ("Title", "NarrativeText", "Table") metadata
+        """
+        if settings.USE_UNSTRUCTURED_PDF_LOADER:
+            return self._load_with_unstructured(file_path, max_pages)
+
+        elements = self._extract_elements(file_path, max_pages)
+        total_text = sum(len(text) for _, _, text, _ in elements)
+
+        if total_text < DocumentConstants.PDF_MIN_TEXT_CHARS:
+            logger.info(
+                f"🖼️ Only {total_text} chars of text found - falling back to Unstructured (OCR)"
+            )
+            return self._load_with_unstructured(file_path, max_pages)
+
+        documents = self._to_documents(elements, file_path)
+        logger.info(f"📄 PyMuPDF extracted {len(documents)} elements ({total_text} chars)")
+        return documents
+
+    def _to_documents(self, elements: List[PageElement], file_path: str) -> List[Document]:
+        """
+        Turn extracted blocks into structural elements.
+
+        Blocks set in a noticeably larger font than the body text (median block
+        font size) become "Title" elements, which drive chapter tracking during
+        indexing; consecutive body blocks on the same page are merged into one
+        "NarrativeText" element.
+        """
+        body_sizes = [size for _, kind, _, size in elements if kind == "Text"]
+        title_min_size = (
+            statistics.median(body_sizes) * DocumentConstants.PDF_TITLE_FONT_RATIO
+            if body_sizes else float("inf")
+        )
+
+        documents: List[Document] = []
+        pending: List[str] = []
+        pending_page = 0
+
+        def add(page_number: int, element_type: str, text: str) -> None:
+            documents.append(Document(
+                page_content=text,
+                metadata={"source": file_path, "page_number": page_number, "type": element_type}
+            ))
+
+        def flush() -> None:
+            if pending:
+                add(pending_page, "NarrativeText", "\n\n".join(pending))
+                pending.clear()
+
+        for page_number, kind, text, font_size in elements:
+            if kind == "Table":
+                flush()
+                add(page_number, "Table", text)
+            elif font_size > title_min_size and len(text) <= DocumentConstants.PDF_TITLE_MAX_CHARS:
+                flush()
+                add(page_number, "Title", text)
+            else:
+                if page_number != pending_page:
+                    flush()
+                pending.append(text)
+                pending_page = page_number
+        flush()
+
+        return documents
+
+    def _extract_elements(self, file_path: str, max_pages: Optional[int]) -> List[PageElement]:
+        """
+        Extract page elements, using the shared process pool for large documents.
+        """
+        with fitz.open(file_path) as pdf:
+            page_count = pdf.page_count
+        if max_pages is not None:
+            page_count = min(page_count, max_pages)
+
+        if page_count < DocumentConstants.PDF_PARALLEL_MIN_PAGES:
+            return _extract_page_range(file_path, 0, page_count)
+
+        step = DocumentConstants.PDF_PAGES_PER_WORKER_TASK
+        starts = list(range(0, page_count, step))
+        logger.info(f"⚙️ Extracting {page_count} pages in {len(starts)} parallel tasks")
+
+        elements: List[PageElement] = []
+        executor = self._get_executor()
+        try:
+            for batch in executor.map(
+                _extract_page_range,
+                [file_path] * len(starts),
+                starts,
+                [min(start + step, page_count) for start in starts],
+            ):
+                elements.extend(batch)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM): drop the pool so the next upload gets a fresh one
+            with self._executor_lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        return elements
+
+    def _load_with_unstructured(self, file_path: str, max_pages: Optional[int] = None) -> List[Document]:
+        """
+        Load a PDF with Unstructured (slow, but supports OCR and layout analysis).
+
+        Unstructured returns elements, not pages: max_pages is applied to each
+        element's page_number metadata.
+        """
+        loader = UnstructuredPDFLoader(file_path, mode="elements")
+        documents = loader.load()
+        if not max_pages:
+            return documents
+        return [doc for doc in documents if doc.metadata.get("page_number", 1) <= max_pages]
+
+
+# Singleton instance
+pdf_extraction_service = PDFExtractionService()
@@ -12,9 +12,24 @@ The prompt structure enforces RAG context usage and includes:
     - Final question
 """
 
+import re
+
 from app.core.config import settings
 from app.schemas.use_cases import PromptConstraints, UseCaseType
 
+# Patterns to match quantity requests (compiled once, tried in order)
+_QUANTITY_PATTERNS = [
+    re.compile(pattern)
+    for pattern in (
+        r"(\d+)\s+(?:items|elements|people|persons|persone|ideas?|idee|points|punti|steps|passaggi|titles?|titoli|creative|scenarios?|scenari)",
+        r"(?:list|lista)\s+(?:of|di)\s+(\d+)",
+        r"(?:give|dammi|voglio|need)\s+(?:me|una)?\s+(?:lista|list)?\s*(?:of|di)?\s*(\d+)",
+        r"(?:need|voglio)\s+(\d+)",
+        r"exactly\s+(\d+)",
+        r"esattamente\s+(\d+)",
+    )
+]
+
 
 class PromptTemplateService:
     """
@@ -264,21 +279,9 @@ THESE CONSTRAINTS MUST BE RESPECTED BEFORE EVERYTHING ELSE.
         Returns:
             Extracted quantity or None if not found
         """
-        import re
-
-        # Patterns to match quantity requests
-        patterns = [
-            r"(\d+)\s+(?:items|elements|people|persons|persone|ideas?|idee|points|punti|steps|passaggi|titles?|titoli|creative|scenarios?|scenari)",
-            r"(?:list|lista)\s+(?:of|di)\s+(\d+)",
-            r"(?:give|dammi|voglio|need)\s+(?:me|una)?\s+(?:lista|list)?\s*(?:of|di)?\s*(\d+)",
-            r"(?:need|voglio)\s+(\d+)",
-            r"exactly\s+(\d+)",
-            r"esattamente\s+(\d+)",
-        ]
-
         query_lower = query.lower()
-        for pattern in patterns:
-            match = re.search(pattern, query_lower)
+        for pattern in _QUANTITY_PATTERNS:
+            match = pattern.search(query_lower)
             if match:
                 try:
                     return int(match.group(1))
@@ -5,7 +5,7 @@ Generates alternative query variations to improve retrieval recall.
 Uses multi-query generation to capture different phrasings and keywords.
 """
 
-from typing import List
+from typing import List, Union
 
 from app.core.config import settings
 from langchain_openai import ChatOpenAI
@@ -70,33 +70,69 @@ class QueryExpansionService:
             prompt = MULTI_QUERY_PROMPT.format(query=query)
             # Invoke the LLM to get the expanded queries
             response_content = self.llm.invoke(prompt, max_tokens=150).content
+            return self._parse_alternative_queries(response_content, num_queries)
 
-            # Handle parsing response content (list or string)
-            if isinstance(response_content, list):
-                response_text = "\n\n".join(str(item) for item in response_content)
-            else:
-                response_text = str(response_content)
+        except Exception as e:
+            print(f"Error generating alternative queries: {e}")
+            return []
 
-            # Parse alternative queries from response, splitting by newline
-            # Filter out empty or too short strings
-            alt_queries = [
-                q.strip()
-                for q in response_text.split("\n")
-                if q.strip() and len(q.strip()) > 5
-            ]
+    async def agenerate_alternative_queries(
+        self, query: str, num_queries: int = 5
+    ) -> List[str]:
+        """
+        Async variant of generate_alternative_queries (non-blocking LLM call).
 
-            # Limit to requested number (default 5)
-            result = alt_queries[:num_queries]
+        Args:
+            query: The original user query
+            num_queries: Number of alternative queries to generate (default is 5)
 
-            print(
-                f"DEBUG [QueryExpansion]: Generated {len(result)} alternative queries in English"
-            )
-            return result
+        Returns:
+            List of alternative query strings (up to num_queries items)
+        """
+        try:
+            prompt = MULTI_QUERY_PROMPT.format(query=query)
+            response = await self.llm.ainvoke(prompt, max_tokens=150)
+            return self._parse_alternative_queries(response.content, num_queries)
 
         except Exception as e:
             print(f"Error generating alternative queries: {e}")
             return []
 
+    def _parse_alternative_queries(
+        self, response_content: Union[str, list], num_queries: int
+    ) -> List[str]:
+        """
+        Parse the LLM output into a list of alternative queries.
+
+        Args:
+            response_content: Raw LLM message content (string or list of parts)
+            num_queries: Maximum number of queries to return
+
+        Returns:
+            List of alternative query strings (up to num_queries items)
+        """
+        # Handle parsing response content (list or string)
+        if isinstance(response_content, list):
+            response_text = "\n\n".join(str(item) for item in response_content)
+        else:
+            response_text = str(response_content)
+
+        # Parse alternative queries from response, splitting by newline
+        # Filter out empty or too short strings
+        alt_queries = [
+            q.strip()
+            for q in response_text.split("\n")
+            if q.strip() and len(q.strip()) > 5
+        ]
+
+        # Limit to requested number (default 5)
+        result = alt_queries[:num_queries]
+
+        print(
+            f"DEBUG [QueryExpansion]: Generated {len(result)} alternative queries in English"
+        )
+        return result
+
     def expand_query_pool(self, original_query: str) -> List[str]:
         """
         Create a full query pool including the original and alternatives.
@@ -20,18 +20,160 @@ Examples:
 - "qual'è" → "Qual è" (grammar fix)
 """
 
-from typing import List
+import re
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Tuple
 
+import numpy as np
 from app.core.config import settings
+from app.core.constants import CacheConstants
 from app.core.logging import logger
 from app.db.chroma_client import get_embedding_function
 from app.schemas.rag_schema import FileFilterResponse
+from cachetools import TTLCache
 from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, Field, SecretStr
 
 
+try:
+    import ahocorasick  # Optional: multi-pattern keyword matching in C
+except ImportError:  # pragma: no cover - fallback to keyword regexes
+    ahocorasick = None
+
+# Signals of a file reference, checked locally before involving the LLM with the file list.
+# An extension is enough on its own, and so is a scope word ("solo", "escludi", ...): files are
+# often named implicitly ("escludi il report", "only the 2024 report"), so any scoping keeps the list.
+_FILE_EXTENSION_PATTERN = re.compile(
+    r"\.(?:pdf|docx?|txt|md|csv|xlsx?|pptx?)\b",
+    re.IGNORECASE,
+)
+
+# Keyword data (lowercase): whole words, plus scope prefixes that accept any suffix
+_FILE_SCOPE_WORDS = (
+    "solo", "only", "senza", "without", "mentioned",
+    "menzionato", "menzionata", "menzionati", "menzionate",
+)
+_FILE_SCOPE_PREFIXES = ("escludi", "exclude", "ignora", "ignore")
+
+_FILE_SCOPE_PATTERN = re.compile(
+    r"\b(?:" + "|".join(_FILE_SCOPE_WORDS + tuple(p + r"\w*" for p in _FILE_SCOPE_PREFIXES)) + r")\b",
+    re.IGNORECASE,
+)
+
+
+def _build_file_keyword_automaton():
+    """
+    Build the Aho-Corasick automaton over all scope words and prefixes.
+
+    Returns:
+        Automaton yielding (keyword length, whole word) payloads
+    """
+    automaton = ahocorasick.Automaton()
+    for word in _FILE_SCOPE_WORDS:
+        automaton.add_word(word, (len(word), True))
+    for prefix in _FILE_SCOPE_PREFIXES:
+        automaton.add_word(prefix, (len(prefix), False))
+    automaton.make_automaton()
+    return automaton
+
+
+# Built once at import: one pass over the query finds every keyword, whatever their number
+_FILE_KEYWORD_AUTOMATON = _build_file_keyword_automaton() if ahocorasick is not None else None
+
+
+def _is_word_char(char: str) -> bool:
+    """Equivalent of regex \\w for a single character (word-boundary checks)."""
+    return char.isalnum() or char == "_"
+
+
+def _has_file_scope_word(query: str) -> bool:
+    """
+    Check whether a query contains a scope word.
+
+    Uses the Aho-Corasick automaton when pyahocorasick is installed (a single
+    scan for all keywords, matches kept only at word boundaries), otherwise
+    the keyword regex.
+    """
+    if _FILE_KEYWORD_AUTOMATON is None:
+        return bool(_FILE_SCOPE_PATTERN.search(query))
+    
+    lowered = query.lower()
+    last = len(lowered) - 1
+    for end, (length, whole_word) in _FILE_KEYWORD_AUTOMATON.iter(lowered):
+        start = end - length + 1
+        if start > 0 and _is_word_char(lowered[start - 1]):
+            continue
+        if whole_word and end < last and _is_word_char(lowered[end + 1]):
+            continue
+        return True
+    return False
+
+# Shown to the LLM instead of the file list when no file reference was detected locally.
+# Neutral on purpose: the local check can miss implicit references
+_FILE_LIST_OMITTED = "(file list omitted)"
+
+
+@lru_cache(maxsize=1024)
+def _build_filename_index(files: Tuple[str, ...]) -> Mapping[str, str]:
+    """
+    Build the case-insensitive lookup {lowercase name: original name} for a file list.
+
+    Memoized on the file tuple: a user's document list rarely changes between
+    queries, and an upload/delete produces a different key, so no explicit
+    invalidation is needed.
+
+    Returns:
+        Read-only mapping (shared between callers)
+    """
+    return MappingProxyType({f.lower(): f for f in files})
+
+
+# Rules and examples shared by the single and the batched extraction prompts
+_EXTRACTION_RULES = """You are a file filter extraction and query optimization expert. Your task is to:
+1. Extract files to INCLUDE in search (search ONLY in these files)
+2. Extract files to EXCLUDE from search (do NOT search in these files)
+3. Clean and optimize the query for semantic search
+
+FILE EXTRACTION RULES:
+- Extract exact filenames as they appear in the query
+- Understand context: "only in X", "search in X", "mentioned in X", "menzionata nel X" → INCLUDE X
+- Understand context: "exclude X", "escludi X", "without X", "not in X", "ignore X" → EXCLUDE X
+- If multiple files in a list → extract all of them
+- Return EXACT filenames from the query (case-sensitive)
+
+QUERY CLEANING RULES:
+- Remove ALL file references (filenames, phrases like "in file", "escludi i file", "menzionata nel", etc.)
+- Fix grammar and spelling errors (typos, verb agreement, article usage)
+- Remove filler words: "tipo", "praticamente", "diciamo", "comunque", "insomma", "basically", "like", "actually"
+- Remove redundant words while preserving meaning
+- Keep the query concise and clear for semantic search
+- Preserve the original language (Italian stays Italian, English stays English)"""
+
+_EXTRACTION_EXAMPLES = """EXAMPLES:
+
+Query: "Search only in report.pdf for expenses"
+→ include_files: ["report.pdf"], exclude_files: [], cleaned_query: "expenses"
+
+Query: "Find Python info but exclude tutorial.pdf"
+→ include_files: [], exclude_files: ["tutorial.pdf"], cleaned_query: "Python information"
+
+Query: "escludi i file A.pdf, B.pdf e C.pdf"
+→ include_files: [], exclude_files: ["A.pdf", "B.pdf", "C.pdf"], cleaned_query: ""
+
+Query: "i velociraptor sanno aprire le porte? escludi i file X.pdf, Y.pdf e Z.pdf"
+→ include_files: [], exclude_files: ["X.pdf", "Y.pdf", "Z.pdf"], cleaned_query: "I velociraptor sanno aprire le porte?"
+
+Query: "tipo, praticamente volevo sapere come fare per, diciamo, configurare il server"
+→ include_files: [], exclude_files: [], cleaned_query: "Come configurare il server?"
+
+Query: "qual'è il costo totale del progetto menzionato nel Budget.pdf?"
+→ include_files: ["Budget.pdf"], exclude_files: [], cleaned_query: "Qual è il costo totale del progetto?\""""
+
+
 class FileFilterExtraction(BaseModel):
     """Structured output for file filter extraction."""
     include_files: List[str] = Field(
@@ -48,6 +190,19 @@ class FileFilterExtraction(BaseModel):
     )
 
 
+class FileFilterBatchItem(FileFilterExtraction):
+    """Structured output for one query of a batched extraction."""
+    idx: int = Field(..., description="Index of the query this result belongs to")
+
+
+class FileFilterBatchExtraction(BaseModel):
+    """Structured output for batched file filter extraction."""
+    results: List[FileFilterBatchItem] = Field(
+        default_factory=list,
+        description="One result per query, each tagged with the query index"
+    )
+
+
 class QueryParserService:
     """
     Service for extracting file filters and optimizing queries.
@@ -79,9 +234,17 @@ class QueryParserService:
         
         # Parser for structured output
         self.parser = JsonOutputParser(pydantic_object=FileFilterExtraction)
+        self.batch_parser = JsonOutputParser(pydantic_object=FileFilterBatchExtraction)
         
         # Get embedding function for file validation (HuggingFace - free)
         self.embeddings = get_embedding_function()
+        # Filename embeddings per document list (one matrix row per file):
+        # fuzzy matching then costs one embed_query and a matrix-vector product
+        self._filename_embedding_cache: TTLCache[Tuple[str, ...], np.ndarray] = TTLCache(
+            maxsize=CacheConstants.FILENAME_EMBEDDING_CACHE_SIZE,
+            ttl=CacheConstants.FILENAME_EMBEDDING_CACHE_TTL_SECONDS,
+        )
+        self._filename_embedding_cache_lock = threading.Lock()
         
         logger.debug("✅ QueryParserService initialized with gpt-4o-mini (low cost, high accuracy)")
     
@@ -123,6 +286,13 @@ class QueryParserService:
             logger.info(f"🔍 Parsing query for file filters: {query[:100]}...")
             logger.debug(f"   Available files: {available_files}")
             
+            # The file list is only needed when the query may reference a file:
+            # skip it otherwise (fewer prompt tokens for users with many documents)
+            if self.has_file_references(query, available_files):
+                files_block = "\n".join([f"- {f}" for f in available_files])
+            else:
+                files_block = _FILE_LIST_OMITTED
+            
             # Build prompt for LLM
             prompt = self._build_extraction_prompt(query)
             
@@ -132,38 +302,19 @@ class QueryParserService:
             # Invoke the chain
             result = chain.invoke({
                 "query": query,
-                "available_files": "\n".join([f"- {f}" for f in available_files])
+                "available_files": files_block
             })
             
             logger.debug(f"   LLM extraction result: {result}")
             
-            # Validate filenames against available files
-            validated_include = self._validate_filenames(
-                result["include_files"], available_files
-            )
-            validated_exclude = self._validate_filenames(
-                result["exclude_files"], available_files
-            )
-            
-            # Use cleaned query from LLM
-            cleaned_query = result["cleaned_query"].strip()
-            
-            # Ensure cleaned query is not empty
-            if not cleaned_query or len(cleaned_query) < 3:
-                logger.warning("⚠️  Cleaned query too short, using original")
-                cleaned_query = query
+            response = self._to_filter_response(query, result, available_files)
             
             logger.info("✅ File filters extracted:")
-            logger.info(f"   Include: {validated_include}")
-            logger.info(f"   Exclude: {validated_exclude}")
-            logger.info(f"   Cleaned query: {cleaned_query}")
+            logger.info(f"   Include: {response.include_files}")
+            logger.info(f"   Exclude: {response.exclude_files}")
+            logger.info(f"   Cleaned query: {response.cleaned_query}")
             
-            return FileFilterResponse(
-                include_files=validated_include,
-                exclude_files=validated_exclude,
-                original_query=query,
-                cleaned_query=cleaned_query
-            )
+            return response
             
         except Exception as e:
             logger.error(f"❌ File filter extraction failed: {e}")
@@ -177,6 +328,134 @@ class QueryParserService:
                 cleaned_query=query
             )
     
+    def extract_file_filters_batch(
+        self,
+        queries: List[str],
+        available_files: List[str]
+    ) -> List[FileFilterResponse]:
+        """
+        Extract file filters for several queries with a single LLM call.
+        
+        For batch scenarios (evaluation runs, conversation replay): the prompt
+        instructions and format schema are sent once for all queries. Results are
+        matched back by index; any query the LLM skipped or answered with a
+        malformed result is re-run on its own with extract_file_filters().
+        
+        Args:
+            queries: The user queries, in order
+            available_files: List of available document filenames for validation
+        
+        Returns:
+            One FileFilterResponse per query, in the same order as queries
+        """
+        if len(queries) <= 1:
+            return [self.extract_file_filters(q, available_files) for q in queries]
+        
+        logger.info(f"🔍 Parsing {len(queries)} queries for file filters in one batch...")
+        
+        if any(self.has_file_references(q, available_files) for q in queries):
+            files_block = "\n".join([f"- {f}" for f in available_files])
+        else:
+            files_block = _FILE_LIST_OMITTED
+        queries_block = "\n".join(
+            f"--- QUERY {idx}: {q} ---" for idx, q in enumerate(queries)
+        )
+        
+        try:
+            prompt = self._build_batch_extraction_prompt()
+            chain = prompt | self.llm | StrOutputParser() | self.batch_parser
+            result = chain.invoke({
+                "queries": queries_block,
+                "available_files": files_block
+            })
+            items = result.get("results", []) if isinstance(result, dict) else []
+        except Exception as e:
+            logger.error(f"❌ Batch file filter extraction failed: {e}")
+            items = []
+        
+        responses: Dict[int, FileFilterResponse] = {}
+        for item in items:
+            idx = item.get("idx") if isinstance(item, dict) else None
+            if not isinstance(idx, int) or not 0 <= idx < len(queries) or idx in responses:
+                continue
+            try:
+                responses[idx] = self._to_filter_response(queries[idx], item, available_files)
+            except (KeyError, AttributeError, TypeError) as e:
+                logger.warning(f"⚠️  Malformed batch result for query {idx}: {e}")
+        
+        # Skip detection: the LLM may drop or mangle entries in a batch
+        missing = [idx for idx in range(len(queries)) if idx not in responses]
+        if missing:
+            logger.warning(f"⚠️  Batch missed queries {missing}, re-running them one by one")
+            for idx in missing:
+                responses[idx] = self.extract_file_filters(queries[idx], available_files)
+        
+        logger.info(f"✅ File filters extracted for {len(queries)} queries")
+        return [responses[idx] for idx in range(len(queries))]
+    
+    def _to_filter_response(
+        self,
+        query: str,
+        result: dict,
+        available_files: List[str]
+    ) -> FileFilterResponse:
+        """
+        Turn one raw LLM extraction result into a validated FileFilterResponse.
+        
+        Filenames are validated against the available files and a too-short
+        cleaned query falls back to the original one.
+        """
+        # Validate filenames against available files
+        validated_include = self._validate_filenames(
+            result["include_files"], available_files
+        )
+        validated_exclude = self._validate_filenames(
+            result["exclude_files"], available_files
+        )
+        
+        # Use cleaned query from LLM
+        cleaned_query = result["cleaned_query"].strip()
+        
+        # Ensure cleaned query is not empty
+        if not cleaned_query or len(cleaned_query) < 3:
+            logger.warning("⚠️  Cleaned query too short, using original")
+            cleaned_query = query
+        
+        return FileFilterResponse(
+            include_files=validated_include,
+            exclude_files=validated_exclude,
+            original_query=query,
+            cleaned_query=cleaned_query
+        )
+    
+    def has_file_references(self, query: str, available_files: List[str]) -> bool:
+        """
+        Cheap local check for whether a query may reference a file.
+        
+        Two tiers, cheapest first: an extension or the name (without extension)
+        of an available file appearing in the query is a reference; otherwise
+        any scope word ("solo", "escludi", "without", ...) counts, since it may
+        point at a file named only implicitly ("escludi il report").
+        
+        Args:
+            query: The user's natural language query
+            available_files: List of available document filenames
+        
+        Returns:
+            True if the query may reference a file
+        """
+        # An extension needs a dot: skip the regex pass when there is none
+        if "." in query and _FILE_EXTENSION_PATTERN.search(query):
+            return True
+        
+        query_lower = query.lower()
+        for filename in available_files:
+            stem = filename.rsplit(".", 1)[0].lower()
+            if len(stem) >= 3 and stem in query_lower:
+                return True
+        
+        return _has_file_scope_word(query)
+    
     def _build_extraction_prompt(
         self, 
         query: str
@@ -186,59 +465,53 @@ class QueryParserService:
         
         Uses clear instructions with examples to guide the LLM.
         """
-        template = """You are a file filter extraction and query optimization expert. Your task is to:
-1. Extract files to INCLUDE in search (search ONLY in these files)
-2. Extract files to EXCLUDE from search (do NOT search in these files)
-3. Clean and optimize the query for semantic search
-
-FILE EXTRACTION RULES:
-- Extract exact filenames as they appear in the query
-- Understand context: "only in X", "search in X", "mentioned in X", "menzionata nel X" → INCLUDE X
-- Understand context: "exclude X", "escludi X", "without X", "not in X", "ignore X" → EXCLUDE X
-- If multiple files in a list → extract all of them
-- Return EXACT filenames from the query (case-sensitive)
-
-QUERY CLEANING RULES:
-- Remove ALL file references (filenames, phrases like "in file", "escludi i file", "menzionata nel", etc.)
-- Fix grammar and spelling errors (typos, verb agreement, article usage)
-- Remove filler words: "tipo", "praticamente", "diciamo", "comunque", "insomma", "basically", "like", "actually"
-- Remove redundant words while preserving meaning
-- Keep the query concise and clear for semantic search
-- Preserve the original language (Italian stays Italian, English stays English)
+        template = f"""{_EXTRACTION_RULES}
 
 AVAILABLE FILES (for reference):
-{available_files}
+{{available_files}}
 
 USER QUERY:
-{query}
+{{query}}
 
-EXAMPLES:
+{_EXTRACTION_EXAMPLES}
 
-Query: "Search only in report.pdf for expenses"
-→ include_files: ["report.pdf"], exclude_files: [], cleaned_query: "expenses"
+Now extract from the user query above and apply all rules.
 
-Query: "Find Python info but exclude tutorial.pdf"
-→ include_files: [], exclude_files: ["tutorial.pdf"], cleaned_query: "Python information"
+{{format_instructions}}
+"""
+        
+        prompt = ChatPromptTemplate.from_template(template)
+        prompt = prompt.partial(format_instructions=self.parser.get_format_instructions())
+        
+        return prompt
+    
+    def _build_batch_extraction_prompt(self) -> ChatPromptTemplate:
+        """
+        Build the prompt for batched file filter extraction.
+        
+        Same rules and examples as the single-query prompt; each numbered
+        query gets its own result tagged with its index.
+        """
+        template = f"""{_EXTRACTION_RULES}
 
-Query: "escludi i file A.pdf, B.pdf e C.pdf"
-→ include_files: [], exclude_files: ["A.pdf", "B.pdf", "C.pdf"], cleaned_query: ""
+Apply these rules to EACH numbered query below independently.
+Return exactly one result per query, with "idx" set to the query number.
 
-Query: "i velociraptor sanno aprire le porte? escludi i file X.pdf, Y.pdf e Z.pdf"
-→ include_files: [], exclude_files: ["X.pdf", "Y.pdf", "Z.pdf"], cleaned_query: "I velociraptor sanno aprire le porte?"
+AVAILABLE FILES (for reference):
+{{available_files}}
 
-Query: "tipo, praticamente volevo sapere come fare per, diciamo, configurare il server"
-→ include_files: [], exclude_files: [], cleaned_query: "Come configurare il server?"
+USER QUERIES:
+{{queries}}
 
-Query: "qual'è il costo totale del progetto menzionato nel Budget.pdf?"
-→ include_files: ["Budget.pdf"], exclude_files: [], cleaned_query: "Qual è il costo totale del progetto?"
+{_EXTRACTION_EXAMPLES}
 
-Now extract from the user query above and apply all rules.
+Now extract from every user query above and apply all rules.
 
-{format_instructions}
+{{format_instructions}}
 """
         
         prompt = ChatPromptTemplate.from_template(template)
-        prompt = prompt.partial(format_instructions=self.parser.get_format_instructions())
+        prompt = prompt.partial(format_instructions=self.batch_parser.get_format_instructions())
         
         return prompt
     
@@ -259,7 +532,7 @@ Now extract from the user query above and apply all rules.
             return []
         
         validated = []
-        available_lower = {f.lower(): f for f in available_files}
+        available_lower = _build_filename_index(tuple(available_files))
         
         for extracted in extracted_files:
             extracted_lower = extracted.lower()
@@ -292,24 +565,19 @@ Now extract from the user query above and apply all rules.
         Only returns match if similarity > threshold.
         """
         try:
-            import numpy as np
-            
             # Get embedding for extracted filename
-            filename_embedding = self.embeddings.embed_query(filename)
+            filename_embedding = np.asarray(self.embeddings.embed_query(filename))
             
-            # Get embeddings for all available files
-            available_embeddings = self.embeddings.embed_documents(available_files)
+            # Get embeddings for all available files (cached per file list)
+            available_embeddings = self._get_filename_embeddings(tuple(available_files))
             
-            # Compute cosine similarities
-            similarities = [
-                np.dot(filename_embedding, available_emb) 
-                for available_emb in available_embeddings
-            ]
+            # Compute cosine similarities in one product
+            similarities = available_embeddings @ filename_embedding
             
             # Find best match
-            max_similarity = max(similarities)
+            best_idx = int(np.argmax(similarities))
+            max_similarity = float(similarities[best_idx])
             if max_similarity >= threshold:
-                best_idx = similarities.index(max_similarity)
                 logger.debug(f"   Similarity: {max_similarity:.2f} for {available_files[best_idx]}")
                 return available_files[best_idx]
             
@@ -318,6 +586,26 @@ Now extract from the user query above and apply all rules.
         except Exception as e:
             logger.error(f"   Error computing similarity: {e}")
             return None
+    
+    def _get_filename_embeddings(self, files: Tuple[str, ...]) -> np.ndarray:
+        """
+        Get the embedding matrix of a file list, embedding it only on a cache miss.
+        
+        Args:
+            files: Available filenames (the cache key; a new upload changes it)
+        
+        Returns:
+            Matrix with one embedding row per file, in the same order
+        """
+        with self._filename_embedding_cache_lock:
+            cached = self._filename_embedding_cache.get(files)
+        if cached is not None:
+            return cached
+        
+        embeddings = np.asarray(self.embeddings.embed_documents(list(files)))
+        with self._filename_embedding_cache_lock:
+            self._filename_embedding_cache[files] = embeddings
+        return embeddings
 
 
 # --- Global Service Instance ---
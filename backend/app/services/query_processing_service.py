@@ -10,13 +10,17 @@ Responsibilities:
 - Detect conversational patterns and query intent
 """
 
-from typing import List
+import threading
+from functools import lru_cache
+from typing import List, Optional
 
-from app.core.constants import QueryConstants
+from app.core.constants import CacheConstants, QueryConstants
 from app.core.logging import logger
 from app.schemas.rag_schema import ConversationMessage, QueryClassification
+from cachetools import TTLCache
 from langchain_core.language_models import BaseChatModel
 from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompts import PromptTemplate
 
 # Query categories for classification
 CATEGORIES = [
@@ -27,15 +31,38 @@ CATEGORIES = [
     "EXPLANATION"
 ]
 
+# Shared across requests (the service itself is created per request).
+# Classification runs at temperature 0, so identical queries get the same tag.
+_classification_cache: TTLCache[str, str] = TTLCache(
+    maxsize=CacheConstants.CLASSIFICATION_CACHE_SIZE,
+    ttl=CacheConstants.CLASSIFICATION_CACHE_TTL_SECONDS,
+)
+_classification_cache_lock = threading.Lock()
 
-def _build_classification_prompt():
-    """Build classification prompt from settings."""
+_CLASSIFICATION_PARSER = JsonOutputParser(pydantic_object=QueryClassification)
+
+
+def _classification_cache_key(query: str) -> str:
+    """Normalize a query for use as a classification cache key."""
+    return " ".join(query.split()).lower()
+
+
+@lru_cache(maxsize=1)
+def _build_classification_prompt() -> PromptTemplate:
+    """
+    Build the classification prompt from settings, with categories and
+    format instructions already bound.
+
+    Built once per process: the template and categories never change at runtime.
+    """
     from app.core.config import settings
-    from langchain_core.prompts import PromptTemplate
-    
+
     return PromptTemplate(
         input_variables=["categories", "format_instructions", "query"],
         template=settings.CLASSIFICATION_PROMPT_TEMPLATE
+    ).partial(
+        categories=str(CATEGORIES),
+        format_instructions=_CLASSIFICATION_PARSER.get_format_instructions(),
     )
 
 
@@ -60,6 +87,7 @@ class QueryProcessingService:
         """
         self.llm = llm
         self.query_gen_llm = query_gen_llm
+        self._classification_chain = self._build_classification_chain()
     
     def classify_query(self, query: str) -> str:
         """
@@ -73,37 +101,83 @@ class QueryProcessingService:
         Returns:
             Category tag string (e.g., 'GENERAL_SEARCH')
         """
+        cached = self._get_cached_classification(query)
+        if cached is not None:
+            return cached
+
         try:
-            parser = JsonOutputParser(pydantic_object=QueryClassification)
-
-            classification_prompt = _build_classification_prompt().partial(
-                categories=str(CATEGORIES),
-                format_instructions=parser.get_format_instructions(),
-            )
-
-            chain = classification_prompt | self.query_gen_llm | parser
-
-            result = chain.invoke({"query": query})
-
-            # Handle both 'category_tag' (correct) and 'category' (LLM mistake)
-            if isinstance(result, dict):
-                if "category_tag" in result:
-                    return result["category_tag"].upper()
-                elif "category" in result:
-                    # Fallback: LLM used wrong key name
-                    logger.warning(f"⚠️ LLM returned 'category' instead of 'category_tag': {result}")
-                    return result["category"].upper()
-                else:
-                    logger.error(f"❌ Classification parsing failed - missing both keys. Result: {result}")
-                    return "GENERAL_SEARCH"
-            else:
-                logger.error(f"❌ Classification parsing failed - not a dict. Result: {result}")
-                return "GENERAL_SEARCH"
+            result = self._classification_chain.invoke({"query": query})
+            return self._cache_classification(query, self._parse_classification_result(result))
 
         except Exception as e:
             logger.error(f"❌ Error classifying query: {e}")
             return "GENERAL_SEARCH"
 
+    async def aclassify_query(self, query: str) -> str:
+        """
+        Async variant of classify_query, so classification can run
+        concurrently with the rest of the RAG pipeline.
+        
+        Args:
+            query: The user query to classify
+            
+        Returns:
+            Category tag string (e.g., 'GENERAL_SEARCH')
+        """
+        cached = self._get_cached_classification(query)
+        if cached is not None:
+            return cached
+
+        try:
+            result = await self._classification_chain.ainvoke({"query": query})
+            return self._cache_classification(query, self._parse_classification_result(result))
+
+        except Exception as e:
+            logger.error(f"❌ Error classifying query: {e}")
+            return "GENERAL_SEARCH"
+
+    def _get_cached_classification(self, query: str) -> Optional[str]:
+        """Return the cached category tag for this query, if any."""
+        with _classification_cache_lock:
+            cached = _classification_cache.get(_classification_cache_key(query))
+        if cached is not None:
+            logger.debug(f"🏷️  Classification cache hit: {cached}")
+        return cached
+
+    def _cache_classification(self, query: str, category_tag: Optional[str]) -> str:
+        """
+        Store a parsed category tag for this query and return it.
+
+        A failed parse (None) falls back to GENERAL_SEARCH without being cached,
+        so one bad LLM response does not mis-route the query for the whole TTL.
+        """
+        if category_tag is None:
+            return "GENERAL_SEARCH"
+        with _classification_cache_lock:
+            _classification_cache[_classification_cache_key(query)] = category_tag
+        return category_tag
+
+    def _build_classification_chain(self):
+        """Build the prompt | LLM | JSON parser classification chain (once per instance)."""
+        return _build_classification_prompt() | self.query_gen_llm | _CLASSIFICATION_PARSER
+
+    def _parse_classification_result(self, result) -> Optional[str]:
+        """Extract the category tag from the parsed classification output (None if malformed)."""
+        # Handle both 'category_tag' (correct) and 'category' (LLM mistake)
+        if isinstance(result, dict):
+            if "category_tag" in result:
+                return result["category_tag"].upper()
+            elif "category" in result:
+                # Fallback: LLM used wrong key name
+                logger.warning(f"⚠️ LLM returned 'category' instead of 'category_tag': {result}")
+                return result["category"].upper()
+            else:
+                logger.error(f"❌ Classification parsing failed - missing both keys. Result: {result}")
+                return None
+        else:
+            logger.error(f"❌ Classification parsing failed - not a dict. Result: {result}")
+            return None
+
     def reformulate_query(
         self, 
         query: str, 
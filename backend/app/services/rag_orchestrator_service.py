@@ -12,7 +12,9 @@ Architecture:
 - ConversationService: Conversation summarization
 """
 
-from typing import List, Optional, Tuple
+import asyncio
+import contextlib
+from typing import AsyncIterator, List, Optional, Tuple
 
 from app.core.config import settings
 from app.core.logging import logger
@@ -32,12 +34,25 @@ from app.services.language_service import LanguageService
 from app.services.query_expansion_service import query_expansion_service
 from app.services.query_processing_service import QueryProcessingService
 from app.services.reranking_service import reranking_service
-from app.services.translation_service import translation_service
+from app.services.translation_service import get_translation_service
 from fastapi import Depends, UploadFile
 from langchain_openai import ChatOpenAI
 from pydantic import SecretStr
 
 
+async def _discard_task(task: "asyncio.Task") -> None:
+    """
+    Cancel a side task that is no longer needed and collect its outcome.
+
+    Used when answer generation fails or the stream is closed early (client
+    disconnect): the pending LLM call is stopped and no "Task exception was
+    never retrieved" warning is logged.
+    """
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError, Exception):
+        await task
+
+
 class RAGService:
     """
     Main RAG Service - Orchestrator
@@ -94,7 +109,7 @@ class RAGService:
             llm=self.llm,
             repository=repository,
             language_service=self.language_service,
-            translation_service=translation_service,
+            translation_service=get_translation_service(),
             query_expansion_service=query_expansion_service,
             reranking_service=reranking_service
         )
@@ -147,7 +162,7 @@ class RAGService:
     
     # === QUERY PROCESSING & ANSWER GENERATION ===
     
-    def answer_query(
+    async def answer_query(
         self,
         query: str,
         user_id: str,
@@ -161,7 +176,7 @@ class RAGService:
         
         Workflow:
         1. Reformulate query (QueryProcessingService)
-        2. Classify query (QueryProcessingService)
+        2. Classify query (QueryProcessingService), concurrently with step 3
         3. Generate answer (AnswerGenerationService)
         
         Args:
@@ -178,23 +193,85 @@ class RAGService:
         conversation_history = conversation_history or []
         
         # Step 1: Reformulate query if needed (handles conversational context)
-        reformulated_query = self.query_processing_service.reformulate_query(
-            query, conversation_history
+        reformulated_query = await asyncio.to_thread(
+            self.query_processing_service.reformulate_query, query, conversation_history
         )
         
-        # Step 2: Classify query (for future optimizations)
-        query_tag = self.query_processing_service.classify_query(reformulated_query)
-        logger.info(f"🏷️  Query classified as: {query_tag}")
+        # Step 2: Classify query (for future optimizations) - runs alongside answer generation
+        classify_task = asyncio.create_task(
+            self.query_processing_service.aclassify_query(reformulated_query)
+        )
+        
+        try:
+            # Step 3: Generate answer with full RAG pipeline
+            answer, sources = await self.answer_generation_service.generate_answer(
+                query=reformulated_query,
+                user_id=user_id,
+                conversation_history=conversation_history,
+                output_language=output_language,
+                include_files=include_files,
+                exclude_files=exclude_files
+            )
+            
+            query_tag = await classify_task
+            logger.info(f"🏷️  Query classified as: {query_tag}")
+        finally:
+            await _discard_task(classify_task)
+        
+        return answer, sources
+    
+    async def stream_answer_query(
+        self,
+        query: str,
+        user_id: str,
+        conversation_history: Optional[List[ConversationMessage]] = None,
+        output_language: Optional[str] = None,
+        include_files: Optional[List[str]] = None,
+        exclude_files: Optional[List[str]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Streaming variant of answer_query.
+        
+        Runs the same reformulation/classification steps, then yields the
+        answer incrementally from AnswerGenerationService.stream_answer.
         
-        # Step 3: Generate answer with full RAG pipeline
-        return self.answer_generation_service.generate_answer(
-            query=reformulated_query,
-            user_id=user_id,
-            conversation_history=conversation_history,
-            output_language=output_language,
-            include_files=include_files,
-            exclude_files=exclude_files
+        Args:
+            query: User's question
+            user_id: User identifier
+            conversation_history: Optional conversation context
+            output_language: Optional target language
+            include_files: Optional file filter (include only)
+            exclude_files: Optional file filter (exclude)
+            
+        Yields:
+            Answer text fragments followed by the sources block
+        """
+        conversation_history = conversation_history or []
+        
+        reformulated_query = await asyncio.to_thread(
+            self.query_processing_service.reformulate_query, query, conversation_history
         )
+        
+        classify_task = asyncio.create_task(
+            self.query_processing_service.aclassify_query(reformulated_query)
+        )
+        
+        try:
+            async for fragment in self.answer_generation_service.stream_answer(
+                query=reformulated_query,
+                user_id=user_id,
+                conversation_history=conversation_history,
+                output_language=output_language,
+                include_files=include_files,
+                exclude_files=exclude_files
+            ):
+                yield fragment
+            
+            query_tag = await classify_task
+            logger.info(f"🏷️  Query classified as: {query_tag}")
+        finally:
+            # Also reached when the generator is closed early (client disconnect)
+            await _discard_task(classify_task)
     
     # === DOCUMENT MANAGEMENT OPERATIONS ===
     
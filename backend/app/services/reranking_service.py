@@ -7,15 +7,65 @@ Reranking Service Module - Versione 2 (Logarithmic TF Score)
 - Pulizia: Aggiunto un set base di stop word universali per migliorare la qualità delle keyword.
 """
 
-from typing import List, Set, Tuple
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Tuple
 import re
-import math
-from collections import Counter
+import time
+
+import numpy as np
 from langchain_core.documents import Document
+from scipy.sparse import csr_matrix
+
+from app.core.constants import CacheConstants
+
+try:
+    import ahocorasick  # Optional: multi-pattern keyword matching in C
+except ImportError:  # pragma: no cover - fallback to keyword regex
+    ahocorasick = None
 
 # Stop word universali, agnostiche e comuni (lunghezza > 2)
 # Questi sono termini funzionali comuni che possono inquinare il TF-scoring.
-UNIVERSAL_STOP_WORDS = {"the", "and", "for", "with", "from", "that", "this", "which"}
+UNIVERSAL_STOP_WORDS = frozenset({"the", "and", "for", "with", "from", "that", "this", "which"})
+
+# Pre-compilato una sola volta a livello di modulo
+_WORD_RE = re.compile(r"\b\w+\b")
+
+
+def _is_word_char(char: str) -> bool:
+    """Equivalent of regex \\w for a single character (word-boundary checks)."""
+    return char.isalnum() or char == "_"
+
+
+@lru_cache(maxsize=CacheConstants.RERANK_KEYWORD_CACHE_SIZE)
+def _compile_keyword_pattern(keywords: Tuple[str, ...]) -> "re.Pattern[str]":
+    """
+    Compile the \\b(?:kw1|kw2|...)\\b alternation for an ordered keyword tuple.
+
+    Args:
+        keywords: Keywords, longest first (so a prefix never shadows the full keyword)
+
+    Returns:
+        Compiled pattern, reused for every rerank with the same keyword set
+    """
+    return re.compile(r"\b(?:" + "|".join(map(re.escape, keywords)) + r")\b")
+
+
+@lru_cache(maxsize=CacheConstants.RERANK_KEYWORD_CACHE_SIZE)
+def _compile_keyword_automaton(keywords: Tuple[str, ...]):
+    """
+    Build the Aho-Corasick automaton for an ordered keyword tuple.
+
+    Args:
+        keywords: Keywords; the position in the tuple is the keyword column index
+
+    Returns:
+        Automaton yielding (column, keyword length) payloads
+    """
+    automaton = ahocorasick.Automaton()
+    for col, kw in enumerate(keywords):
+        automaton.add_word(kw, (col, len(kw)))
+    automaton.make_automaton()
+    return automaton
 
 
 class RerankingService:
@@ -23,7 +73,7 @@ class RerankingService:
     Service for lightweight document reranking with an improved, language-agnostic keyword scoring.
 
     Hybrid Scoring Approach:
-    - 60% vector similarity (from initial retrieval order)
+    - 60% vector similarity (cosine similarity from retrieval, or retrieval order as fallback)
     - 40% Logarithmic Term Frequency Score (keyword coverage + frequency boost)
     """
 
@@ -33,10 +83,10 @@ class RerankingService:
         """
         self.vector_weight = vector_weight
         self.keyword_weight = keyword_weight
-        # Pre-compila il pattern una sola volta per l'efficienza
-        self._word_pattern = re.compile(r"\b\w+\b")
+        # Cache dei punteggi: (hash keywords, hash chunk) -> (scadenza, punteggio)
+        self._score_cache: Dict[Tuple[int, int], Tuple[float, float]] = {}
 
-    def _extract_keywords(self, queries: List[str], min_length: int = 3) -> Set[str]:
+    def _extract_keywords(self, queries: List[str], min_length: int = 3) -> FrozenSet[str]:
         """
         Extract significant keywords from a list of queries.
 
@@ -48,12 +98,23 @@ class RerankingService:
             min_length: Minimum word length to be considered a keyword
 
         Returns:
-            Set of lowercase, cleaned keywords
+            Frozen set of lowercase, cleaned keywords
+        """
+        return self._extract_keywords_cached(tuple(queries), min_length)
+
+    @staticmethod
+    @lru_cache(maxsize=CacheConstants.RERANK_KEYWORD_CACHE_SIZE)
+    def _extract_keywords_cached(queries: Tuple[str, ...], min_length: int = 3) -> FrozenSet[str]:
+        """
+        Cached keyword extraction, keyed by the tuple of queries.
+
+        Query ripetute (stessa domanda o stesse riformulazioni nella sessione)
+        non rieseguono la regex né ricostruiscono il set.
         """
         keywords = set()
 
         for query in queries:
-            words = self._word_pattern.findall(query.lower())
+            words = _WORD_RE.findall(query.lower())
             # Filtering: min length AND not in universal stop word list
             keywords.update(
                 [
@@ -63,53 +124,173 @@ class RerankingService:
                 ]
             )
 
-        return keywords
+        return frozenset(keywords)
 
-    def _calculate_tf_score(self, document_content: str, keywords: Set[str]) -> float:
+    def _calculate_tf_scores(
+        self, document_contents: List[str], keywords: FrozenSet[str]
+    ) -> np.ndarray:
         """
-        Calculate a Term Frequency (TF) score using a combination of unique match coverage
-        and a logarithmic frequency boost. This is less sensitive alla lunghezza del documento.
+        Calculate Term Frequency (TF) scores for a batch of chunks using a combination
+        of unique match coverage and a logarithmic frequency boost. This is less
+        sensitive alla lunghezza del documento.
 
         New Logic: Base Coverage Score + Logarithmic Frequency Boost.
+        I token vengono proiettati su una matrice sparsa documenti x keyword (CSR),
+        così il punteggio di tutti i chunk è calcolato con operazioni vettoriali.
 
         Args:
-            document_content: The text of the document chunk.
+            document_contents: The texts of the document chunks.
             keywords: The set of keywords extracted from the query.
 
         Returns:
-            Relevance score (0.0 or higher)
+            Array of relevance scores (0.0 or higher), one per chunk
         """
-        if not keywords:
-            return 0.0
+        num_docs = len(document_contents)
+        num_keywords = len(keywords)
+        if not keywords or num_docs == 0:
+            return np.zeros(num_docs)
+
+        # Vocabolario ristretto alle keyword, in ordine deterministico (più lunghe prima):
+        # lo stesso set di keyword riusa così il matcher già compilato
+        vocab = {
+            kw: col
+            for col, kw in enumerate(sorted(keywords, key=lambda kw: (-len(kw), kw)))
+        }
+        rows: List[int] = []
+        cols: List[int] = []
+        # Lowercase una sola volta per chunk: i matcher lavorano sul testo già normalizzato
+        lowered_contents = [content.lower() for content in document_contents]
+        if ahocorasick is not None:
+            self._match_keywords_automaton(lowered_contents, vocab, rows, cols)
+        else:
+            self._match_keywords_regex(lowered_contents, vocab, rows, cols)
+
+        term_matrix = csr_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(num_docs, num_keywords)
+        )
+        term_matrix.sum_duplicates()
 
-        # Tokenizza il contenuto del documento usando il pattern pre-compilato
-        doc_tokens = self._word_pattern.findall(document_content.lower())
+        # Frequenza totale delle keyword e numero di keyword distinte per chunk
+        total_tf_counts = np.asarray(term_matrix.sum(axis=1)).ravel()
+        keywords_matched = np.diff(term_matrix.indptr)
 
-        # Conta le occorrenze dei token del documento che sono anche keyword
-        keyword_counts = Counter(doc_tokens)
+        # 1. Punteggio di Copertura (Unique Match Coverage) - 0.0 a 1.0
+        # 2. Boost Logaritmico sulla Frequenza: log(1 + tf) * 0.1 mantiene il boost piccolo.
+        # Combined Score: La copertura è la base, il boost logaritmico fornisce l'intensità.
+        return (keywords_matched / num_keywords) * (1.0 + np.log1p(total_tf_counts) * 0.1)
 
-        total_tf_count = 0
-        keywords_matched = 0
+    def _match_keywords_regex(
+        self,
+        lowered_contents: List[str],
+        vocab: Dict[str, int],
+        rows: List[int],
+        cols: List[int],
+    ) -> None:
+        """
+        Collect (chunk, keyword) hits with a single alternation regex.
+
+        Invece di tokenizzare ogni chunk e cercare ogni token nel vocabolario, il
+        pattern \\b(?:kw1|kw2|...)\\b emette solo le keyword (a confine di parola,
+        quindi con gli stessi conteggi del tokenizer). I chunk che non contengono
+        nessuna keyword come sottostringa vengono scartati prima, con una ricerca in C.
+
+        Args:
+            lowered_contents: The lowercased texts of the document chunks.
+            vocab: Keyword -> column index (longest keywords first).
+            rows: Output list of chunk indexes (one per hit).
+            cols: Output list of keyword column indexes (one per hit).
+        """
+        keywords_list = tuple(vocab)
+        keyword_pattern = _compile_keyword_pattern(keywords_list)
 
-        for kw in keywords:
-            count = keyword_counts.get(kw, 0)
-            if count > 0:
-                total_tf_count += count
-                keywords_matched += 1
+        for row, lowered in enumerate(lowered_contents):
+            if not any(kw in lowered for kw in keywords_list):
+                continue
+            for kw in keyword_pattern.findall(lowered):
+                rows.append(row)
+                cols.append(vocab[kw])
 
-        if keywords_matched > 0:
-            # 1. Punteggio di Copertura (Unique Match Coverage) - 0.0 a 1.0
-            unique_match_ratio = keywords_matched / len(keywords)
+    def _match_keywords_automaton(
+        self,
+        lowered_contents: List[str],
+        vocab: Dict[str, int],
+        rows: List[int],
+        cols: List[int],
+    ) -> None:
+        """
+        Collect (chunk, keyword) hits with an Aho-Corasick automaton.
 
-            # 2. Boost Logaritmico sulla Frequenza
-            # +1 per evitare log(0). 0.1 è un fattore di scaling per mantenere il boost piccolo.
-            frequency_boost = math.log(total_tf_count + 1) * 0.1
+        Il testo viene scansionato una sola volta in C per tutte le keyword, senza
+        tokenizzazione. I match vengono accettati solo a confine di parola, così i
+        conteggi coincidono con quelli del pattern \\b\\w+\\b.
 
-            # Combined Score: La copertura è la base, il boost logaritmico fornisce l'intensità.
-            # Questo evita la penalizzazione sulla lunghezza del documento.
-            return unique_match_ratio * (1.0 + frequency_boost)
+        Args:
+            lowered_contents: The lowercased texts of the document chunks.
+            vocab: Keyword -> column index.
+            rows: Output list of chunk indexes (one per hit).
+            cols: Output list of keyword column indexes (one per hit).
+        """
+        automaton = _compile_keyword_automaton(tuple(vocab))
+
+        for row, lowered in enumerate(lowered_contents):
+            last = len(lowered) - 1
+            for end, (col, length) in automaton.iter(lowered):
+                start = end - length + 1
+                if start > 0 and _is_word_char(lowered[start - 1]):
+                    continue
+                if end < last and _is_word_char(lowered[end + 1]):
+                    continue
+                rows.append(row)
+                cols.append(col)
+
+    def _cached_tf_scores(
+        self, document_contents: List[str], keywords: FrozenSet[str], keywords_key: int, now: float
+    ) -> List[float]:
+        """
+        Return the keyword scores for a batch of chunks, reusing cached values when
+        the same keyword set was scored against the same chunk within the TTL window.
+        Only cache misses are scored (in a single vectorized batch).
 
-        return 0.0
+        Args:
+            document_contents: The texts of the document chunks.
+            keywords: The set of keywords extracted from the queries.
+            keywords_key: Precomputed hash of the keyword set.
+            now: Current monotonic time.
+
+        Returns:
+            Relevance scores (0.0 or higher), one per chunk
+        """
+        scores: List[float] = [0.0] * len(document_contents)
+        misses: List[int] = []
+        cache_keys = [(keywords_key, hash(content)) for content in document_contents]
+
+        for idx, cache_key in enumerate(cache_keys):
+            cached = self._score_cache.get(cache_key)
+            if cached is not None and cached[0] > now:
+                scores[idx] = cached[1]
+            else:
+                misses.append(idx)
+
+        if misses:
+            fresh_scores = self._calculate_tf_scores(
+                [document_contents[idx] for idx in misses], keywords
+            )
+            expires_at = now + CacheConstants.RERANK_SCORE_CACHE_TTL_SECONDS
+            for idx, score in zip(misses, fresh_scores.tolist()):
+                scores[idx] = score
+                self._score_cache[cache_keys[idx]] = (expires_at, score)
+
+        return scores
+
+    def _evict_expired_scores(self, now: float) -> None:
+        """Drop expired entries, clearing the cache entirely if it is still oversized."""
+        if len(self._score_cache) < CacheConstants.RERANK_SCORE_CACHE_SIZE:
+            return
+        self._score_cache = {
+            key: entry for key, entry in self._score_cache.items() if entry[0] > now
+        }
+        if len(self._score_cache) >= CacheConstants.RERANK_SCORE_CACHE_SIZE:
+            self._score_cache.clear()
 
     def rerank_documents(
         self,
@@ -121,9 +302,13 @@ class RerankingService:
         """
         Rerank documents using hybrid scoring: vector similarity + improved TF-inspired keyword score.
         """
-        if not documents:
+        if not documents or top_n <= 0:
             return []
 
+        # Fast path: un solo candidato, non c'è nulla da riordinare
+        if len(documents) == 1:
+            return list(documents)
+
         # 1. Estrazione Keywords
         all_queries = [original_query] + alternative_queries
         keywords = self._extract_keywords(all_queries)
@@ -133,34 +318,54 @@ class RerankingService:
         )
         print(f"DEBUG [Reranking]: Sample keywords: {list(keywords)[:5]}")
 
-        # 2. Scoring di ogni documento
-        scored_docs: List[Tuple[float, Document]] = []
-        total_docs = len(documents)
+        similarities = [doc.metadata.get("similarity_score") for doc in documents]
+        has_similarity = all(similarity is not None for similarity in similarities)
 
-        for i, doc in enumerate(documents):
+        # Fast path: senza keyword il punteggio keyword è 0 per tutti e, senza similarità,
+        # quello vettoriale decresce con la posizione: l'ordine di retrieval è già il risultato
+        if not keywords and not has_similarity:
+            return documents[:top_n]
 
-            # Vector Similarity Score (basato sulla posizione)
-            # Rank-based decay: 1.0 per il primo, decresce linearmente fino a quasi 0.0
-            vector_score = 1.0 - (i / total_docs)
-
-            # Keyword Score: basato sulla Term Frequency (TF) migliorata
-            keyword_score = self._calculate_tf_score(doc.page_content, keywords)
+        # 2. Scoring di ogni documento
+        total_docs = len(documents)
 
-            # Combined score: weighted sum
-            combined_score = (
-                self.vector_weight * vector_score + self.keyword_weight * keyword_score
+        # Keyword Score: basato sulla Term Frequency (TF) migliorata, calcolato in batch
+        if keywords:
+            now = time.monotonic()
+            self._evict_expired_scores(now)
+            keyword_scores = np.asarray(
+                self._cached_tf_scores(
+                    [doc.page_content for doc in documents], keywords, hash(keywords), now
+                )
             )
+        else:
+            keyword_scores = np.zeros(total_docs)
+
+        # Vector Similarity Score: similarità coseno reale (max sulle query) se il
+        # retrieval l'ha fornita, altrimenti basato sulla posizione
+        if has_similarity:
+            vector_scores = np.asarray(similarities, dtype=float)
+        else:
+            # Rank-based decay: 1.0 per il primo, decresce linearmente fino a quasi 0.0
+            vector_scores = 1.0 - np.arange(total_docs) / total_docs
 
-            scored_docs.append((combined_score, doc))
+        # Combined score: weighted sum
+        combined_scores = self.vector_weight * vector_scores + self.keyword_weight * keyword_scores
 
-        # 3. Ordinamento e Selezione Top N
-        scored_docs.sort(key=lambda x: x[0], reverse=True)
+        # 3. Selezione Top N: partizione O(N) per la soglia (N-esimo punteggio), poi
+        # ordinamento dei soli candidati per punteggio e, a parità, per ordine di retrieval.
+        # argpartition non è stabile: i pari merito sulla soglia vanno scelti per indice
+        top_n = min(top_n, total_docs)
+        threshold = np.partition(combined_scores, total_docs - top_n)[total_docs - top_n]
+        candidates = np.flatnonzero(combined_scores >= threshold)
+        order = np.lexsort((candidates, -combined_scores[candidates]))
+        top_idx = candidates[order][:top_n]
 
-        top_docs = [doc for score, doc in scored_docs[:top_n]]
+        top_docs = [documents[i] for i in top_idx]
 
         print(f"DEBUG [Reranking]: Reranked {total_docs} → {len(top_docs)} documents")
         print(
-            f"DEBUG [Reranking]: Top 3 scores: {[round(scored_docs[i][0], 3) for i in range(min(3, len(scored_docs)))]}"
+            f"DEBUG [Reranking]: Top 3 scores: {[round(float(combined_scores[i]), 3) for i in top_idx[:3]]}"
         )
 
         return top_docs
@@ -5,11 +5,33 @@ Provides functions to retrieve tier-based limits from Firestore configuration.
 Integrates with Firebase Auth custom claims to determine user tier.
 """
 
+import threading
 from typing import Any, Dict, Tuple
 
+from app.core.constants import CacheConstants
 from app.core.logging import logger
+from cachetools import TTLCache
 from firebase_admin import auth
 
+# Per-user (tier, limits), so one request fanning out several tier checks
+# (or several requests in a row) doesn't hit Firebase Auth every time.
+_tier_cache: TTLCache[str, Tuple[str, Dict[str, int]]] = TTLCache(
+    maxsize=CacheConstants.TIER_CACHE_SIZE,
+    ttl=CacheConstants.TIER_CACHE_TTL_SECONDS,
+)
+_tier_cache_lock = threading.Lock()
+
+
+def invalidate_tier_cache(user_id: str) -> None:
+    """
+    Drop the cached tier/limits for a user (call after changing their custom claims).
+    
+    Args:
+        user_id: Firebase Auth user ID
+    """
+    with _tier_cache_lock:
+        _tier_cache.pop(user_id, None)
+
 
 def get_user_tier_limits(user_id: str) -> Tuple[str, Dict[str, int]]:
     """
@@ -31,6 +53,11 @@ def get_user_tier_limits(user_id: str) -> Tuple[str, Dict[str, int]]:
         >>> print(f"Tier: {tier}, Max file size: {limits['max_file_size_mb']}MB")
         Tier: PRO, Max file size: 50MB
     """
+    with _tier_cache_lock:
+        cached = _tier_cache.get(user_id)
+    if cached is not None:
+        return cached
+    
     try:
         # Get user's custom claims
         user = auth.get_user(user_id)
@@ -53,6 +80,10 @@ def get_user_tier_limits(user_id: str) -> Tuple[str, Dict[str, int]]:
         
         logger.debug(f"📊 User {user_id} | Tier: {tier} | Limits: {limits}")
         
+        # Only successful lookups are cached (errors fall back to FREE uncached)
+        with _tier_cache_lock:
+            _tier_cache[user_id] = (tier, limits)
+        
         return tier, limits
         
     except Exception as e:
@@ -109,6 +140,37 @@ def check_file_count_limit(user_id: str, current_count: int) -> Tuple[bool, int]
     return can_upload, max_files
 
 
+def get_user_upload_checks(user_id: str, current_count: int) -> Dict[str, Any]:
+    """
+    Get every upload-related limit check from a single tier lookup.
+    
+    Use this instead of calling get_max_upload_size_bytes() and
+    check_file_count_limit() separately, which fetch the tier twice.
+    
+    Args:
+        user_id: Firebase Auth user ID
+        current_count: Current number of uploaded files
+        
+    Returns:
+        Dictionary with tier, max_upload_bytes, can_upload, max_files, max_queries
+        
+    Example:
+        >>> checks = get_user_upload_checks("user123", 4)
+        >>> if not checks["can_upload"]:
+        >>>     print(f"Limit reached! Max: {checks['max_files']}")
+    """
+    tier, limits = get_user_tier_limits(user_id)
+    max_files = limits.get("max_files", 5)
+    
+    return {
+        "tier": tier,
+        "max_upload_bytes": limits.get("max_file_size_mb", 10) * 1024 * 1024,
+        "can_upload": current_count < max_files,
+        "max_files": max_files,
+        "max_queries": limits.get("max_queries_per_day", 20),
+    }
+
+
 def get_tier_info_for_display(user_id: str) -> Dict[str, Any]:
     """
     Get formatted tier information for display in UI.
@@ -7,13 +7,74 @@ Handles query translation for optimal document retrieval matching.
 Translates user queries to the document language to improve semantic similarity scores.
 """
 
-from typing import Dict
+import asyncio
+import hashlib
+import json
+import threading
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
 
 from app.core.config import settings
-from openai import OpenAI
+from app.core.constants import CacheConstants, LLMConstants
+from app.services.language_service import language_service
+from cachetools import TTLCache
+from openai import AsyncOpenAI, OpenAI
 from pydantic import SecretStr
 
 
+# Translation instructions are kept constant and sent before the variable parts
+# (target language, then the text itself), so every call shares the same prompt
+# prefix and OpenAI's automatic prompt caching can reuse it.
+ENGLISH_SEARCH_PHRASE_INSTRUCTIONS = (
+    "You are a professional translator. "
+    "Translate the user's message (a search query) to a standard, concise English search phrase. "
+    "If the query is already in English, return it unchanged. "
+    "Reply with the translation only."
+)
+
+QUERY_TRANSLATION_INSTRUCTIONS = (
+    "You are a professional translator. Preserve all proper nouns (names, places, brands) without translation. "
+    "Translate the user's message (a search query) to the target language given below. "
+    "Keep it concise and suitable for document search. "
+    "IMPORTANT: Do NOT translate proper nouns (person names, place names, company names, brands, product names). "
+    "Keep all proper nouns in their original form. "
+    "If the query is already in the target language, return it unchanged. "
+    "Reply with the translation only."
+)
+
+BATCH_QUERY_TRANSLATION_INSTRUCTIONS = (
+    "You are a professional translator. Preserve all proper nouns (names, places, brands) without translation. "
+    "The user's message is a JSON object {\"queries\": [...]} of independent search queries. "
+    "Translate each query to the target language given below. "
+    "Keep them concise and suitable for document search. "
+    "IMPORTANT: Do NOT translate proper nouns (person names, place names, company names, brands, product names). "
+    "Keep all proper nouns in their original form. "
+    "If a query is already in the target language, return it unchanged. "
+    "Reply with a JSON object {\"translations\": [...]} holding one translation per query, in the same order."
+)
+
+ANSWER_TRANSLATION_INSTRUCTIONS = (
+    "You are an expert translator preserving tone and formatting. "
+    "Translate the user's message (an assistant answer) into the target language given below. "
+    "Preserve formatting and lists, but do not change proper nouns. "
+    "Reply with the translation only."
+)
+
+
+def _translation_cache_key(query: str, target_language: str) -> Tuple[str, str]:
+    """
+    Cache key for a query translation: (target language, digest of the query).
+    
+    target_language must already be upper-case.
+
+    Only surrounding whitespace is stripped: case and inner spacing can change
+    the translation (proper nouns, acronyms), so they stay part of the key.
+    Hashing keeps the key size fixed regardless of query length.
+    """
+    digest = hashlib.blake2b(query.strip().encode("utf-8"), digest_size=16).hexdigest()
+    return target_language, digest
+
+
 class TranslationService:
     """
     Service for translating user queries to document languages.
@@ -22,8 +83,8 @@ class TranslationService:
     of the indexed documents, improving embedding similarity and retrieval quality.
     """
     
-    # Language code to full name mapping
-    LANGUAGE_NAMES: Dict[str, str] = {
+    # Language code to full name mapping (read-only)
+    LANGUAGE_NAMES: Mapping[str, str] = MappingProxyType({
         "IT": "Italian",
         "EN": "English", 
         "FR": "French",
@@ -36,10 +97,10 @@ class TranslationService:
         "ZH": "Chinese",
         "JA": "Japanese",
         "KO": "Korean",
-    }
+    })
     
     def __init__(self):
-        """Initialize the translation service with OpenAI client."""
+        """Initialize the translation service with sync and async OpenAI clients."""
         # Extract API key securely
         api_key_value = (
             settings.OPENAI_API_KEY.get_secret_value()
@@ -47,7 +108,20 @@ class TranslationService:
             else str(settings.OPENAI_API_KEY)
         )
         self.openai_client = OpenAI(api_key=api_key_value)
+        # Async client for the request path, so translations don't tie up worker threads
+        self.async_openai_client = AsyncOpenAI(api_key=api_key_value)
         self.model = settings.LLM_MODEL
+        # Translations are deterministic (temperature=0): repeated queries skip the LLM call
+        self._query_cache: TTLCache[Tuple[str, str], str] = TTLCache(
+            maxsize=CacheConstants.TRANSLATION_CACHE_SIZE,
+            ttl=CacheConstants.TRANSLATION_CACHE_TTL_SECONDS,
+        )
+        self._query_cache_lock = threading.Lock()
+        # Translations currently being requested, keyed like the cache
+        self._inflight_translations: Dict[Tuple[str, str], "asyncio.Future[str]"] = {}
+        # Query translations waiting for the batch window, per target language
+        self._pending_batches: Dict[str, List[Tuple[str, Tuple[str, str], "asyncio.Future[str]"]]] = {}
+        self._batch_timers: Dict[str, "asyncio.Task[None]"] = {}
     
     def translate_query_to_english(self, query: str) -> str:
         """
@@ -62,22 +136,25 @@ class TranslationService:
         Returns:
             The query translated to English, or original if already in English
         """
-        prompt = (
-            f"Translate the following user query to a standard, concise English search phrase. "
-            f"If the query is already in English, return it unchanged. Query: '{query}'"
-        )
+        # Separate namespace: this prompt differs from translate_query_to_language(query, "EN")
+        cache_key = _translation_cache_key(query, "EN-SEARCH")
+        cached = self._get_cached_translation(cache_key)
+        if cached is not None:
+            return cached
 
         try:
             response = self.openai_client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": "You are a professional translator."},
-                    {"role": "user", "content": prompt},
+                    {"role": "system", "content": ENGLISH_SEARCH_PHRASE_INSTRUCTIONS},
+                    {"role": "user", "content": query},
                 ],
                 temperature=0.0,
             )
             content = response.choices[0].message.content
-            return content.strip() if content else query
+            if not content:
+                return query
+            return self._cache_translation(cache_key, content.strip())
 
         except Exception as e:
             print(f"Error translating query to English: {e}. Using original query.")
@@ -98,39 +175,222 @@ class TranslationService:
         Returns:
             The query translated to the target language
         """
-        target_lang_name = self.LANGUAGE_NAMES.get(target_language.upper(), "English")
-        
-        prompt = (
-            f"Translate the following user query to {target_lang_name}. "
-            f"Keep it concise and suitable for document search. "
-            f"IMPORTANT: Do NOT translate proper nouns (person names, place names, company names, brands, product names). "
-            f"Keep all proper nouns in their original form. "
-            f"If the query is already in {target_lang_name}, return it unchanged. "
-            f"Query: '{query}'"
-        )
+        target_language = target_language.upper()
+        cache_key = _translation_cache_key(query, target_language)
+        cached = self._get_cached_translation(cache_key)
+        if cached is not None:
+            print(f"DEBUG [TranslationService]: Cache hit for query translation to {target_language}")
+            return cached
+
+        if self._is_already_in_language(query, target_language):
+            return self._cache_translation(cache_key, query)
 
         try:
             response = self.openai_client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "You are a professional translator. Preserve all proper nouns (names, places, brands) without translation."
-                    },
-                    {"role": "user", "content": prompt},
-                ],
+                messages=self._query_translation_messages(query, target_language),
                 temperature=0.0,
             )
-            content = response.choices[0].message.content
-            translated = content.strip() if content else query
+            return self._finish_query_translation(
+                response.choices[0].message.content, query, target_language, cache_key
+            )
+
+        except Exception as e:
+            print(f"ERROR translating query to {target_language}: {e}. Using original query.")
+            return query
+
+    async def atranslate_query_to_language(self, query: str, target_language: str) -> str:
+        """
+        Async variant of translate_query_to_language (AsyncOpenAI client, no thread offload).
+        
+        Args:
+            query: The original user query
+            target_language: The target language code (e.g., 'IT', 'EN', 'FR')
             
-            print(f"DEBUG [TranslationService]: Translated query to {target_language}: {translated}")
-            return translated
+        Returns:
+            The query translated to the target language
+        """
+        target_language = target_language.upper()
+        cache_key = _translation_cache_key(query, target_language)
+        cached = self._get_cached_translation(cache_key)
+        if cached is not None:
+            print(f"DEBUG [TranslationService]: Cache hit for query translation to {target_language}")
+            return cached
+
+        if self._is_already_in_language(query, target_language):
+            return self._cache_translation(cache_key, query)
+
+        # Concurrent requests for the same translation share one LLM call,
+        # and different queries to the same language within the batch window share one too
+        inflight = self._inflight_translations.get(cache_key)
+        if inflight is None:
+            inflight = self._enqueue_query_translation(query, target_language, cache_key)
+            self._inflight_translations[cache_key] = inflight
+            inflight.add_done_callback(lambda _: self._inflight_translations.pop(cache_key, None))
+        # Shielded: a cancelled caller must not cancel the call other callers are awaiting
+        return await asyncio.shield(inflight)
+
+    def _enqueue_query_translation(
+        self,
+        query: str,
+        target_language: str,
+        cache_key: Tuple[str, str]
+    ) -> "asyncio.Future[str]":
+        """Queue a query translation for the next batch to its target language."""
+        future: "asyncio.Future[str]" = asyncio.get_running_loop().create_future()
+        pending = self._pending_batches.setdefault(target_language, [])
+        pending.append((query, cache_key, future))
+
+        if len(pending) >= LLMConstants.TRANSLATION_BATCH_MAX_SIZE:
+            # Full batch: send now instead of waiting for the window
+            batch = self._pending_batches.pop(target_language)
+            asyncio.ensure_future(self._run_translation_batch(target_language, batch))
+        elif target_language not in self._batch_timers:
+            self._batch_timers[target_language] = asyncio.ensure_future(
+                self._flush_translation_batch_after_window(target_language)
+            )
+        return future
+
+    async def _flush_translation_batch_after_window(self, target_language: str) -> None:
+        """Send whatever is queued for a target language once the batch window has passed."""
+        try:
+            await asyncio.sleep(LLMConstants.TRANSLATION_BATCH_WINDOW_SECONDS)
+        finally:
+            self._batch_timers.pop(target_language, None)
+        batch = self._pending_batches.pop(target_language, [])
+        if batch:
+            await self._run_translation_batch(target_language, batch)
+
+    async def _run_translation_batch(
+        self,
+        target_language: str,
+        batch: List[Tuple[str, Tuple[str, str], "asyncio.Future[str]"]]
+    ) -> None:
+        """Translate a batch of queries and resolve their futures (never raises)."""
+        queries = [query for query, _, _ in batch]
+        try:
+            if len(batch) == 1:
+                query, cache_key, _ = batch[0]
+                results = [await self._arequest_query_translation(query, target_language, cache_key)]
+            else:
+                try:
+                    results = await self._arequest_batch_translation(batch, target_language)
+                except Exception as e:
+                    print(f"ERROR batch-translating {len(batch)} queries to {target_language}: {e}. Translating one by one.")
+                    results = list(await asyncio.gather(*[
+                        self._arequest_query_translation(query, target_language, cache_key)
+                        for query, cache_key, _ in batch
+                    ]))
+        except Exception as e:
+            print(f"ERROR translating queries to {target_language}: {e}. Using original queries.")
+            results = queries
+
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _arequest_batch_translation(
+        self,
+        batch: List[Tuple[str, Tuple[str, str], "asyncio.Future[str]"]],
+        target_language: str
+    ) -> List[str]:
+        """
+        Translate several queries in one JSON-mode LLM call.
+        
+        Raises:
+            ValueError: If the reply is not one translation per query
+        """
+        target_lang_name = self.LANGUAGE_NAMES.get(target_language, "English")
+        response = await self.async_openai_client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": BATCH_QUERY_TRANSLATION_INSTRUCTIONS},
+                {"role": "system", "content": f"Target language: {target_lang_name}"},
+                {"role": "user", "content": json.dumps({"queries": [query for query, _, _ in batch]}, ensure_ascii=False)},
+            ],
+            temperature=0.0,
+            response_format={"type": "json_object"},
+        )
+        translations = json.loads(response.choices[0].message.content or "{}").get("translations")
+        if not isinstance(translations, list) or len(translations) != len(batch):
+            raise ValueError("batch translation reply does not match the queries")
+
+        return [
+            self._finish_query_translation(
+                content if isinstance(content, str) else None, query, target_language, cache_key
+            )
+            for (query, cache_key, _), content in zip(batch, translations)
+        ]
+
+    async def _arequest_query_translation(
+        self,
+        query: str,
+        target_language: str,
+        cache_key: Tuple[str, str]
+    ) -> str:
+        """Run one async query translation request against the LLM."""
+        try:
+            response = await self.async_openai_client.chat.completions.create(
+                model=self.model,
+                messages=self._query_translation_messages(query, target_language),
+                temperature=0.0,
+            )
+            return self._finish_query_translation(
+                response.choices[0].message.content, query, target_language, cache_key
+            )
 
         except Exception as e:
             print(f"ERROR translating query to {target_language}: {e}. Using original query.")
             return query
 
+    def _is_already_in_language(self, query: str, target_language: str) -> bool:
+        """
+        Check locally (langdetect) whether the query is already in the target language.
+        
+        Only a confident detection skips the LLM call; ambiguous or short queries
+        are still translated.
+        """
+        detected = language_service.detect_language_confident(query)
+        if detected == target_language:
+            print(f"DEBUG [TranslationService]: Query already in {target_language}, skipping translation")
+            return True
+        return False
+
+    def _query_translation_messages(self, query: str, target_language: str) -> List[Dict[str, str]]:
+        """Build the chat messages for a query translation (static prefix, variable tail)."""
+        target_lang_name = self.LANGUAGE_NAMES.get(target_language, "English")
+        return [
+            {"role": "system", "content": QUERY_TRANSLATION_INSTRUCTIONS},
+            {"role": "system", "content": f"Target language: {target_lang_name}"},
+            {"role": "user", "content": query},
+        ]
+
+    def _finish_query_translation(
+        self,
+        content: Optional[str],
+        query: str,
+        target_language: str,
+        cache_key: Tuple[str, str]
+    ) -> str:
+        """Strip the LLM output, cache it if non-empty, and fall back to the query otherwise."""
+        translated = content.strip() if content else query
+        
+        print(f"DEBUG [TranslationService]: Translated query to {target_language}: {translated}")
+        if content:
+            self._cache_translation(cache_key, translated)
+        return translated
+
+    def _get_cached_translation(self, cache_key: Tuple[str, str]) -> Optional[str]:
+        """Return a cached query translation, if any."""
+        with self._query_cache_lock:
+            return self._query_cache.get(cache_key)
+
+    def _cache_translation(self, cache_key: Tuple[str, str], translated: str) -> str:
+        """Store a successful query translation and return it."""
+        with self._query_cache_lock:
+            self._query_cache[cache_key] = translated
+        return translated
+
     def translate_answer_back(self, answer: str, target_language: str) -> str:
         """
         Translate the generated answer back into the user's preferred language.
@@ -142,31 +402,71 @@ class TranslationService:
         Returns:
             The translated answer text.
         """
-        prompt_language = self.LANGUAGE_NAMES.get(target_language.upper(), "English")
-        prompt = (
-            f"Translate the following assistant answer into {prompt_language}. "
-            f"Preserve formatting and lists, but do not change proper nouns. Answer: '{answer}'"
-        )
-
+        target_language = target_language.upper()
         try:
             response = self.openai_client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert translator preserving tone and formatting."
-                    },
-                    {"role": "user", "content": prompt},
-                ],
+                messages=self._answer_translation_messages(answer, target_language),
                 temperature=0.0,
             )
-            content = response.choices[0].message.content
-            translated = content.strip() if content else answer
-            print(f"DEBUG [TranslationService]: Translated answer to {target_language}: {translated[:50]}...")
-            return translated
+            return self._finish_answer_translation(
+                response.choices[0].message.content, answer, target_language
+            )
         except Exception as e:
             print(f"ERROR translating answer to {target_language}: {e}. Using original answer.")
             return answer
+
+    async def atranslate_answer_back(self, answer: str, target_language: str) -> str:
+        """
+        Async variant of translate_answer_back (AsyncOpenAI client, no thread offload).
+
+        Args:
+            answer: Text in the answer generation language (usually English)
+            target_language: The desired language code for the response
+
+        Returns:
+            The translated answer text.
+        """
+        target_language = target_language.upper()
+        try:
+            response = await self.async_openai_client.chat.completions.create(
+                model=self.model,
+                messages=self._answer_translation_messages(answer, target_language),
+                temperature=0.0,
+            )
+            return self._finish_answer_translation(
+                response.choices[0].message.content, answer, target_language
+            )
+        except Exception as e:
+            print(f"ERROR translating answer to {target_language}: {e}. Using original answer.")
+            return answer
+
+    def _answer_translation_messages(self, answer: str, target_language: str) -> List[Dict[str, str]]:
+        """Build the chat messages for an answer translation (static prefix, variable tail)."""
+        prompt_language = self.LANGUAGE_NAMES.get(target_language, "English")
+        return [
+            {"role": "system", "content": ANSWER_TRANSLATION_INSTRUCTIONS},
+            {"role": "system", "content": f"Target language: {prompt_language}"},
+            {"role": "user", "content": answer},
+        ]
+
+    def _finish_answer_translation(self, content: Optional[str], answer: str, target_language: str) -> str:
+        """Strip the LLM output, falling back to the original answer if empty."""
+        translated = content.strip() if content else answer
+        print(f"DEBUG [TranslationService]: Translated answer to {target_language}: {translated[:50]}...")
+        return translated
+    
+    def is_supported(self, language_code: str) -> bool:
+        """
+        Check whether a language code has a known name (translation target).
+        
+        Args:
+            language_code: ISO language code (e.g., 'IT', 'EN')
+            
+        Returns:
+            True if the code is in LANGUAGE_NAMES
+        """
+        return language_code.upper() in self.LANGUAGE_NAMES
     
     def get_language_name(self, language_code: str) -> str:
         """
@@ -181,5 +481,13 @@ class TranslationService:
         return self.LANGUAGE_NAMES.get(language_code.upper(), "English")
 
 
-# Singleton instance
-translation_service = TranslationService()
+# Singleton instance (created on first use: keeps OpenAI client setup out of import time)
+_translation_service: Optional[TranslationService] = None
+
+
+def get_translation_service() -> TranslationService:
+    """Get or create translation service instance."""
+    global _translation_service
+    if _translation_service is None:
+        _translation_service = TranslationService()
+    return _translation_service
@@ -2,26 +2,96 @@
 Usage Tracking Service
 
 Tracks user queries per day in Firestore and enforces tier limits.
+
+Usage is stored as one small document per user and day:
+user_usage/{user_id}/days/{YYYY-MM-DD} = {"count", "day", "updated_at", "expires_at"}.
+A Firestore TTL policy on the days collection group's expires_at field deletes
+old days server-side; cleanup_old_usage() remains as a manual fallback.
+
+Transition: usage used to be a queries.{YYYY-MM-DD} map on user_usage/{user_id}.
+When today's day document does not exist yet, the legacy map entry for today is
+read and carried over, so counts made before the deploy are not lost.
 """
 
-from datetime import datetime, timezone
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
+from app.core.constants import CacheConstants, TierConstants
+from app.core.firebase import get_firestore_client
 from app.core.logging import logger
-from firebase_admin import firestore
 from google.cloud.firestore import transactional as firestore_transactional
-from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP, Increment
+
+
+# Maximum number of writes in one Firestore WriteBatch
+FIRESTORE_BATCH_LIMIT = 500
+
+
+@lru_cache(maxsize=8)
+def _day_expires_at(day: str) -> datetime:
+    """TTL expiry of a day's usage document (the date key is parsed once, not per write)."""
+    return datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc) + timedelta(
+        days=TierConstants.USAGE_RETENTION_DAYS + 1
+    )
 
 
 class UsageTrackingService:
     """Service for tracking user query usage and enforcing limits."""
     
     def __init__(self):
-        self.db = firestore.client()
+        self._db = None
+        # Hot per-user counters for today: {user_id: {"day", "count", "pending", "dirty_since"}}.
+        # "pending" queries are counted here but not yet written to Firestore; they are
+        # flushed as one Increment(pending) write. Counters are per process, so every
+        # periodic flush drops them once written: the user's next query re-reads the
+        # shared Firestore count in a transaction. With several workers the limit can be
+        # overshot by at most the queries other workers accept within one flush interval.
+        self._counts: Dict[str, Dict[str, Any]] = {}
+        self._counts_lock = threading.Lock()
+    
+    @property
+    def db(self):
+        """Firestore client, created on first use rather than at construction."""
+        if self._db is None:
+            self._db = get_firestore_client()
+        return self._db
+    
+    @db.setter
+    def db(self, client) -> None:
+        self._db = client
     
     def _get_today_key(self) -> str:
         """Get today's date key in YYYY-MM-DD format (UTC)."""
         return datetime.now(timezone.utc).strftime("%Y-%m-%d")
     
+    def _day_ref(self, user_id: str, day: str):
+        """Reference to the user's usage document for one day."""
+        return (
+            self.db.collection("user_usage").document(user_id)
+            .collection("days").document(day)
+        )
+    
+    def _legacy_count(self, user_id: str, day: str, transaction=None) -> int:
+        """
+        Count for a day in the legacy layout (queries.{YYYY-MM-DD} map on user_usage/{user_id}).
+        
+        Only read when the day document does not exist yet; can be removed once
+        no legacy map holds an entry for the current day.
+        """
+        snapshot = self.db.collection("user_usage").document(user_id).get(transaction=transaction)
+        data = snapshot.to_dict() if snapshot.exists else None
+        queries = data.get("queries") if isinstance(data, dict) else None
+        count = queries.get(day, 0) if isinstance(queries, dict) else 0
+        return count if isinstance(count, int) else 0
+    
+    @staticmethod
+    def _day_fields(day: str) -> Dict[str, Any]:
+        """Bookkeeping fields written with every update of a day document."""
+        return {"day": day, "updated_at": SERVER_TIMESTAMP, "expires_at": _day_expires_at(day)}
+    
     def get_user_queries_today(self, user_id: str) -> int:
         """
         Get the number of queries the user has made today.
@@ -34,74 +104,61 @@ class UsageTrackingService:
         """
         try:
             today = self._get_today_key()
-            usage_ref = self.db.collection("user_usage").document(user_id)
-            usage_doc = usage_ref.get()
+            with self._counts_lock:
+                entry = self._counts.get(user_id)
+                if entry is not None and entry["day"] == today:
+                    # Includes queries not flushed to Firestore yet
+                    return entry["count"]
             
-            if not usage_doc.exists:
-                return 0
+            usage_doc = self._day_ref(user_id, today).get()
             
-            data = usage_doc.to_dict()
-            if not data:
-                return 0
+            if not usage_doc.exists:
+                return self._legacy_count(user_id, today)
             
-            # Get today's query count
-            queries_today = data.get("queries", {}).get(today, 0)
-            return queries_today
+            queries_today = (usage_doc.to_dict() or {}).get("count", 0)
+            return queries_today if isinstance(queries_today, int) else 0
             
         except Exception as e:
             logger.error(f"❌ Error getting user queries: {e}")
             return 0
     
-    def increment_user_queries(self, user_id: str) -> int:
+    def increment_user_queries(self, user_id: str, queries_used: Optional[int] = None) -> Optional[int]:
         """
         Increment the user's query count for today.
         
+        Uses a server-side atomic Increment on the day's counter: one write,
+        no read and no transaction (no contention window between requests).
+        
         Args:
             user_id: Firebase user ID
+            queries_used: Count already read for today (e.g. by check_query_limit), if known
             
         Returns:
-            New total queries for today
+            New total queries for today when queries_used is given, otherwise None
         """
         try:
-            today = self._get_today_key()
-            usage_ref = self.db.collection("user_usage").document(user_id)
+            self._write_query_delta(user_id, self._get_today_key(), 1)
             
-            # Use transaction to ensure atomic increment
-            transaction = self.db.transaction()
-            @firestore_transactional
-            def update_in_transaction(transaction, ref):
-                snapshot = ref.get(transaction=transaction)
-                
-                if snapshot.exists:
-                    data = snapshot.to_dict() or {}
-                    queries = data.get("queries", {})
-                    current_count = queries.get(today, 0)
-                    new_count = current_count + 1
-                    queries[today] = new_count
-                    transaction.update(ref, {
-                        "queries": queries,
-                        "last_query_at": SERVER_TIMESTAMP,
-                        "updated_at": SERVER_TIMESTAMP
-                    })
-                    return new_count
-                else:
-                    new_data = {
-                        "queries": {today: 1},
-                        "last_query_at": SERVER_TIMESTAMP,
-                        "created_at": SERVER_TIMESTAMP,
-                        "updated_at": SERVER_TIMESTAMP
-                    }
-                    transaction.set(ref, new_data)
-                    return 1
-            
-            new_count = update_in_transaction(transaction, usage_ref)
-            logger.info(f"📊 User {user_id} queries today: {new_count}")
+            new_count = queries_used + 1 if queries_used is not None else None
+            logger.info(f"📊 User {user_id} queries today: {new_count if new_count is not None else '+1'}")
             return new_count
             
         except Exception as e:
             logger.error(f"❌ Error incrementing user queries: {e}")
             raise
     
+    def _write_query_delta(self, user_id: str, day: str, delta: int) -> None:
+        """
+        Add delta to the user's query counter for a day (atomic Increment, no read).
+        
+        Args:
+            user_id: Firebase user ID
+            day: Date key in YYYY-MM-DD format
+            delta: Number of queries to add (negative for refunds)
+        """
+        # set(merge=True) creates the day document on first use: no read, no NotFound path
+        self._day_ref(user_id, day).set({"count": Increment(delta), **self._day_fields(day)}, merge=True)
+    
     def check_query_limit(self, user_id: str, max_queries: int) -> tuple[bool, int]:
         """
         Check if user has exceeded their daily query limit.
@@ -132,58 +189,261 @@ class UsageTrackingService:
             # On error, allow the query but log it
             return True, 0
     
-    def _should_keep_date(self, date_key: str, cutoff_date: datetime, days_to_keep: int) -> bool:
-        """Check if a date entry should be kept based on retention policy."""
+    def check_and_increment_query(self, user_id: str, max_queries: int) -> tuple[bool, int]:
+        """
+        Check the daily query limit and count the query.
+        
+        This is the live request path. The first query of the day for a user
+        (in this process) checks and counts in one Firestore transaction and
+        seeds the hot counter; later queries are checked and counted in memory
+        and written back in batches (see flush_pending_counts()). Each periodic
+        flush drops the counter, so the next query re-reads Firestore and sees
+        the queries counted by other workers.
+        
+        Args:
+            user_id: Firebase user ID
+            max_queries: Maximum queries allowed per day (9999 = unlimited)
+            
+        Returns:
+            Tuple of (can_query: bool, queries_used: int), where queries_used
+            includes this query when it was allowed
+        """
+        today = self._get_today_key()
+        hot_result = self._check_and_increment_hot(user_id, today, max_queries)
+        if hot_result is not None:
+            return hot_result
+        
+        try:
+            usage_ref = self._day_ref(user_id, today)
+            
+            transaction = self.db.transaction()
+            @firestore_transactional
+            def check_and_increment_in_transaction(transaction, ref):
+                snapshot = ref.get(transaction=transaction)
+                if snapshot.exists:
+                    queries_used = (snapshot.to_dict() or {}).get("count", 0)
+                    carried_over = 0
+                else:
+                    # First query of the day in the new layout: carry over the legacy count
+                    queries_used = carried_over = self._legacy_count(user_id, today, transaction)
+                
+                # Unlimited users (9999) always pass
+                if max_queries < 9999 and queries_used >= max_queries:
+                    return False, queries_used
+                
+                transaction.set(
+                    ref, {"count": Increment(1 + carried_over), **self._day_fields(today)}, merge=True
+                )
+                return True, queries_used + 1
+            
+            can_query, queries_used = check_and_increment_in_transaction(transaction, usage_ref)
+            
+            with self._counts_lock:
+                self._counts[user_id] = {
+                    "day": today, "count": queries_used, "pending": 0, "dirty_since": None
+                }
+            
+            if not can_query:
+                logger.warning(f"⚠️ User {user_id} has exceeded daily query limit ({queries_used}/{max_queries})")
+            else:
+                logger.info(f"📊 User {user_id} queries today: {queries_used}")
+            
+            return can_query, queries_used
+            
+        except Exception as e:
+            logger.error(f"❌ Error checking/incrementing query limit: {e}")
+            # On error, allow the query but log it
+            return True, 0
+    
+    def refund_query(self, user_id: str) -> None:
+        """
+        Give back a query counted by check_and_increment_query() when the
+        answer could not be delivered.
+        
+        Args:
+            user_id: Firebase user ID
+        """
+        today = self._get_today_key()
+        with self._counts_lock:
+            entry = self._counts.get(user_id)
+            if entry is not None and entry["day"] == today:
+                # Folded into the next flush (may cancel out the pending write)
+                entry["count"] = max(entry["count"] - 1, 0)
+                entry["pending"] -= 1
+                if entry["dirty_since"] is None:
+                    entry["dirty_since"] = time.monotonic()
+                return
+        
+        try:
+            self._write_query_delta(user_id, today, -1)
+        except Exception as e:
+            logger.error(f"❌ Error refunding user query: {e}")
+    
+    def _check_and_increment_hot(
+        self, user_id: str, today: str, max_queries: int
+    ) -> Optional[Tuple[bool, int]]:
+        """
+        Check and count a query against the in-memory counter.
+        
+        Returns:
+            (can_query, queries_used) like check_and_increment_query(), or None
+            when the user has no counter for today and Firestore must be read
+        """
+        flushes: List[Tuple[str, int]] = []
+        result: Optional[Tuple[bool, int]] = None
+        with self._counts_lock:
+            entry = self._counts.get(user_id)
+            if entry is not None and entry["day"] != today:
+                # Day rollover: write out yesterday's queries and start fresh
+                del self._counts[user_id]
+                if entry["pending"]:
+                    flushes.append((entry["day"], entry["pending"]))
+            elif entry is not None:
+                queries_used = entry["count"]
+                # Unlimited users (9999) always pass
+                if max_queries < 9999 and queries_used >= max_queries:
+                    result = (False, queries_used)
+                else:
+                    entry["count"] += 1
+                    entry["pending"] += 1
+                    if entry["dirty_since"] is None:
+                        entry["dirty_since"] = time.monotonic()
+                    result = (True, entry["count"])
+                    if self._flush_due(entry, time.monotonic()):
+                        flushes.append(self._take_pending(entry))
+        
+        for day, delta in flushes:
+            self._flush_delta(user_id, day, delta)
+        
+        if result is not None and not result[0]:
+            logger.warning(f"⚠️ User {user_id} has exceeded daily query limit ({result[1]}/{max_queries})")
+        return result
+    
+    @staticmethod
+    def _flush_due(entry: Dict[str, Any], now: float) -> bool:
+        """Whether a counter has buffered enough queries, or long enough, to be written."""
+        if not entry["pending"]:
+            return False
+        return (
+            abs(entry["pending"]) >= CacheConstants.QUERY_COUNT_FLUSH_EVERY
+            or now - entry["dirty_since"] >= CacheConstants.QUERY_COUNT_FLUSH_INTERVAL_SECONDS
+        )
+    
+    @staticmethod
+    def _take_pending(entry: Dict[str, Any]) -> Tuple[str, int]:
+        """Detach a counter's pending delta for writing (caller holds the lock)."""
+        taken = (entry["day"], entry["pending"])
+        entry["pending"] = 0
+        entry["dirty_since"] = None
+        return taken
+    
+    def _flush_delta(self, user_id: str, day: str, delta: int) -> bool:
+        """
+        Write a detached delta; on failure put it back so the next flush retries it.
+        
+        Returns:
+            True if the delta was written
+        """
         try:
-            date_obj = datetime.strptime(date_key, "%Y-%m-%d")
-            days_old = (cutoff_date - date_obj).days
-            return days_old <= days_to_keep
-        except Exception:
-            # Invalid date format, don't keep
+            self._write_query_delta(user_id, day, delta)
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error flushing query count for user {user_id}: {e}")
+            with self._counts_lock:
+                entry = self._counts.get(user_id)
+                if entry is not None and entry["day"] == day:
+                    entry["pending"] += delta
+                    if entry["dirty_since"] is None:
+                        entry["dirty_since"] = time.monotonic()
             return False
     
-    def cleanup_old_usage(self, days_to_keep: int = 30):
+    def flush_pending_counts(self, force: bool = False) -> int:
+        """
+        Write buffered query counts to Firestore.
+        
+        Called periodically by a background task and, with force=True, on shutdown.
+        Counters are dropped once fully written (idle ones right away), so the
+        next query of each user re-reads the count shared by all workers.
+        
+        Args:
+            force: Flush every pending count, not only those due
+            
+        Returns:
+            Number of users whose counts were written
+        """
+        today = self._get_today_key()
+        now = time.monotonic()
+        flushes: List[Tuple[str, str, int]] = []
+        with self._counts_lock:
+            for user_id, entry in list(self._counts.items()):
+                if entry["pending"] and (force or entry["day"] != today or self._flush_due(entry, now)):
+                    flushes.append((user_id, *self._take_pending(entry)))
+                elif entry["day"] != today or not entry["pending"]:
+                    # Past day, or nothing left to write: Firestore already has this count
+                    del self._counts[user_id]
+        
+        for user_id, day, delta in flushes:
+            if not self._flush_delta(user_id, day, delta):
+                continue
+            with self._counts_lock:
+                entry = self._counts.get(user_id)
+                # Keep counters that took new queries while the write was in flight
+                if entry is not None and (entry["day"] != today or not entry["pending"]):
+                    del self._counts[user_id]
+        
+        if flushes:
+            logger.info(f"💾 Flushed query counts for {len(flushes)} user(s)")
+        return len(flushes)
+    
+    def cleanup_old_usage(self, days_to_keep: int = TierConstants.USAGE_RETENTION_DAYS) -> int:
         """
         Clean up old usage data (keep last N days).
         
-        This should be run periodically (e.g., daily cron job).
+        Normally unnecessary: the Firestore TTL policy on expires_at deletes
+        old day documents. Kept as a manual fallback (e.g. before the policy
+        is configured).
+        
+        The query runs across all users' "days" subcollections, so it needs a
+        collection-group index on days.day (declared, together with the TTL
+        policy, in frontend/firestore.indexes.json; deploy it with
+        `firebase deploy --only firestore:indexes`). Without it Firestore
+        rejects the query and nothing is deleted.
         
         Args:
             days_to_keep: Number of days to keep data for
+            
+        Returns:
+            Number of day documents deleted
         """
         try:
-            cutoff_date = datetime.now(timezone.utc).replace(
-                hour=0, minute=0, second=0, microsecond=0
-            )
+            cutoff_key = (datetime.now(timezone.utc) - timedelta(days=days_to_keep)).strftime("%Y-%m-%d")
             
-            # Get all user usage documents
-            usage_docs = self.db.collection("user_usage").stream()
+            # Day documents of all users older than the cutoff. Zero-padded YYYY-MM-DD keys
+            # sort like dates, so a string comparison replaces per-key date parsing.
+            old_days = self.db.collection_group("days").where("day", "<", cutoff_key).stream()
             
-            for doc in usage_docs:
-                data = doc.to_dict()
-                if not data:
-                    continue
-                
-                queries = data.get("queries", {})
-                if not queries:
-                    continue
-                
-                # Filter queries to keep only recent ones
-                updated_queries = {
-                    date_key: count
-                    for date_key, count in queries.items()
-                    if self._should_keep_date(date_key, cutoff_date, days_to_keep)
-                }
-                
-                # Update document if changed
-                if len(updated_queries) < len(queries):
-                    doc.reference.update({"queries": updated_queries})
-                    logger.info(f"🧹 Cleaned up usage for user {doc.id}")
+            # Delete in WriteBatch commits (max 500 writes each) instead of one RPC per document
+            deleted = 0
+            batch = self.db.batch()
+            batch_size = 0
+            for doc in old_days:
+                batch.delete(doc.reference)
+                batch_size += 1
+                if batch_size == FIRESTORE_BATCH_LIMIT:
+                    batch.commit()
+                    deleted += batch_size
+                    batch = self.db.batch()
+                    batch_size = 0
+            if batch_size:
+                batch.commit()
+                deleted += batch_size
             
-            logger.info("✅ Usage cleanup completed")
+            logger.info(f"✅ Usage cleanup completed ({deleted} day documents removed)")
+            return deleted
             
         except Exception as e:
             logger.error(f"❌ Error cleaning up usage: {e}")
+            return 0
 
 
 # Singleton instance
@@ -195,3 +455,10 @@ def get_usage_service() -> UsageTrackingService:
     if _usage_service is None:
         _usage_service = UsageTrackingService()
     return _usage_service
+
+
+def flush_pending_usage_counts(force: bool = False) -> int:
+    """Flush buffered query counts, if the usage service has been created."""
+    if _usage_service is None:
+        return 0
+    return _usage_service.flush_pending_counts(force)
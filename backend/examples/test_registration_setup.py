@@ -25,6 +25,46 @@ if not firebase_admin._apps:
 # Initialize Firestore client
 db = firestore.client()
 
+TEST_SCENARIOS = """
+🎉 Test data setup complete!
+
+📋 Test Scenarios:
+1. Register with email in unlimited list -> UNLIMITED tier (no code needed)
+2. Register with FREE2024 code -> FREE tier
+3. Register with PRO2024 code -> PRO tier
+4. Register with UNLIMITED2024 code -> UNLIMITED tier
+5. Register with EXPIRED2023 code -> Should fail (expired)
+6. Register without code and not in unlimited list -> Should fail"""
+
+API_USAGE_EXAMPLES = """
+🧪 Example API Usage:
+
+1. For unlimited email users:
+
+    POST /auth/register
+    {
+        "id_token": "<firebase_id_token>",
+        "invitation_code": null
+    }
+    
+
+2. For users with invitation code:
+
+    POST /auth/register
+    {
+        "id_token": "<firebase_id_token>",
+        "invitation_code": "PRO2024"
+    }
+    
+
+3. Check current tier:
+
+    POST /auth/refresh-claims
+    {
+        "id_token": "<firebase_id_token>"
+    }
+    """
+
 
 def setup_test_data():
     """
@@ -68,10 +108,11 @@ def setup_test_data():
         }
     ]
     
+    # All writes go into one batch: a single commit (one round-trip, atomic)
+    batch = db.batch()
     for code_data in codes_to_create:
         code_ref = db.collection("invitation_codes").document(code_data["code"])
-        code_ref.set(code_data)
-        print(f"✅ Created invitation code: {code_data['code']} ({code_data['tier']})")
+        batch.set(code_ref, code_data)
     
     # 2. Configure unlimited emails list
     unlimited_emails = [
@@ -80,20 +121,21 @@ def setup_test_data():
     ]
     
     settings_ref = db.collection("app_config").document("settings")
-    settings_ref.set({
+    batch.set(settings_ref, {
         "unlimited_emails": unlimited_emails,
         "updated_at": SERVER_TIMESTAMP
     })
-    print(f"✅ Configured {len(unlimited_emails)} unlimited emails")
     
-    print("\n🎉 Test data setup complete!")
-    print("\n📋 Test Scenarios:")
-    print("1. Register with email in unlimited list -> UNLIMITED tier (no code needed)")
-    print("2. Register with FREE2024 code -> FREE tier")
-    print("3. Register with PRO2024 code -> PRO tier")
-    print("4. Register with UNLIMITED2024 code -> UNLIMITED tier")
-    print("5. Register with EXPIRED2023 code -> Should fail (expired)")
-    print("6. Register without code and not in unlimited list -> Should fail")
+    batch.commit()
+    
+    # Build the whole report and print it once
+    report = [
+        f"✅ Created invitation code: {code_data['code']} ({code_data['tier']})"
+        for code_data in codes_to_create
+    ]
+    report.append(f"✅ Configured {len(unlimited_emails)} unlimited emails")
+    report.append(TEST_SCENARIOS)
+    print("\n".join(report))
 
 
 def test_registration_flow():
@@ -104,32 +146,7 @@ def test_registration_flow():
     1. Get id_token from Firebase Auth on frontend
     2. Send POST request to /auth/register with token and optional code
     """
-    print("\n🧪 Example API Usage:")
-    print("\n1. For unlimited email users:")
-    print("""
-    POST /auth/register
-    {
-        "id_token": "<firebase_id_token>",
-        "invitation_code": null
-    }
-    """)
-    
-    print("\n2. For users with invitation code:")
-    print("""
-    POST /auth/register
-    {
-        "id_token": "<firebase_id_token>",
-        "invitation_code": "PRO2024"
-    }
-    """)
-    
-    print("\n3. Check current tier:")
-    print("""
-    POST /auth/refresh-claims
-    {
-        "id_token": "<firebase_id_token>"
-    }
-    """)
+    print(API_USAGE_EXAMPLES)
 
 
 if __name__ == "__main__":
@@ -1,11 +1,14 @@
+import asyncio
 import os
 import time
 from contextlib import asynccontextmanager
 from pathlib import Path
 
+import orjson
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response
 
 # Load .env from backend directory first
 env_path = Path(__file__).parent / ".env"
@@ -13,7 +16,8 @@ load_dotenv(dotenv_path=env_path, override=True)
 
 # Now, import other modules
 from app.core.config import settings  # noqa: E402
-from app.core.firebase import initialize_firebase  # noqa: E402
+from app.core.constants import CacheConstants  # noqa: E402
+from app.core.firebase import initialize_firebase, is_firebase_ready  # noqa: E402
 from app.core.logging import logger  # noqa: E402
 from app.db.chroma_client import get_chroma_client, get_embedding_function  # noqa: E402
 from app.routers import (  # noqa: E402
@@ -22,6 +26,63 @@ from app.routers import (  # noqa: E402
     query_router,
     support_router,
 )
+from app.services.pdf_extraction_service import pdf_extraction_service  # noqa: E402
+from app.services.usage_tracking_service import flush_pending_usage_counts  # noqa: E402
+
+
+async def flush_usage_counts_periodically() -> None:
+    """Write buffered per-user query counts to Firestore in the background."""
+    while True:
+        await asyncio.sleep(CacheConstants.QUERY_COUNT_FLUSH_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(flush_pending_usage_counts)
+        except Exception as e:
+            logger.error(f"❌ Query count flush failed: {e}")
+
+
+# Warmup inputs: short (~10 tokens), medium (~128) and long (model max) texts
+_WARMUP_SENTENCE = "The quarterly report summarizes revenue, costs and project milestones. "
+_WARMUP_TEXTS = {
+    "short": _WARMUP_SENTENCE,
+    "medium": _WARMUP_SENTENCE * 11,
+    "long": _WARMUP_SENTENCE * 45,
+}
+_WARMUP_BATCH_SIZE = 32  # Typical ingestion batch
+
+
+def _warm_up_embeddings() -> None:
+    """
+    Load the embedding model and run it once on each typical input shape.
+
+    The first inference on a new batch size / sequence length is slow; paying
+    it here keeps it off the first queries and uploads.
+    """
+    embedding_fn = get_embedding_function()  # Loads the SentenceTransformer model
+    embedding_fn.embed_query("test")
+    if not settings.PRELOAD_WARMUP_EMBEDDINGS:
+        return
+
+    for shape, text in _WARMUP_TEXTS.items():
+        start = time.perf_counter()
+        embedding_fn.embed_documents([text])
+        logger.debug(f"🔥 Embedding warmup ({shape}): {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    start = time.perf_counter()
+    embedding_fn.embed_documents([_WARMUP_TEXTS["medium"]] * _WARMUP_BATCH_SIZE)
+    logger.debug(
+        f"🔥 Embedding warmup (batch of {_WARMUP_BATCH_SIZE}): {(time.perf_counter() - start) * 1000:.1f}ms"
+    )
+
+
+def _log_embedding_preload(task: "asyncio.Task[None]") -> None:
+    """Report the outcome of the background embedding model preload."""
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None:
+        logger.error(f"❌ Embedding model preload failed: {error}")
+    else:
+        logger.info("✅ Embedding model preloaded successfully.")
 
 
 # --- Lifespan Context Manager (Modern FastAPI Pattern) ---
@@ -36,27 +97,37 @@ async def lifespan(app: FastAPI):
     # Initialize Firebase
     initialize_firebase()
 
+    # Serve tier limits / unlimited emails from a live snapshot instead of per-request reads
+    auth_router.watch_app_config()
+
     # Verify ChromaDB connection and preload models
     try:
-        if not os.path.exists(settings.CHROMA_DB_PATH):
-            os.makedirs(settings.CHROMA_DB_PATH)
-            logger.info(f"📁 Created persistent DB folder: {settings.CHROMA_DB_PATH}")
+        # Atomic and safe when several workers start at once
+        Path(settings.CHROMA_DB_PATH).mkdir(parents=True, exist_ok=True)
 
         client = get_chroma_client()
         logger.info(f"✅ ChromaDB client connected (Version: {client.get_version()})")
 
-        embedding_fn = get_embedding_function()
-        embedding_fn.embed_query("test")  # Preload model
-        logger.info("✅ Embedding model preloaded successfully.")
+        # Load and warm up the model in a worker thread: the server accepts
+        # connections meanwhile, and an early query simply waits for the same model init
+        preload_task = asyncio.create_task(asyncio.to_thread(_warm_up_embeddings))
+        preload_task.add_done_callback(_log_embedding_preload)
 
     except Exception as e:
         logger.error(f"❌ Critical startup failure: {e}")
         raise
 
+    usage_flush_task = asyncio.create_task(flush_usage_counts_periodically())
+
     yield  # Application runs here
 
     # SHUTDOWN
     logger.info("🔄 Shutting down application...")
+    usage_flush_task.cancel()
+    preload_task.cancel()
+    auth_router.stop_watching_app_config()
+    await asyncio.to_thread(flush_pending_usage_counts, True)
+    await asyncio.to_thread(pdf_extraction_service.shutdown)
     logger.info("✅ Shutdown complete!")
 
 
@@ -66,18 +137,108 @@ app = FastAPI(
     version=settings.PROJECT_VERSION,
     description="Document Intelligent Hub API",
     lifespan=lifespan,
+    # orjson: C serializer with native UTF-8 (answers are full of non-ASCII text)
+    default_response_class=ORJSONResponse,
 )
 
+# --- Logging Middleware ---
+# Access logger bound once; lazy=True: the callable arguments are only evaluated
+# (and the message only formatted) when a sink accepts the record's level
+_access_logger = logger.bind(ACCESS=True).opt(lazy=True)
+
+
+class TimingLoggingMiddleware:
+    """
+    Pure ASGI middleware logging every HTTP request with timing information.
+
+    Unlike @app.middleware("http") (BaseHTTPMiddleware), it adds no extra task
+    per request and leaves the response stream untouched: it only watches the
+    response start message for the status code.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_ns = time.perf_counter_ns()  # Monotonic, integer nanoseconds
+        method = scope["method"]
+        path = scope["path"]
+        _access_logger.info(
+            "➡️  {} {} - Client: {}",
+            lambda: method,
+            lambda: path,
+            lambda: scope["client"][0] if scope.get("client") else "unknown",
+        )
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            end_ns = time.perf_counter_ns()
+            # Lazy too: the traceback itself is logged once, by the server error handling
+            logger.opt(lazy=True).error(
+                "❌ {} {} - Error: {} - Time: {:.2f}ms",
+                lambda: method,
+                lambda: path,
+                lambda: e,
+                lambda: (end_ns - start_ns) / 1_000_000,
+            )
+            # Re-raise the exception to be handled by the server error handling
+            raise
+
+        end_ns = time.perf_counter_ns()
+        _access_logger.info(
+            "{} {} {} - Status: {} - Time: {:.2f}ms",
+            lambda: "✅" if status_code < 400 else "❌",
+            lambda: method,
+            lambda: path,
+            lambda: status_code,
+            lambda: (end_ns - start_ns) / 1_000_000,  # in milliseconds
+        )
+
+
+# Added before CORS: the last middleware added is the outermost, so CORS
+# answers preflights and rejects disallowed origins before any logging
+app.add_middleware(TimingLoggingMiddleware)
+
+
 # --- CORS Configuration ---
+class OriginSetCORSMiddleware(CORSMiddleware):
+    """CORSMiddleware checking origins with one frozenset lookup instead of a list scan."""
+
+    def __init__(self, app, allow_origins=(), **kwargs):
+        super().__init__(app, allow_origins=allow_origins, **kwargs)
+        self._origins_set = frozenset(origin.lower() for origin in allow_origins)
+
+    def is_allowed_origin(self, origin: str) -> bool:
+        if self.allow_all_origins:
+            return True
+        if self.allow_origin_regex is not None and self.allow_origin_regex.fullmatch(origin):
+            return True
+        return origin.lower() in self._origins_set
+
+
 if os.getenv("ENVIRONMENT") == "production":
-    origins = settings.ALLOWED_ORIGINS.split(",")
+    # Normalized once at startup (whitespace around commas, host case)
+    origins = [o.strip().lower() for o in settings.ALLOWED_ORIGINS.split(",") if o.strip()]
     logger.info(f"🔒 Production CORS enabled for: {origins}")
 else:
     origins = ["*"]
     logger.warning("🔓 Development CORS enabled for all origins ('*')")
 
 app.add_middleware(
-    CORSMiddleware,
+    OriginSetCORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
@@ -85,61 +246,38 @@ app.add_middleware(
 )
 
 
-# --- Logging Middleware ---
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log all HTTP requests with timing information."""
-    start_time = time.time()
-    client_host = request.client.host if request.client else "unknown"
-    logger.bind(ACCESS=True).info(
-        f"➡️  {request.method} {request.url.path} - Client: {client_host}"
-    )
-
-    try:
-        response = await call_next(request)
-        process_time = (time.time() - start_time) * 1000  # in milliseconds
-        status_emoji = "✅" if response.status_code < 400 else "❌"
-        logger.bind(ACCESS=True).info(
-            f"{status_emoji} {request.method} {request.url.path} - Status: {response.status_code} - Time: {process_time:.2f}ms"
-        )
-        return response
-    except Exception as e:
-        process_time = (time.time() - start_time) * 1000
-        logger.error(
-            f"❌ {request.method} {request.url.path} - Error: {str(e)} - Time: {process_time:.2f}ms"
-        )
-        # Re-raise the exception to be handled by FastAPI's error handling
-        raise
-
-
 # --- Router Registration ---
 app.include_router(documents_router.router)
 app.include_router(query_router.router)
 app.include_router(support_router.router)
 
-# Conditionally register auth router if Firebase is available
-try:
-    import firebase_admin
-
-    if len(firebase_admin._apps) > 0:
-        app.include_router(auth_router.router)
-        logger.info("✅ Authentication endpoints registered.")
-    else:
-        logger.warning(
-            "⚠️ Authentication endpoints NOT registered - Firebase not initialized."
-        )
-except (ImportError, AttributeError):
+# Conditionally register auth router if Firebase was initialized
+# (read at registration time: the flag is set by initialize_firebase())
+if is_firebase_ready():
+    app.include_router(auth_router.router)
+    logger.info("✅ Authentication endpoints registered.")
+else:
     logger.warning(
-        "⚠️ Authentication endpoints NOT registered - 'firebase_admin' not found."
+        "⚠️ Authentication endpoints NOT registered - Firebase not initialized."
     )
 
 
 # --- Root Endpoint (Health Check) ---
+# The body never changes: serialized once instead of on every health check
+_HEALTH_BODY = orjson.dumps({
+    "message": f"Welcome to the {settings.PROJECT_NAME} API!",
+    "version": settings.PROJECT_VERSION,
+    "status": "healthy",
+})
+
+
 @app.get("/", tags=["Root"])
-def read_root():
+async def read_root() -> Response:
     """Health check endpoint to verify the API is running."""
-    return {
-        "message": f"Welcome to the {settings.PROJECT_NAME} API!",
-        "version": settings.PROJECT_VERSION,
-        "status": "healthy",
-    }
+    return Response(content=_HEALTH_BODY, media_type="application/json")
+
+
+@app.head("/", tags=["Root"])
+async def head_root() -> Response:
+    """Health check for HEAD probes (load balancers, k8s): status only, no body."""
+    return Response(status_code=200)
@@ -50,9 +50,10 @@ def setup_tier_limits():
         "updated_at": firestore.SERVER_TIMESTAMP
     }
     
-    # Update or create the document
+    # Create or replace the document: the script owns every field the app reads
+    # (limits, unlimited_emails), so no merge with the existing content is needed
     settings_ref = db.collection("app_config").document("settings")
-    settings_ref.set(settings_data, merge=True)
+    settings_ref.set(settings_data)
     
     print("✅ Tier limits configured successfully!")
     print("\n📊 Tier Limits:")
@@ -11,10 +11,78 @@ from unittest.mock import Mock, patch
 
 import pytest
 from app.core.config import settings
+from app.repositories.vector_store_repository import VectorStoreRepository
+from app.routers import auth_router, query_router
+from app.services import email_service
 from fastapi.testclient import TestClient
+from firebase_admin import auth as firebase_auth
 from main import app
 
 
+# Minimal valid single-page PDF used by the upload tests
+_SAMPLE_PDF_BYTES = b"""%PDF-1.4
+1 0 obj
+<<
+/Type /Catalog
+/Pages 2 0 R
+>>
+endobj
+2 0 obj
+<<
+/Type /Pages
+/Kids [3 0 R]
+/Count 1
+>>
+endobj
+3 0 obj
+<<
+/Type /Page
+/Parent 2 0 R
+/Resources <<
+/Font <<
+/F1 <<
+/Type /Font
+/Subtype /Type1
+/BaseFont /Helvetica
+>>
+>>
+>>
+/MediaBox [0 0 612 792]
+/Contents 4 0 R
+>>
+endobj
+4 0 obj
+<<
+/Length 44
+>>
+stream
+BT
+/F1 12 Tf
+100 700 Td
+(Test PDF Document) Tj
+ET
+endstream
+endobj
+xref
+0 5
+0000000000 65535 f
+0000000009 00000 n
+0000000058 00000 n
+0000000115 00000 n
+0000000317 00000 n
+trailer
+<<
+/Size 5
+/Root 1 0 R
+>>
+startxref
+410
+%%EOF"""
+
+
+DEFAULT_TEST_USER_ID = "test-user-12345"
+
+
 class TestClientWithContext(TestClient):
     """
     Extended TestClient with test_user_context attribute for auth mocking.
@@ -36,44 +104,49 @@ def cleanup_chroma_db_after_session():
         shutil.rmtree(settings.CHROMA_DB_PATH)
 
 
-@pytest.fixture(scope="module", autouse=True)
+@pytest.fixture(scope="session", autouse=True)
 def mock_firebase_auth():
     """
     Mock Firebase Admin SDK auth functions to avoid real auth calls in tests.
     This prevents tests from failing due to missing credentials or network issues.
+    Session-scoped: the mocks are stateless (fixed return values).
     """
-    with patch("firebase_admin.auth.verify_id_token") as mock_verify_id_token, \
-         patch("firebase_admin.auth.get_user") as mock_get_user:
-
-        # Mock verify_id_token
-        mock_verify_id_token.return_value = {"uid": "test-user-12345"}
-
-        # Mock get_user
-        mock_user = Mock()
-        mock_user.uid = "test-user-12345"
-        mock_user.email = "test@example.com"
-        mock_user.custom_claims = {"tier": "FREE"}
-        mock_get_user.return_value = mock_user
-        
+    # Mock verify_id_token
+    mock_verify_id_token = Mock(return_value={"uid": "test-user-12345"})
+
+    # Mock get_user
+    mock_user = Mock()
+    mock_user.uid = "test-user-12345"
+    mock_user.email = "test@example.com"
+    mock_user.custom_claims = {"tier": "FREE"}
+    mock_get_user = Mock(return_value=mock_user)
+
+    # Session scope: the function-scoped monkeypatch fixture is not available here
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(firebase_auth, "verify_id_token", mock_verify_id_token)
+        mp.setattr(firebase_auth, "get_user", mock_get_user)
+
         yield {
             "verify_id_token": mock_verify_id_token,
             "get_user": mock_get_user
         }
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def client():
     """
     Create a TestClient instance for testing FastAPI endpoints.
     Mock Firebase auth to bypass token verification in tests.
     
     The mock returns a test user ID that can be overridden per-test.
+    Session-scoped: the app starts up once; per-test state is reset by
+    _reset_client_state.
     """
     from app.core.auth import verify_firebase_token
     from fastapi import HTTPException, status
     
     # Shared state for current test user ID (can be None for auth failure tests)
-    test_user_context: dict[str, str | None] = {"user_id": "test-user-12345"}
+    test_user_context: dict[str, str | None] = {"user_id": DEFAULT_TEST_USER_ID}
     
     def mock_verify_token():
         """
@@ -101,11 +174,30 @@ def client():
             test_client.test_user_context = test_user_context
             yield test_client
         
-        # Clean up dependency overrides after tests
+        # Clean up dependency overrides after the session
         app.dependency_overrides.clear()
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="function", autouse=True)
+def _reset_client_state(request):
+    """
+    Undo per-test changes to the session-wide client: the current test user
+    and any dependency override a test added or replaced.
+    Only runs for tests that use the client (does not start the app otherwise).
+    """
+    if "client" not in request.fixturenames:
+        yield
+        return
+
+    test_client = request.getfixturevalue("client")
+    test_client.test_user_context["user_id"] = DEFAULT_TEST_USER_ID
+    overrides = app.dependency_overrides.copy()
+    yield
+    app.dependency_overrides.clear()
+    app.dependency_overrides.update(overrides)
+
+
+@pytest.fixture(scope="session")
 def sample_pdf():
     """
     Create a temporary PDF file for testing uploads.
@@ -117,70 +209,9 @@ def sample_pdf():
     For real testing, use actual PDF files. The core CRUD operations
     (list, check, delete) work correctly as shown by passing tests.
     """
-    # Create a minimal valid PDF
-    pdf_content = b"""%PDF-1.4
-1 0 obj
-<<
-/Type /Catalog
-/Pages 2 0 R
->>
-endobj
-2 0 obj
-<<
-/Type /Pages
-/Kids [3 0 R]
-/Count 1
->>
-endobj
-3 0 obj
-<<
-/Type /Page
-/Parent 2 0 R
-/Resources <<
-/Font <<
-/F1 <<
-/Type /Font
-/Subtype /Type1
-/BaseFont /Helvetica
->>
->>
->>
-/MediaBox [0 0 612 792]
-/Contents 4 0 R
->>
-endobj
-4 0 obj
-<<
-/Length 44
->>
-stream
-BT
-/F1 12 Tf
-100 700 Td
-(Test PDF Document) Tj
-ET
-endstream
-endobj
-xref
-0 5
-0000000000 65535 f
-0000000009 00000 n
-0000000058 00000 n
-0000000115 00000 n
-0000000317 00000 n
-trailer
-<<
-/Size 5
-/Root 1 0 R
->>
-startxref
-410
-%%EOF"""
-
-    # Create temporary file
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    temp_file.write(pdf_content)
-    temp_file.close()
+    # Written once for the whole session: tests only read the file
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
+        temp_file.write(_SAMPLE_PDF_BYTES)
 
     yield temp_file.name
 
@@ -220,8 +251,6 @@ def mock_vector_store_repository():
             service = RAGService(repository=mock_vector_store_repository)
             # Test service logic here
     """
-    from app.repositories.vector_store_repository import VectorStoreRepository
-    
     mock_repo = Mock(spec=VectorStoreRepository)
     
     # Configure default behaviors
@@ -237,57 +266,85 @@ def mock_vector_store_repository():
     mock_retriever = Mock()
     mock_retriever.invoke.return_value = []
     mock_repo.get_retriever.return_value = mock_retriever
+    mock_repo.multi_query_search.return_value = []
     
     return mock_repo
 
 
-@pytest.fixture(scope="function", autouse=True)
+def _configure_usage_service_mock(mock_service_instance):
+    """Apply the default usage service behaviors (all queries allowed)."""
+    # check_query_limit is SYNCHRONOUS - returns tuple directly (not awaitable)
+    mock_service_instance.check_query_limit = Mock(return_value=(True, 0))
+    
+    # check_and_increment_query (live query path) counts the query up front
+    mock_service_instance.check_and_increment_query = Mock(return_value=(True, 1))
+    mock_service_instance.refund_query = Mock(return_value=None)
+    
+    # increment_user_queries is also SYNCHRONOUS
+    mock_service_instance.increment_user_queries = Mock(return_value=1)
+    
+    # get_user_queries_today is also SYNCHRONOUS
+    mock_service_instance.get_user_queries_today = Mock(return_value=0)
+
+
+def _configure_email_service_mock(mock_service_instance):
+    """Apply the default email service behaviors - return True (success) but do nothing."""
+    mock_service_instance.send_bug_report = Mock(return_value=True)
+    mock_service_instance.send_feedback = Mock(return_value=True)
+    mock_service_instance.send_invitation_request = Mock(return_value=True)
+
+
+@pytest.fixture(scope="session", autouse=True)
 def mock_usage_service():
     """
     Mock the usage tracking service to prevent hitting rate limits in tests.
     This fixture will automatically be used in all tests.
     Patches both query_router and auth_router usage service imports.
+    Installed once per session; state is restored per test by _reset_service_mocks.
     """
-    with patch("app.routers.query_router.get_usage_service") as mock_get_service_query, \
-         patch("app.routers.auth_router.get_usage_service") as mock_get_service_auth:
-        # Create a mock for the service *instance*
-        mock_service_instance = Mock()
-
-        # check_query_limit is SYNCHRONOUS - returns tuple directly (not awaitable)
-        mock_service_instance.check_query_limit = Mock(return_value=(True, 0))
-        
-        # increment_user_queries is also SYNCHRONOUS
-        mock_service_instance.increment_user_queries = Mock(return_value=1)
-        
-        # get_user_queries_today is also SYNCHRONOUS
-        mock_service_instance.get_user_queries_today = Mock(return_value=0)
+    # Create a mock for the service *instance*
+    mock_service_instance = Mock()
+    _configure_usage_service_mock(mock_service_instance)
 
-        # The dependency-injected function `get_usage_service` should return this instance.
-        mock_get_service_query.return_value = mock_service_instance
-        mock_get_service_auth.return_value = mock_service_instance
+    # The dependency-injected function `get_usage_service` should return this instance.
+    # Plain setattr, restored at the end of the session (cheaper than patch() enter/exit)
+    mock_get_service = Mock(return_value=mock_service_instance)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(query_router, "get_usage_service", mock_get_service)
+        mp.setattr(auth_router, "get_usage_service", mock_get_service)
         
         yield mock_service_instance
 
 
-@pytest.fixture(scope="function", autouse=True)
+@pytest.fixture(scope="session", autouse=True)
 def mock_email_service():
     """
     Mock the email service to prevent sending real emails during tests.
     This fixture will automatically be used in all tests.
+    Installed once per session; state is restored per test by _reset_service_mocks.
     """
-    with patch("app.routers.auth_router.get_email_service") as mock_get_service_auth, \
-         patch("app.services.email_service.get_email_service") as mock_get_service_global:
-        
-        # Create a mock for the service *instance*
-        mock_service_instance = Mock()
-        
-        # Configure default behaviors - return True (success) but do nothing
-        mock_service_instance.send_bug_report.return_value = True
-        mock_service_instance.send_feedback.return_value = True
-        mock_service_instance.send_invitation_request.return_value = True
-        
-        # The dependency-injected function `get_email_service` should return this instance.
-        mock_get_service_auth.return_value = mock_service_instance
-        mock_get_service_global.return_value = mock_service_instance
+    # Create a mock for the service *instance*
+    mock_service_instance = Mock()
+    _configure_email_service_mock(mock_service_instance)
+    
+    # The dependency-injected function `get_email_service` should return this instance.
+    mock_get_service = Mock(return_value=mock_service_instance)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(auth_router, "get_email_service", mock_get_service)
+        mp.setattr(email_service, "get_email_service", mock_get_service)
         
         yield mock_service_instance
+
+
+@pytest.fixture(scope="function", autouse=True)
+def _reset_service_mocks(mock_usage_service, mock_email_service):
+    """
+    Give every test clean session-wide service mocks.
+    Call history, return values and side effects set by a test are cleared,
+    then the fixture defaults are applied again.
+    """
+    yield
+    mock_usage_service.reset_mock(return_value=True, side_effect=True)
+    _configure_usage_service_mock(mock_usage_service)
+    mock_email_service.reset_mock(return_value=True, side_effect=True)
+    _configure_email_service_mock(mock_email_service)
@@ -168,6 +168,37 @@ class TestLoadAppConfig:
             assert result["unlimited_emails"] == []
             assert result["limits"]["UNLIMITED"]["max_queries_per_day"] == 9999
 
+    def test_watch_app_config_snapshot_updates_cache(self):
+        """Test that config pushed by the snapshot listener is served without a Firestore read"""
+        import app.routers.auth_router as auth_router_module
+        auth_router_module._unlimited_emails_cache = None
+        auth_router_module._tier_limits_cache = None
+        auth_router_module._app_config_watch = None
+        
+        with patch("app.routers.auth_router.get_db") as mock_get_db:
+            doc_ref = MagicMock()
+            mock_get_db.return_value.collection.return_value.document.return_value = doc_ref
+            
+            auth_router_module.watch_app_config()
+            on_settings_snapshot, = doc_ref.on_snapshot.call_args.args
+            
+            config_doc = MagicMock()
+            config_doc.exists = True
+            config_doc.to_dict.return_value = {
+                "unlimited_emails": ["vip@example.com"],
+                "limits": {"FREE": {"max_queries_per_day": 42}}
+            }
+            on_settings_snapshot([config_doc], [], None)
+            
+            result = load_app_config()
+            
+            assert result["unlimited_emails"] == ["vip@example.com"]
+            assert result["limits"]["FREE"]["max_queries_per_day"] == 42
+            doc_ref.get.assert_not_called()
+            
+            auth_router_module.stop_watching_app_config()
+            doc_ref.on_snapshot.return_value.unsubscribe.assert_called_once()
+
 
 class TestGetCurrentUserId:
     """Test get_current_user_id dependency"""
@@ -7,6 +7,8 @@ Tests the /rag/report-bug endpoint with a sample image.
 import io
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from PIL import Image
 
 # Configuration
@@ -14,6 +16,13 @@ API_URL = "http://localhost:8000/rag/report-bug"
 USER_ID = "test_user_123"
 CONVERSATION_ID = "test_conversation_456"
 
+# One pooled session: requests reuse the keep-alive connection to the API
+SESSION = requests.Session()
+SESSION.mount(
+    "http://",
+    HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=Retry(total=2, backoff_factor=0.1)),
+)
+
 def create_test_image():
     """Create a simple test image in memory."""
     # Create a 400x300 red rectangle
@@ -64,7 +73,7 @@ def test_bug_report_with_attachment():
         print(f"   Conversation ID: {CONVERSATION_ID}")
         print("   Attachment: test_screenshot.png (PNG image)")
         
-        response = requests.post(API_URL, data=data, files=files)
+        response = SESSION.post(API_URL, data=data, files=files)
         
         print(f"\n📥 Response Status: {response.status_code}")
         
@@ -105,7 +114,7 @@ def test_bug_report_without_attachment():
         print(f"   User ID: {USER_ID}")
         print("   No attachment")
         
-        response = requests.post(API_URL, data=data)
+        response = SESSION.post(API_URL, data=data)
         
         print(f"\n📥 Response Status: {response.status_code}")
         
@@ -128,11 +137,12 @@ if __name__ == "__main__":
     print("Bug Report API Test with File Attachments")
     print("=" * 60)
     
-    # Test with attachment
-    test_bug_report_with_attachment()
-    
-    # Test without attachment
-    test_bug_report_without_attachment()
+    with SESSION:
+        # Test with attachment
+        test_bug_report_with_attachment()
+        
+        # Test without attachment
+        test_bug_report_without_attachment()
     
     print("\n" + "=" * 60)
     print("Tests completed!")
@@ -0,0 +1,86 @@
+"""
+Unit tests for PDFExtractionService loader selection.
+"""
+
+from unittest.mock import patch
+
+from app.services.pdf_extraction_service import PDFExtractionService
+from langchain_core.documents import Document
+
+
+class TestPDFExtractionService:
+    """Test PyMuPDF extraction and Unstructured fallback selection"""
+
+    def test_text_pdf_uses_pymupdf_elements(self):
+        """Text-based PDFs are returned as PyMuPDF page elements"""
+        service = PDFExtractionService()
+        elements = [(1, "Text", "x" * 600, 10.0), (2, "Table", "| a | b |", 0.0)]
+
+        with patch.object(service, "_extract_elements", return_value=elements), \
+             patch.object(service, "_load_with_unstructured") as mock_unstructured:
+            documents = service.load("file.pdf")
+
+        mock_unstructured.assert_not_called()
+        assert len(documents) == 2
+        assert documents[0].metadata["page_number"] == 1
+        assert documents[1].metadata["type"] == "Table"
+
+    def test_large_font_blocks_become_titles(self):
+        """Blocks in a larger font than the body become Title elements"""
+        service = PDFExtractionService()
+        elements = [
+            (1, "Text", "Chapter 1", 18.0),
+            (1, "Text", "Body paragraph one.", 10.0),
+            (1, "Text", "Body paragraph two.", 10.0),
+            (2, "Text", "Body paragraph three.", 10.0),
+        ]
+
+        documents = service._to_documents(elements, "file.pdf")
+
+        assert [doc.metadata["type"] for doc in documents] == ["Title", "NarrativeText", "NarrativeText"]
+        assert documents[0].page_content == "Chapter 1"
+        assert documents[1].page_content == "Body paragraph one.\n\nBody paragraph two."
+        assert documents[2].metadata["page_number"] == 2
+
+    def test_scanned_pdf_falls_back_to_unstructured(self):
+        """PDFs with almost no text layer fall back to Unstructured (OCR)"""
+        service = PDFExtractionService()
+        ocr_docs = [Document(page_content="OCR text", metadata={"type": "NarrativeText"})]
+
+        with patch.object(service, "_extract_elements", return_value=[(1, "Text", "abc", 10.0)]), \
+             patch.object(service, "_load_with_unstructured", return_value=ocr_docs):
+            documents = service.load("scanned.pdf")
+
+        assert documents == ocr_docs
+
+    def test_unstructured_fallback_limits_pages_not_elements(self):
+        """max_pages keeps every Unstructured element of the first pages, not the first N elements"""
+        service = PDFExtractionService()
+        ocr_docs = [
+            Document(page_content=f"Element {i} of page {page}", metadata={"page_number": page})
+            for page in (1, 2, 3, 4)
+            for i in range(3)
+        ]
+
+        with patch.object(service, "_extract_elements", return_value=[(1, "Text", "abc", 10.0)]), \
+             patch("app.services.pdf_extraction_service.UnstructuredPDFLoader") as mock_loader:
+            mock_loader.return_value.load.return_value = ocr_docs
+            documents = service.load("scanned.pdf", max_pages=3)
+
+        assert len(documents) == 9
+        assert {doc.metadata["page_number"] for doc in documents} == {1, 2, 3}
+
+    def test_process_pool_is_shared_and_uses_spawn(self):
+        """Large documents reuse one spawn-context pool until shutdown()"""
+        service = PDFExtractionService()
+
+        with patch("app.services.pdf_extraction_service.ProcessPoolExecutor") as mock_pool:
+            first = service._get_executor()
+            second = service._get_executor()
+            service.shutdown()
+
+        mock_pool.assert_called_once()
+        assert mock_pool.call_args.kwargs["mp_context"].get_start_method() == "spawn"
+        assert first is second
+        first.shutdown.assert_called_once_with(wait=True, cancel_futures=True)
+        assert service._executor is None
@@ -7,7 +7,11 @@ Tests the LLM-based file filter extraction from natural language queries.
 from unittest.mock import Mock, patch
 
 import pytest
-from app.services.query_parser_service import FileFilterResponse, QueryParserService
+from app.services.query_parser_service import (
+    FileFilterResponse,
+    QueryParserService,
+    _build_filename_index,
+)
 from langchain_core.output_parsers import StrOutputParser
 
 
@@ -165,6 +169,54 @@ class TestFileFilterExtraction:
         assert result.cleaned_query == "Cerca nel file report.pdf"  # Original query preserved
 
 
+class TestBatchFileFilterExtraction:
+    """Test batched extraction and its fallback for skipped queries"""
+
+    @patch("app.services.query_parser_service.ChatOpenAI")
+    @patch.object(StrOutputParser, "invoke")
+    def test_batch_maps_results_by_index(self, mock_str_parser_invoke, mock_llm_class):
+        """Results are returned in query order, whatever order the LLM used"""
+        mock_str_parser_invoke.return_value = """{
+            "results": [
+                {"idx": 1, "include_files": [], "exclude_files": ["Data.pdf"], "cleaned_query": "Analizza le vendite"},
+                {"idx": 0, "include_files": ["report.pdf"], "exclude_files": [], "cleaned_query": "Quali sono i requisiti?"}
+            ]
+        }"""
+
+        service = QueryParserService()
+        with patch.object(service, "extract_file_filters") as mock_single:
+            results = service.extract_file_filters_batch(
+                ["Requisiti solo nel file report.pdf", "Analizza le vendite senza data.pdf"],
+                ["report.pdf", "data.pdf"]
+            )
+
+        mock_single.assert_not_called()
+        assert results[0].include_files == ["report.pdf"]
+        assert results[0].cleaned_query == "Quali sono i requisiti?"
+        assert results[1].exclude_files == ["data.pdf"]
+
+    @patch("app.services.query_parser_service.ChatOpenAI")
+    @patch.object(StrOutputParser, "invoke")
+    def test_batch_reruns_skipped_queries(self, mock_str_parser_invoke, mock_llm_class):
+        """A query missing from the batch output is re-run on its own"""
+        mock_str_parser_invoke.return_value = """{
+            "results": [
+                {"idx": 0, "include_files": [], "exclude_files": [], "cleaned_query": "Come configurare il server?"}
+            ]
+        }"""
+        fallback = FileFilterResponse(
+            include_files=[], exclude_files=[], original_query="q2", cleaned_query="q2"
+        )
+
+        service = QueryParserService()
+        with patch.object(service, "extract_file_filters", return_value=fallback) as mock_single:
+            results = service.extract_file_filters_batch(["come configurare il server", "q2"], ["a.pdf"])
+
+        mock_single.assert_called_once_with("q2", ["a.pdf"])
+        assert results[0].cleaned_query == "Come configurare il server?"
+        assert results[1] is fallback
+
+
 class TestCaseInsensitiveMatching:
     """Test that filename matching is case-insensitive"""
     
@@ -239,3 +291,86 @@ class TestCaseInsensitiveMatching:
         assert len(result.include_files) == 0
         assert len(result.exclude_files) == 1
         assert result.exclude_files[0] == "report.pdf"
+
+    def test_filename_index_is_reused_for_same_file_list(self):
+        """The lowercase lookup is built once per distinct file list"""
+        files = ("Report.pdf", "DATA.PDF")
+
+        index = _build_filename_index(files)
+
+        assert index["data.pdf"] == "DATA.PDF"
+        assert _build_filename_index(tuple(files)) is index
+        assert _build_filename_index(files + ("notes.pdf",)) is not index
+
+
+class TestFuzzyFilenameMatching:
+    """Test the embedding-based fallback for inexact filenames"""
+
+    @patch("app.services.query_parser_service.ChatOpenAI")
+    def test_filename_embeddings_are_reused(self, mock_llm_class):
+        """Available filenames are embedded once per file list"""
+        service = QueryParserService()
+        service.embeddings = Mock()
+        service.embeddings.embed_query.return_value = [1.0, 0.0]
+        service.embeddings.embed_documents.return_value = [[0.1, 0.9], [0.95, 0.1]]
+        files = ["budget.pdf", "requirements.pdf"]
+
+        first = service._find_best_match("requirement.pdf", files)
+        second = service._find_best_match("requirement.pdf", files)
+
+        assert first == second == "requirements.pdf"
+        service.embeddings.embed_documents.assert_called_once_with(files)
+
+    @patch("app.services.query_parser_service.ChatOpenAI")
+    def test_no_match_below_threshold(self, mock_llm_class):
+        """Weak similarities do not produce a match"""
+        service = QueryParserService()
+        service.embeddings = Mock()
+        service.embeddings.embed_query.return_value = [1.0, 0.0]
+        service.embeddings.embed_documents.return_value = [[0.1, 0.9]]
+
+        assert service._find_best_match("other.pdf", ["budget.pdf"]) is None
+
+
+class TestFileReferenceDetection:
+    """Test the local pre-check for file references."""
+
+    @pytest.mark.parametrize("query", [
+        "Quali sono i requisiti solo nel file report.pdf?",
+        "Exclude tutorial.pdf from search",
+        "cosa dice il Budget?",
+        "ignora i documenti vecchi",
+    ])
+    def test_detects_file_references(self, query_parser, query):
+        """Keywords, extensions and available file names count as references"""
+        assert query_parser.has_file_references(query, ["Budget.pdf", "report.pdf"]) is True
+
+    def test_plain_question_has_no_file_reference(self, query_parser):
+        """A question that mentions no file skips the file list"""
+        assert query_parser.has_file_references(
+            "come configurare il server?", ["Budget.pdf", "report.pdf"]
+        ) is False
+
+    @pytest.mark.parametrize("query", [
+        "escludi il report",
+        "only the 2024 report",
+        "what is the only requirement for access?",
+    ])
+    def test_scope_word_alone_keeps_file_list(self, query_parser, query):
+        """Implicit references (no extension, no exact file name) are caught by the scope word"""
+        assert query_parser.has_file_references(query, ["Report_2024.pdf", "Budget.pdf"]) is True
+
+    def test_lone_file_noun_is_not_a_file_reference(self, query_parser):
+        """A file noun without a scope word is usually not about a file"""
+        assert query_parser.has_file_references(
+            "come si scrive un documento di laurea?", ["Budget.pdf"]
+        ) is False
+
+    @pytest.mark.parametrize("query,expected", [
+        ("ESCLUDI I FILE vecchi", True),
+        ("escludili, sono documenti vecchi", True),
+        ("visitare l'isolotto", False),
+    ])
+    def test_scope_words_respect_word_boundaries(self, query_parser, query, expected):
+        """Scope prefixes take suffixes, but keywords never match inside other words"""
+        assert query_parser.has_file_references(query, []) is expected
@@ -16,6 +16,12 @@ class TestHealthEndpoint:
         assert "message" in data
         assert "welcome" in data["message"].lower()
 
+    def test_health_check_head(self, client):
+        """Test that HEAD probes get a bodyless 200"""
+        response = client.head("/")
+        assert response.status_code == 200
+        assert response.content == b""
+
 
 class TestUploadEndpoint:
     """Test suite for /rag/upload/ endpoint"""
@@ -0,0 +1,135 @@
+"""
+Unit tests for RerankingService keyword scoring and hybrid reranking.
+"""
+
+import math
+from unittest.mock import patch
+
+import pytest
+from app.services.reranking_service import RerankingService
+from langchain_core.documents import Document
+
+
+@pytest.fixture
+def service():
+    """Fresh RerankingService (empty score cache) for each test."""
+    return RerankingService()
+
+
+class TestKeywordScoring:
+    """Test the batched TF keyword score"""
+
+    def test_batch_scores_match_coverage_and_log_boost(self, service):
+        """Scores equal coverage ratio * (1 + log(1 + tf) * 0.1)"""
+        keywords = frozenset({"python", "language"})
+        contents = [
+            "Python is a language. Python is popular.",
+            "Nothing relevant here.",
+            "PYTHON everywhere",
+        ]
+
+        scores = service._calculate_tf_scores(contents, keywords)
+
+        assert scores[0] == pytest.approx(1.0 * (1 + math.log(4) * 0.1))
+        assert scores[1] == 0.0
+        assert scores[2] == pytest.approx(0.5 * (1 + math.log(2) * 0.1))
+
+    def test_empty_keywords_score_zero(self, service):
+        """No keywords means every chunk scores 0"""
+        scores = service._calculate_tf_scores(["some text"], frozenset())
+        assert list(scores) == [0.0]
+
+    def test_automaton_matches_regex_tokenization(self, service):
+        """Aho-Corasick path only counts whole-word hits, like the regex path"""
+        pytest.importorskip("ahocorasick")
+        keywords = frozenset({"data", "base"})
+        contents = ["Database data, DATA_set and base: data-base", "metadata bases"]
+
+        automaton_scores = service._calculate_tf_scores(contents, keywords)
+        with patch("app.services.reranking_service.ahocorasick", None):
+            regex_scores = service._calculate_tf_scores(contents, keywords)
+
+        assert list(automaton_scores) == pytest.approx(list(regex_scores))
+
+    def test_keyword_regex_counts_whole_words_only(self, service):
+        """Alternation regex counts overlapping-prefix keywords as whole words"""
+        keywords = frozenset({"data", "database"})
+        contents = ["Database data, DATA_set", "metadata only", "nothing relevant"]
+
+        with patch("app.services.reranking_service.ahocorasick", None):
+            scores = service._calculate_tf_scores(contents, keywords)
+
+        assert scores[0] == pytest.approx(1.0 * (1 + math.log1p(2) * 0.1))
+        assert scores[1] == 0.0
+        assert scores[2] == 0.0
+
+    def test_keyword_extraction_is_cached_per_query_tuple(self, service):
+        """Repeated query lists reuse the cached keyword set"""
+        queries = ["What is the database schema?", "Describe the schema"]
+
+        first = service._extract_keywords(queries)
+        second = service._extract_keywords(list(queries))
+
+        assert first == frozenset({"what", "database", "schema", "describe"})
+        assert second is first
+
+    def test_cached_scores_are_reused(self, service):
+        """Second scoring of the same chunk/keywords hits the cache"""
+        keywords = frozenset({"python"})
+        first = service._cached_tf_scores(["python"], keywords, hash(keywords), now=0.0)
+        service._calculate_tf_scores = None  # Would fail if called again
+        second = service._cached_tf_scores(["python"], keywords, hash(keywords), now=1.0)
+        assert first == second
+
+
+class TestRerankDocuments:
+    """Test hybrid reranking order"""
+
+    def test_keyword_match_promotes_lower_ranked_chunk(self, service):
+        """A strongly matching chunk can overtake a better vector rank"""
+        documents = [
+            Document(page_content="Unrelated introduction text."),
+            Document(page_content="Reranking reranking keywords boost relevance."),
+        ]
+
+        reranked = service.rerank_documents(
+            documents, "reranking keywords", [], top_n=2
+        )
+
+        assert reranked[0] is documents[1]
+
+    def test_similarity_scores_replace_position_scores(self, service):
+        """Retrieval similarity, when present, is used instead of list position"""
+        documents = [
+            Document(page_content="First text.", metadata={"similarity_score": 0.2}),
+            Document(page_content="Second text.", metadata={"similarity_score": 0.9}),
+        ]
+
+        reranked = service.rerank_documents(documents, "unmatched query", [], top_n=2)
+
+        assert reranked == [documents[1], documents[0]]
+
+    def test_no_keywords_keeps_retrieval_order_without_scoring(self, service):
+        """Stop-word-only queries return the retrieval order without TF scoring"""
+        documents = [Document(page_content=f"Chunk {i}") for i in range(5)]
+
+        with patch.object(service, "_cached_tf_scores") as mock_scores:
+            reranked = service.rerank_documents(documents, "the and", [], top_n=3)
+
+        mock_scores.assert_not_called()
+        assert reranked == documents[:3]
+
+    def test_ties_keep_retrieval_order(self, service):
+        """Equal scores, including at the top-N boundary, are broken by retrieval order"""
+        documents = [
+            Document(page_content=f"Identical chunk {i % 2}.", metadata={"similarity_score": 0.5})
+            for i in range(20)
+        ]
+
+        reranked = service.rerank_documents(documents, "unmatched query", [], top_n=5)
+
+        assert reranked == documents[:5]
+
+    def test_empty_documents(self, service):
+        """Empty input returns empty output"""
+        assert service.rerank_documents([], "query", []) == []
@@ -0,0 +1,80 @@
+"""
+Unit tests for tier limit lookups and their per-user cache.
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from app.services import tier_limit_service
+from app.services.tier_limit_service import (
+    get_user_tier_limits,
+    get_user_upload_checks,
+    invalidate_tier_cache,
+)
+
+APP_CONFIG = {
+    "unlimited_emails": [],
+    "limits": {
+        "FREE": {"max_queries_per_day": 20, "max_files": 5, "max_file_size_mb": 10},
+        "PRO": {"max_queries_per_day": 500, "max_files": 50, "max_file_size_mb": 50},
+    },
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_tier_cache():
+    """Start every test with an empty tier cache"""
+    tier_limit_service._tier_cache.clear()
+    yield
+    tier_limit_service._tier_cache.clear()
+
+
+class TestTierLimitCache:
+    """Test caching of Firebase Auth tier lookups"""
+
+    def test_repeated_lookups_hit_firebase_once(self):
+        """Several tier checks for the same user make one Firebase Auth call"""
+        user = MagicMock(custom_claims={"tier": "PRO"})
+
+        with patch("app.services.tier_limit_service.auth.get_user", return_value=user) as mock_get_user, \
+             patch("app.routers.auth_router.load_app_config", return_value=APP_CONFIG):
+            first = get_user_tier_limits("tier-user")
+            second = get_user_tier_limits("tier-user")
+
+        assert first == second == ("PRO", APP_CONFIG["limits"]["PRO"])
+        assert mock_get_user.call_count == 1
+
+    def test_invalidate_forces_fresh_lookup(self):
+        """Invalidating a user picks up a changed tier on the next lookup"""
+        users = [MagicMock(custom_claims={"tier": "FREE"}), MagicMock(custom_claims={"tier": "PRO"})]
+
+        with patch("app.services.tier_limit_service.auth.get_user", side_effect=users), \
+             patch("app.routers.auth_router.load_app_config", return_value=APP_CONFIG):
+            assert get_user_tier_limits("tier-user")[0] == "FREE"
+            invalidate_tier_cache("tier-user")
+            assert get_user_tier_limits("tier-user")[0] == "PRO"
+
+    def test_errors_are_not_cached(self):
+        """A failed lookup falls back to FREE without caching the fallback"""
+        with patch("app.services.tier_limit_service.auth.get_user", side_effect=Exception("network")):
+            tier, _ = get_user_tier_limits("tier-user")
+
+        assert tier == "FREE"
+        assert "tier-user" not in tier_limit_service._tier_cache
+
+    def test_upload_checks_bundle_uses_one_lookup(self):
+        """Size and file-count checks come from a single tier lookup"""
+        user = MagicMock(custom_claims={"tier": "FREE"})
+
+        with patch("app.services.tier_limit_service.auth.get_user", return_value=user) as mock_get_user, \
+             patch("app.routers.auth_router.load_app_config", return_value=APP_CONFIG):
+            checks = get_user_upload_checks("tier-user", current_count=5)
+
+        assert mock_get_user.call_count == 1
+        assert checks == {
+            "tier": "FREE",
+            "max_upload_bytes": 10 * 1024 * 1024,
+            "can_upload": False,
+            "max_files": 5,
+            "max_queries": 20,
+        }
@@ -0,0 +1,148 @@
+"""
+Unit tests for TranslationService query translation caching and coalescing.
+"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from app.services.translation_service import TranslationService
+
+
+def _completion(content: str) -> MagicMock:
+    """Build a minimal chat completion response"""
+    response = MagicMock()
+    response.choices = [MagicMock(message=MagicMock(content=content))]
+    return response
+
+
+@pytest.fixture
+def service():
+    """TranslationService with a mocked async OpenAI client"""
+    translation_service = TranslationService()
+    translation_service.async_openai_client = MagicMock()
+    return translation_service
+
+
+class TestAsyncQueryTranslation:
+    """Test async query translation"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_requests_share_one_call(self, service):
+        """Concurrent callers translating the same query trigger a single LLM call"""
+        async def slow_create(**kwargs):
+            await asyncio.sleep(0.01)
+            return _completion("Che cos'è Python?")
+
+        create = AsyncMock(side_effect=slow_create)
+        service.async_openai_client.chat.completions.create = create
+
+        results = await asyncio.gather(*[
+            service.atranslate_query_to_language("What is Python?", "IT") for _ in range(3)
+        ])
+
+        assert results == ["Che cos'è Python?"] * 3
+        assert create.await_count == 1
+        assert not service._inflight_translations
+
+    @pytest.mark.asyncio
+    async def test_repeated_request_hits_cache(self, service):
+        """A finished translation is served from the cache afterwards"""
+        create = AsyncMock(return_value=_completion("Was ist Python?"))
+        service.async_openai_client.chat.completions.create = create
+
+        await service.atranslate_query_to_language("What is Python?", "DE")
+        result = await service.atranslate_query_to_language("  What is Python?\n", "de")
+
+        assert result == "Was ist Python?"
+        assert create.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_cache_key_keeps_query_case(self, service):
+        """Queries differing only in case are translated separately (e.g. acronyms vs words)"""
+        create = AsyncMock(side_effect=[_completion("Cosa fa US?"), _completion("Cosa fa per noi?")])
+        service.async_openai_client.chat.completions.create = create
+
+        first = await service.atranslate_query_to_language("What does US do?", "IT")
+        second = await service.atranslate_query_to_language("What does us do?", "IT")
+
+        assert (first, second) == ("Cosa fa US?", "Cosa fa per noi?")
+        assert create.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_translation_returns_original_query(self, service):
+        """LLM errors fall back to the original query"""
+        service.async_openai_client.chat.completions.create = AsyncMock(side_effect=Exception("timeout"))
+
+        result = await service.atranslate_query_to_language("Qu'est-ce que Python?", "EN")
+
+        assert result == "Qu'est-ce que Python?"
+
+    @pytest.mark.asyncio
+    async def test_query_already_in_target_language_skips_llm(self, service):
+        """A query detected as the target language is returned without an LLM call"""
+        create = AsyncMock(return_value=_completion("unused"))
+        service.async_openai_client.chat.completions.create = create
+
+        with patch(
+            "app.services.translation_service.language_service.detect_language_confident",
+            return_value="IT",
+        ):
+            result = await service.atranslate_query_to_language("Qual è la politica di rimborso?", "IT")
+
+        assert result == "Qual è la politica di rimborso?"
+        create.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_uncertain_detection_still_translates(self, service):
+        """An uncertain detection (None) falls through to the LLM"""
+        create = AsyncMock(return_value=_completion("Refund policy"))
+        service.async_openai_client.chat.completions.create = create
+
+        with patch(
+            "app.services.translation_service.language_service.detect_language_confident",
+            return_value=None,
+        ):
+            result = await service.atranslate_query_to_language("rimborso", "EN")
+
+        assert result == "Refund policy"
+        assert create.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_distinct_queries_in_window_share_one_batched_call(self, service):
+        """Different queries to the same language within the batch window use one JSON-mode call"""
+        async def batch_create(**kwargs):
+            queries = json.loads(kwargs["messages"][-1]["content"])["queries"]
+            return _completion(json.dumps({"translations": [f"EN:{q}" for q in queries]}))
+
+        create = AsyncMock(side_effect=batch_create)
+        service.async_openai_client.chat.completions.create = create
+
+        results = await asyncio.gather(*[
+            service.atranslate_query_to_language(query, "EN")
+            for query in ("Cos'è Python?", "Was ist Python?", "Qu'est-ce que Python?")
+        ])
+
+        assert results == ["EN:Cos'è Python?", "EN:Was ist Python?", "EN:Qu'est-ce que Python?"]
+        assert create.await_count == 1
+        assert create.call_args.kwargs["response_format"] == {"type": "json_object"}
+        assert not service._pending_batches
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_falls_back_to_single_calls(self, service):
+        """A malformed batch reply retries each query with its own call"""
+        async def create_fn(**kwargs):
+            if "response_format" in kwargs:
+                return _completion("not json")
+            return _completion(f"EN:{kwargs['messages'][-1]['content']}")
+
+        create = AsyncMock(side_effect=create_fn)
+        service.async_openai_client.chat.completions.create = create
+
+        results = await asyncio.gather(*[
+            service.atranslate_query_to_language(query, "EN") for query in ("uno", "due")
+        ])
+
+        assert results == ["EN:uno", "EN:due"]
+        assert create.await_count == 3
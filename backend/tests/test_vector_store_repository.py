@@ -5,6 +5,9 @@ These tests verify the repository layer in isolation with a real ChromaDB instan
 They test CRUD operations, metadata filtering, and multi-tenancy isolation.
 """
 
+import uuid
+from unittest.mock import patch
+
 import pytest
 from app.db.chroma_client import (
     get_chroma_client,
@@ -79,9 +82,92 @@ class TestRepositoryBasicOperations:
         ]
         
         total_indexed = test_repository.add_documents(documents, batch_size=100)
+
+        assert total_indexed == 2
+
+    def test_add_documents_reuses_embeddings_for_identical_content(self, test_repository):
+        """Test that identical chunk text is tagged with the same content hash and embedded once"""
+        # Unique text: the test database persists across tests
+        boilerplate = f"Repeated boilerplate footer {uuid.uuid4()}."
+        documents = [
+            Document(
+                page_content=boilerplate,
+                metadata={
+                    "source": "test-repo-user-1",
+                    "original_filename": "dedup.pdf",
+                    "chunk_index": i
+                }
+            )
+            for i in range(3)
+        ]
+        embeddings = test_repository.vector_store.embeddings
+        embedding_class = type(embeddings)
+
+        with patch.object(
+            embedding_class, "embed_documents", autospec=True, side_effect=embedding_class.embed_documents
+        ) as embed_spy:
+            total_indexed = test_repository.add_documents(documents)
+            # Same text uploaded again by the same user: stored vector reused, nothing embedded
+            test_repository.add_documents([
+                Document(page_content=boilerplate, metadata={**documents[0].metadata, "original_filename": "dedup2.pdf"})
+            ])
+
+        results = test_repository.collection.get(
+            where={"$and": [{"source": "test-repo-user-1"}, {"original_filename": "dedup.pdf"}]},
+            include=["metadatas"]
+        )
+        content_hashes = {metadata["content_hash"] for metadata in results["metadatas"]}
+        assert total_indexed == 3
+        assert len(content_hashes) == 1
+        embed_spy.assert_called_once()
+        _, texts = embed_spy.call_args.args
+        assert texts == [boilerplate]
+
+    def test_add_documents_does_not_reuse_embeddings_across_users(self, test_repository):
+        """Test that embedding reuse is scoped to the uploading user"""
+        shared_text = f"Text indexed by two different users {uuid.uuid4()}."
+        embeddings = test_repository.vector_store.embeddings
+        embedding_class = type(embeddings)
+
+        with patch.object(
+            embedding_class, "embed_documents", autospec=True, side_effect=embedding_class.embed_documents
+        ) as embed_spy:
+            for user_id in ("test-repo-user-1", "test-repo-user-2"):
+                test_repository.add_documents([
+                    Document(
+                        page_content=shared_text,
+                        metadata={"source": user_id, "original_filename": "shared.pdf", "chunk_index": 0}
+                    )
+                ])
+
+        assert embed_spy.call_count == 2
+
+    def test_reindexing_shorter_document_removes_stale_chunks(self, test_repository):
+        """Test that re-indexing a file with fewer chunks leaves no chunks of the old version"""
+        def make_chunks(count, version):
+            return [
+                Document(
+                    page_content=f"Version {version} chunk {i} {uuid.uuid4()}.",
+                    metadata={
+                        "source": "test-repo-user-1",
+                        "original_filename": "reindexed.pdf",
+                        "chunk_index": i
+                    }
+                )
+                for i in range(count)
+            ]
+        
+        test_repository.add_documents(make_chunks(5, 1))
+        total_indexed = test_repository.add_documents(make_chunks(2, 2))
         
+        results = test_repository.collection.get(
+            where={"$and": [{"source": "test-repo-user-1"}, {"original_filename": "reindexed.pdf"}]},
+            include=["metadatas", "documents"]
+        )
         assert total_indexed == 2
-    
+        assert sorted(metadata["chunk_index"] for metadata in results["metadatas"]) == [0, 1]
+        assert all(text.startswith("Version 2") for text in results["documents"])
+
     def test_check_document_exists(self, test_repository):
         """Test checking if document exists"""
         # First add a document
@@ -393,3 +479,35 @@ class TestRepositoryEdgeCases:
         # Should be callable
         assert retriever is not None
         assert hasattr(retriever, "invoke") or hasattr(retriever, "get_relevant_documents")
+
+    def test_multi_query_search_returns_one_list_per_query(self, test_repository):
+        """Test batched multi-query search returns ranked results per query"""
+        documents = [
+            Document(
+                page_content=f"Multi query content {i}",
+                metadata={
+                    "source": "test-repo-user-1",
+                    "original_filename": "multi.pdf",
+                    "chunk_index": i
+                }
+            )
+            for i in range(3)
+        ]
+        test_repository.add_documents(documents)
+
+        results = test_repository.multi_query_search(
+            queries=["multi query content", "content 2"],
+            user_id="test-repo-user-1",
+            k=2
+        )
+
+        assert len(results) == 2
+        assert all(len(docs) <= 2 for docs in results)
+        assert all(doc.metadata["source"] == "test-repo-user-1" for docs in results for doc in docs)
+        assert all(-1.0 <= doc.metadata["similarity_score"] <= 1.0 for docs in results for doc in docs)
+
+    def test_multi_query_search_propagates_database_errors(self, test_repository):
+        """Test that a ChromaDB failure is raised, not reported as 'no documents found'"""
+        with patch.object(test_repository.collection, "query", side_effect=RuntimeError("ChromaDB unavailable")):
+            with pytest.raises(RuntimeError):
+                test_repository.multi_query_search(queries=["any query"], user_id="test-repo-user-1")